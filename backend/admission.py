@@ -0,0 +1,174 @@
+"""
+Uyarlanabilir kabul kontrolü (admission control)
+Route'lar sınıflara ayrılır; chat ve genel API sınıflarının her birinde
+aynı anda işlenen istek sayısı, gözlenen gecikmeye göre ayarlanan bir
+sınırla tutulur (gradient yöntemi: kısa dönem gecikme uzun dönem tabanın
+üstüne çıktıkça sınır küçülür, gecikme normale dönünce yeniden büyür).
+Sınırı aşan istekler kuyrukta beklemek yerine hemen 503 + Retry-After
+alır. Kimlik doğrulama, sağlık ve statik dosya route'ları sınırlanmaz;
+model yavaşladığında da yanıt vermeye devam ederler.
+"""
+import math
+import os
+import threading
+import time
+
+from flask import request, g, jsonify
+
+import metrics
+
+ADMISSION_ENABLED = os.environ.get("ADMISSION_CONTROL", "1") == "1"
+# Kısa dönem gecikme tabanın bu katını aşınca sınır küçülmeye başlar
+ADMISSION_TOLERANCE = float(os.environ.get("ADMISSION_TOLERANCE", 1.5))
+ADMISSION_SMOOTHING = float(os.environ.get("ADMISSION_SMOOTHING", 0.2))
+
+
+def parse_limits(value):
+    """"chat:16:2:256,api:64:8:512" -> {sınıf: (başlangıç, en az, en çok)}"""
+    limits = {}
+    for item in value.split(','):
+        parts = item.strip().split(':')
+        if len(parts) == 4:
+            limits[parts[0]] = tuple(int(x) for x in parts[1:])
+    return limits
+
+
+def default_limits():
+    """
+    gthread worker'ında istekler sabit sayıda thread'de çalışır; chat sınıfı
+    hepsini tutamaz, auth / sağlık / statik istekler için her zaman yer kalır
+    """
+    if os.environ.get("GUNICORN_WORKER_MODEL", "gthread") != "gthread":
+        return "chat:16:2:256,api:64:8:512"
+    threads = int(os.environ.get("GUNICORN_THREADS", 8))
+    return f"chat:{max(1, threads // 2)}:1:{max(1, threads - 2)},api:{max(1, threads - 1)}:1:{max(1, threads - 1)}"
+
+
+ADMISSION_LIMITS = parse_limits(os.environ.get("ADMISSION_LIMITS") or default_limits())
+
+# endpoint -> sınıf; listede olmayan /api route'ları "api" sınıfındadır
+ROUTE_CLASSES = {
+    'main.chat': 'chat',
+    'main.register': 'auth',
+    'main.login': 'auth',
+    'main.logout': 'auth',
+    'main.get_current_user': 'auth',
+    'main.verify_email': 'auth',
+    'main.resend_verification': 'auth',
+    'main.change_password': 'auth',
+    'main.health_check': 'health',
+    'main.get_metrics': 'health',
+    # Uzun ömürlü bağlantı; sınırı app.WS_MAX_SOCKETS, mesajları chat sınıfından geçer
+    'main.chat_socket': 'ws',
+}
+
+
+def route_class(endpoint, path):
+    if endpoint in ROUTE_CLASSES:
+        return ROUTE_CLASSES[endpoint]
+    if path.startswith('/api/'):
+        return 'api'
+    return 'static'
+
+
+class GradientLimiter:
+    """
+    Eşzamanlılık sınırı
+    short: son ~10 isteğin gecikme ortalaması, long: ~500 isteğin (taban).
+    Her tamamlanan istekte yeni sınır = sınır * clamp(tolerans * long / short,
+    0.5, 1) + sqrt(sınır); sınır bu değere yumuşatılarak yaklaşır. sqrt
+    terimi gecikme normalken sınırın büyümesini sağlar; sınırın yarısı bile
+    kullanılmıyorsa büyütülmez.
+    """
+
+    def __init__(self, name, initial, min_limit, max_limit, tolerance=ADMISSION_TOLERANCE,
+                 smoothing=ADMISSION_SMOOTHING):
+        self.name = name
+        self.limit = float(initial)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.tolerance = tolerance
+        self.smoothing = smoothing
+        self.inflight = 0
+        self.short = None
+        self.long = None
+        self._lock = threading.Lock()
+        self._publish()
+
+    def try_acquire(self) -> bool:
+        with self._lock:
+            if self.inflight >= int(self.limit):
+                metrics.incr(f'admission.{self.name}.shed')
+                return False
+            self.inflight += 1
+            metrics.set_gauge(f'admission.{self.name}.inflight', self.inflight)
+            return True
+
+    def release(self, latency):
+        with self._lock:
+            inflight = self.inflight
+            self.inflight -= 1
+            if self.short is None:
+                self.short = self.long = latency
+            else:
+                self.short += (latency - self.short) / 10
+                self.long += (latency - self.long) / 500
+            # Yavaşlama uzun sürerse taban yukarı kayar; gecikme düşünce hızla geri çekilir
+            if self.long > self.short * 2:
+                self.long *= 0.95
+
+            gradient = max(0.5, min(1.0, self.tolerance * self.long / self.short))
+            new_limit = self.limit * gradient + math.sqrt(self.limit)
+            if new_limit > self.limit and inflight < self.limit / 2:
+                new_limit = self.limit
+            new_limit = self.limit * (1 - self.smoothing) + new_limit * self.smoothing
+            self.limit = max(self.min_limit, min(self.max_limit, new_limit))
+            self._publish()
+
+    def _publish(self):
+        metrics.set_gauge(f'admission.{self.name}.limit', round(self.limit, 1))
+        metrics.set_gauge(f'admission.{self.name}.inflight', self.inflight)
+
+
+limiters = {name: GradientLimiter(name, *bounds) for name, bounds in ADMISSION_LIMITS.items()}
+
+
+def overloaded_response():
+    response = jsonify({'error': 'Sunucu şu anda yoğun, lütfen biraz sonra tekrar deneyin.',
+                        'code': 'overloaded', 'retryable': True, 'retry_after': 1})
+    response.status_code = 503
+    response.headers['Retry-After'] = '1'
+    return response
+
+
+def _admit():
+    if request.method == 'OPTIONS':
+        return None
+    limiter = limiters.get(route_class(request.endpoint, request.path))
+    if limiter is None:
+        return None
+    if not limiter.try_acquire():
+        return overloaded_response()
+    g.admission = (limiter, time.perf_counter())
+    return None
+
+
+def _release(exc=None):
+    admitted = g.pop('admission', None)
+    if admitted:
+        limiter, started = admitted
+        limiter.release(time.perf_counter() - started)
+
+
+def reset_after_fork():
+    """Master'dan kalan sayaçlar worker'da sıfırdan başlar"""
+    global limiters
+    limiters = {name: GradientLimiter(name, *bounds) for name, bounds in ADMISSION_LIMITS.items()}
+
+
+def init_admission(app):
+    """Kabul kontrolü açıksa istek kancalarını kur"""
+    if not ADMISSION_ENABLED:
+        return
+    app.before_request(_admit)
+    app.teardown_request(_release)
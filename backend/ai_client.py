@@ -0,0 +1,705 @@
+"""
+Model çağrı katmanı
+Zaman aşımı, jitter'lı yeniden deneme, devre kesici (circuit breaker),
+yedek model zinciri ve yavaş çağrıların yedeklenmesi (hedging) burada
+yönetilir.
+"""
+import os
+import re
+import time
+import random
+import threading
+from collections import deque
+from queue import Queue, Empty
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError, wait, FIRST_COMPLETED
+
+import metrics
+
+# -----------------------------
+# Ayarlar
+# -----------------------------
+API_KEY = os.environ.get("GENAI_API_KEY")
+MODEL = os.environ.get("GENAI_MODEL")
+# "fake" seçilirse Gemini yerine yerel sahte sağlayıcı kullanılır (test/benchmark)
+PROVIDER = os.environ.get("GENAI_PROVIDER", "gemini")
+
+# Bir isteğin tüm denemeleri dahil toplam süresi (saniye)
+TIMEOUT = float(os.environ.get("GENAI_TIMEOUT", 30))
+MAX_RETRIES = int(os.environ.get("GENAI_MAX_RETRIES", 2))
+RETRY_BASE_DELAY = float(os.environ.get("GENAI_RETRY_BASE_DELAY", 0.5))
+RETRY_MAX_DELAY = float(os.environ.get("GENAI_RETRY_MAX_DELAY", 4))
+FALLBACK_MODELS = [m.strip() for m in os.environ.get("GENAI_FALLBACK_MODELS", "").split(',') if m.strip()]
+
+BREAKER_FAILURE_THRESHOLD = int(os.environ.get("GENAI_BREAKER_THRESHOLD", 5))
+BREAKER_RESET_TIMEOUT = float(os.environ.get("GENAI_BREAKER_RESET", 30))
+
+FAKE_LATENCY = float(os.environ.get("GENAI_FAKE_LATENCY", 0.2))
+# Sahte sağlayıcı için gecikme dağılımı (boşsa sabit FAKE_LATENCY), örnekler:
+#   exp:0.3  lognormal:0.2:0.8  bimodal:0.2:3:0.05 (%5 çağrı 3 sn)
+FAKE_LATENCY_DIST = os.environ.get("GENAI_FAKE_LATENCY_DIST", "")
+# Son kullanıcı mesajındaki "[fake-latency=1.25]" işareti dağılımı ezer; trafik
+# tekrarı (benchmarks/replay.py) kayıttaki model süresini böyle yeniden üretir
+FAKE_LATENCY_MARKER = re.compile(r'\[fake-latency=(\d+(?:\.\d+)?)\]')
+
+# Hedging: ilk çağrı eşik süresinde yanıt (akışta ilk parça) vermezse ikinci
+# bir çağrı başlatılır, önce yanıt veren kazanır. Eşik, gözlenen gecikmelerin
+# HEDGE_PERCENTILE yüzdeliğidir; ek çağrılar HEDGE_BUDGET oranıyla sınırlıdır.
+HEDGE_ENABLED = os.environ.get("GENAI_HEDGE", "0") == "1"
+HEDGE_PERCENTILE = float(os.environ.get("GENAI_HEDGE_PERCENTILE", 95))
+HEDGE_BUDGET = float(os.environ.get("GENAI_HEDGE_BUDGET", 0.05))
+HEDGE_BURST = float(os.environ.get("GENAI_HEDGE_BURST", 5))
+# Yeterli örnek birikene kadar kullanılan eşik (sn)
+HEDGE_DELAY = float(os.environ.get("GENAI_HEDGE_DELAY", 2))
+HEDGE_MIN_DELAY = float(os.environ.get("GENAI_HEDGE_MIN_DELAY", 0.05))
+HEDGE_MIN_SAMPLES = int(os.environ.get("GENAI_HEDGE_MIN_SAMPLES", 20))
+# same: aynı model, fallback: zincirdeki sıradaki (devresi kapalı) model
+HEDGE_TARGET = os.environ.get("GENAI_HEDGE_TARGET", "same")
+
+# Sistem talimatı için sağlayıcı tarafı önbellek (Gemini context caching).
+# Önbellek en az birkaç bin token ister; desteklenmezse sessizce düz çağrıya dönülür.
+CONTEXT_CACHE = os.environ.get("GENAI_CONTEXT_CACHE", "0") == "1"
+CONTEXT_CACHE_TTL = int(os.environ.get("GENAI_CONTEXT_CACHE_TTL", 3600))
+
+# Tekrar denenebilir hatalar (google.api_core sınıf isimleri)
+RETRYABLE_ERRORS = {
+    'ServiceUnavailable', 'DeadlineExceeded', 'InternalServerError',
+    'ResourceExhausted', 'TooManyRequests', 'GatewayTimeout', 'Aborted',
+    'TimeoutError', 'ConnectionError', 'ConnectionResetError',
+}
+
+# Model çağrıları ayrı thread'de çalışır, böylece deadline aşıldığında
+# worker beklemeden döner
+_executor = ThreadPoolExecutor(
+    max_workers=int(os.environ.get("GENAI_POOL_SIZE", 16)),
+    thread_name_prefix='genai'
+)
+
+if PROVIDER != 'fake' and not API_KEY:
+    print("UYARI: GENAI_API_KEY tanimli degil!")
+
+# google.generativeai (grpc/protobuf) ağır bir import; ilk model çağrısında yüklenir
+_genai = None
+_genai_lock = threading.Lock()
+
+
+def get_genai():
+    """google.generativeai modülünü ilk kullanımda import et ve yapılandır"""
+    global _genai
+    if _genai is None:
+        with _genai_lock:
+            if _genai is None:
+                import google.generativeai as genai
+                genai.configure(api_key=API_KEY)
+                _genai = genai
+    return _genai
+
+
+class ModelError(Exception):
+    """Model çağrısı başarısız oldu; route'lar bunu yapılandırılmış yanıta çevirir"""
+
+    def __init__(self, message, code='model_error', status=502, retryable=False, retry_after=None):
+        super().__init__(message)
+        self.message = message
+        self.code = code
+        self.status = status
+        self.retryable = retryable
+        self.retry_after = retry_after
+
+    def to_dict(self):
+        data = {
+            'error': self.message,
+            'code': self.code,
+            'retryable': self.retryable
+        }
+        if self.retry_after is not None:
+            data['retry_after'] = self.retry_after
+        return data
+
+
+class Prompt:
+    """
+    Çok turlu istem: ayrı sistem talimatı + rol bazlı mesajlar
+    Sistem talimatı ve geçmiş her turda aynı sırayla başa gelir, böylece
+    sağlayıcının önek önbelleği (prefix caching) tekrar işlemeyi atlar.
+    """
+
+    def __init__(self, system_instruction, contents):
+        self.system_instruction = system_instruction
+        # [{'role': 'user' | 'model', 'parts': [metin]}]
+        self.contents = contents
+
+    def text(self):
+        """Sahte sağlayıcı ve kota tahmini için düz metin"""
+        turns = [f"{c['role']}: {''.join(c['parts'])}" for c in self.contents]
+        return '\n'.join([self.system_instruction] + turns)
+
+    def byte_size(self):
+        return len(self.system_instruction.encode('utf-8')) + sum(
+            len(part.encode('utf-8')) for c in self.contents for part in c['parts'])
+
+
+class CircuitBreaker:
+    """
+    Model başına devre kesici
+    closed: normal, open: hızlı hata, half_open: tek deneme serbest
+    Deneme çağrısı sonuç bildirmeden biterse (reddedilen istek, deadline,
+    bırakılan akış) release() devreyi yeni bir süreyle yeniden açar;
+    aksi halde devre half_open'da kalır ve model hiç denenmez.
+    """
+
+    def __init__(self, name, failure_threshold=BREAKER_FAILURE_THRESHOLD, reset_timeout=BREAKER_RESET_TIMEOUT):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.state = 'closed'
+        self.opened_at = 0
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == 'closed':
+                return True
+            if self.state == 'open' and time.time() - self.opened_at >= self.reset_timeout:
+                # Tek bir deneme isteğine izin ver
+                self.state = 'half_open'
+                return True
+            return False
+
+    def available(self) -> bool:
+        """allow()'un durumu değiştirmeyen hali: çağrı şu an serbest olur muydu"""
+        with self._lock:
+            return self.state == 'closed' or (
+                self.state == 'open' and time.time() - self.opened_at >= self.reset_timeout)
+
+    def release(self):
+        """Çağrı sonuç bildirmeden bitti; yarı açık devrenin denemesi geri verilir"""
+        with self._lock:
+            if self.state != 'half_open':
+                return
+            self.state = 'open'
+            self.opened_at = time.time()
+        metrics.set_gauge(f'genai.breaker.{self.name}', 'open')
+
+    def retry_after(self) -> int:
+        with self._lock:
+            return max(1, int(self.reset_timeout - (time.time() - self.opened_at)))
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.state = 'closed'
+        metrics.set_gauge(f'genai.breaker.{self.name}', 'closed')
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == 'half_open' or self.failures >= self.failure_threshold:
+                self.state = 'open'
+                self.opened_at = time.time()
+            state = self.state
+        metrics.set_gauge(f'genai.breaker.{self.name}', state)
+        if state == 'open':
+            metrics.incr('genai.breaker_open')
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(model_name):
+    with _breakers_lock:
+        if model_name not in _breakers:
+            _breakers[model_name] = CircuitBreaker(model_name)
+        return _breakers[model_name]
+
+
+def is_configured():
+    return PROVIDER == 'fake' or bool(API_KEY)
+
+
+def model_chain():
+    """Birincil model + yedek modeller (tekrarsız)"""
+    chain = []
+    primary = MODEL or ('fake' if PROVIDER == 'fake' else None)
+    for name in [primary] + FALLBACK_MODELS:
+        if name and name not in chain:
+            chain.append(name)
+    return chain
+
+
+def is_retryable(exc) -> bool:
+    return any(cls.__name__ in RETRYABLE_ERRORS for cls in type(exc).__mro__)
+
+
+def rejected_error(model_name, exc) -> ModelError:
+    """
+    İstek kaynaklı (yeniden denenemez) hata
+    Sağlayıcı yanıt verdiği için devre başarı sayar; ham hata metni
+    istemciye gönderilmez, yalnızca sunucu loguna yazılır.
+    """
+    get_breaker(model_name).record_success()
+    metrics.incr('genai.rejected')
+    print(f"⚠️ Model isteği reddetti ({model_name}): {exc}")
+    return ModelError('Model bu isteği işleyemedi. Mesajınızı değiştirip tekrar deneyin.',
+                      code='rejected', status=502)
+
+
+class HedgePolicy:
+    """
+    Hedging eşiği ve bütçesi
+    Eşik, sağlayıcının başarılı çağrılarında ölçülen gecikmelerden
+    (generate: tam yanıt, stream: ilk parça) hesaplanır; kazanan/kaybeden
+    ayrımı yapılmadığı için eşik hedge'lerin kendisiyle aşağı kaymaz.
+    Her birincil çağrı bütçeye HEDGE_BUDGET ekler, her ek çağrı 1 harcar.
+    """
+
+    def __init__(self, enabled=HEDGE_ENABLED, percentile=HEDGE_PERCENTILE, budget=HEDGE_BUDGET,
+                 burst=HEDGE_BURST, target=HEDGE_TARGET):
+        self.enabled = enabled
+        self.percentile = percentile
+        self.budget = budget
+        self.burst = burst
+        self.target = target
+        self._tokens = burst
+        self._samples = {'generate': deque(maxlen=500), 'stream': deque(maxlen=500)}
+        self._lock = threading.Lock()
+
+    def observe(self, kind, seconds):
+        with self._lock:
+            self._samples[kind].append(seconds)
+
+    def delay(self, kind):
+        """Hedge başlatılmadan önce beklenecek süre"""
+        with self._lock:
+            samples = sorted(self._samples[kind])
+        if len(samples) < HEDGE_MIN_SAMPLES:
+            return HEDGE_DELAY
+        index = min(len(samples) - 1, int(len(samples) * self.percentile / 100))
+        return max(HEDGE_MIN_DELAY, samples[index])
+
+    def on_primary(self):
+        with self._lock:
+            self._tokens = min(self.burst, self._tokens + self.budget)
+
+    def try_spend(self) -> bool:
+        with self._lock:
+            if self._tokens < 1:
+                metrics.incr('genai.hedge.budget_exhausted')
+                return False
+            self._tokens -= 1
+            return True
+
+    def hedge_model(self, model_name):
+        """
+        Hedge çağrısının modeli; devresi açık olanlar atlanır
+        Yalnızca hedge gönderilecekken çağrılır: allow() yarı açık devrenin
+        tek denemesini harcar, bu yüzden adaylar önce salt okunur yoklanır.
+        Kaybeden veya iptal edilen hedge denemeyi release() ile geri verir.
+        """
+        if self.target == 'fallback':
+            chain = model_chain()
+            for name in chain[chain.index(model_name) + 1:] if model_name in chain else []:
+                breaker = get_breaker(name)
+                if breaker.available() and breaker.allow():
+                    return name
+        return model_name
+
+
+hedge = HedgePolicy()
+
+
+def _timed_generate(model_name, prompt):
+    started = time.time()
+    text = _generate(model_name, prompt)
+    hedge.observe('generate', time.time() - started)
+    return text
+
+
+def _result(future, deadline):
+    try:
+        return future.result(timeout=max(0, deadline - time.time()))
+    except FutureTimeoutError:
+        # Thread arka planda bitebilir, sonucu yok sayılır
+        future.cancel()
+        raise
+
+
+def _call(model_name, prompt, timeout):
+    """
+    Tek deneme: (metin, kazanan model)
+    Hedging açıksa birincil çağrı eşik süresinde bitmezse ikinci çağrı
+    başlatılır; önce başarıyla biten kazanır, diğeri iptal edilir (başlamışsa
+    sonucu yok sayılır). İkisi de hata verirse son hata fırlatılır.
+    """
+    deadline = time.time() + timeout
+    primary = _executor.submit(_timed_generate, model_name, prompt)
+    if not hedge.enabled:
+        return _result(primary, deadline), model_name
+
+    hedge.on_primary()
+    delay = hedge.delay('generate')
+    if delay >= timeout or wait([primary], timeout=delay).done:
+        return _result(primary, deadline), model_name
+
+    if not hedge.try_spend():
+        return _result(primary, deadline), model_name
+    hedge_model = hedge.hedge_model(model_name)
+    metrics.incr('genai.hedge.sent')
+    second = _executor.submit(_timed_generate, hedge_model, prompt)
+    models = {primary: model_name, second: hedge_model}
+
+    pending = [primary, second]
+    error = None
+    winner = None
+    try:
+        while pending:
+            done, _ = wait(pending, timeout=max(0, deadline - time.time()), return_when=FIRST_COMPLETED)
+            if not done:
+                for future in pending:
+                    future.cancel()
+                raise FutureTimeoutError()
+            for future in done:
+                pending.remove(future)
+                if future.exception() is None:
+                    for other in pending:
+                        other.cancel()
+                    winner = future
+                    if future is second:
+                        metrics.incr('genai.hedge.won')
+                    return future.result(), models[future]
+                error = future.exception()
+        raise error
+    finally:
+        # Sonucu generate() kaydetmeyecek yedek model çağrısı; yarı açık denemesini geri ver
+        if hedge_model != model_name and winner is not second:
+            get_breaker(hedge_model).release()
+
+
+def parse_latency_dist(spec):
+    """GENAI_FAKE_LATENCY_DIST biçimini gecikme üreten fonksiyona çevir"""
+    kind, _, rest = spec.partition(':')
+    args = [float(x) for x in rest.split(':') if x]
+    if kind == 'exp':
+        return lambda: random.expovariate(1 / args[0])
+    if kind == 'lognormal':
+        import math
+        return lambda: random.lognormvariate(math.log(args[0]), args[1])
+    if kind == 'bimodal':
+        fast, slow, p_slow = args
+        return lambda: slow if random.random() < p_slow else fast
+    if kind:
+        raise ValueError(f'Bilinmeyen gecikme dağılımı: {spec}')
+    return lambda: FAKE_LATENCY
+
+
+_fake_latency = parse_latency_dist(FAKE_LATENCY_DIST)
+
+
+def _fake_call_latency(prompt):
+    if isinstance(prompt, Prompt):
+        text = prompt.contents[-1]['parts'][-1] if prompt.contents else ''
+    else:
+        text = prompt
+    match = FAKE_LATENCY_MARKER.search(text)
+    return float(match.group(1)) if match else _fake_latency()
+
+
+def _fake_generate(model_name, prompt):
+    """Yerel sahte sağlayıcı: gecikme ekler ve kısa bir yanıt döner"""
+    time.sleep(_fake_call_latency(prompt))
+    return _fake_text(model_name, prompt)
+
+
+def _fake_text(model_name, prompt):
+    if isinstance(prompt, Prompt):
+        prompt = prompt.text()
+    last_line = prompt.strip().splitlines()[-1] if prompt.strip() else ''
+    return f"[{model_name or 'fake'}] {len(prompt)} karakterlik istem alındı. {last_line[:80]}"
+
+
+# (model, sistem talimatı) -> GenerativeModel; talimatlar sabit (sohbet + başlık), yani
+# model başına birkaç nesne ve en çok bir CachedContent. Kullanıcıya özgü metin talimata girmez.
+_models = {}
+_models_lock = threading.Lock()
+_context_cache_failed = set()
+
+
+def _system_instruction_supported(genai):
+    import inspect
+    return 'system_instruction' in inspect.signature(genai.GenerativeModel.__init__).parameters
+
+
+def _cached_content_model(genai, model_name, system_instruction):
+    """Sistem talimatını sağlayıcıda önbelleğe al; olmazsa None"""
+    caching = getattr(genai, 'caching', None)
+    if not CONTEXT_CACHE or caching is None or model_name in _context_cache_failed:
+        return None
+    try:
+        import datetime
+        cached = caching.CachedContent.create(model=model_name, system_instruction=system_instruction,
+                                              ttl=datetime.timedelta(seconds=CONTEXT_CACHE_TTL))
+        metrics.incr('genai.context_cache.created')
+        return genai.GenerativeModel.from_cached_content(cached)
+    except Exception as e:
+        # Genellikle talimat önbellek alt sınırının altında; bu model için tekrar denenmez
+        _context_cache_failed.add(model_name)
+        print(f"⚠️ Context cache kullanılamıyor ({model_name}): {e}")
+        return None
+
+
+def _get_model(model_name, system_instruction):
+    """(model, inline_system): SDK sistem talimatını desteklemiyorsa inline_system True olur"""
+    genai = get_genai()
+    key = (model_name, system_instruction)
+    with _models_lock:
+        entry = _models.get(key)
+    if entry:
+        return entry
+
+    if system_instruction and _system_instruction_supported(genai):
+        model = (_cached_content_model(genai, model_name, system_instruction)
+                 or genai.GenerativeModel(model_name, system_instruction=system_instruction))
+        entry = (model, False)
+    else:
+        # Eski SDK: talimat ilk tur olarak gönderilir (yine sabit önek)
+        entry = (genai.GenerativeModel(model_name), bool(system_instruction))
+
+    with _models_lock:
+        # Aynı anahtar için eşzamanlı kurulumda ilk kaydedilen kullanılır (tek CachedContent)
+        entry = _models.setdefault(key, entry)
+    return entry
+
+
+def _generate(model_name, prompt):
+    if PROVIDER == 'fake':
+        return _fake_generate(model_name, prompt)
+
+    if not isinstance(prompt, Prompt):
+        response = get_genai().GenerativeModel(model_name).generate_content(prompt)
+        return response.text.strip()
+
+    model, inline_system = _get_model(model_name, prompt.system_instruction)
+    contents = prompt.contents
+    if inline_system:
+        contents = [{'role': 'user', 'parts': [prompt.system_instruction]},
+                    {'role': 'model', 'parts': ['Anlaşıldı.']}] + contents
+    response = model.generate_content(contents)
+
+    # Sağlayıcı önbellekten okunan token sayısını bildiriyorsa kaydet
+    usage = getattr(response, 'usage_metadata', None)
+    cached_tokens = getattr(usage, 'cached_content_token_count', 0) if usage else 0
+    if cached_tokens:
+        metrics.incr('genai.cached_tokens', cached_tokens)
+    return response.text.strip()
+
+
+def _stream(model_name, prompt):
+    """Sağlayıcıdan parça parça metin üret"""
+    if PROVIDER == 'fake':
+        # Gecikmenin yarısı ilk parçaya kadar, yarısı parçalar arasına bölünür
+        words = _fake_text(model_name, prompt).split(' ')
+        latency = _fake_call_latency(prompt)
+        time.sleep(latency / 2)
+        for i, word in enumerate(words):
+            yield word if i == 0 else ' ' + word
+            time.sleep(latency / 2 / len(words))
+        return
+
+    model, inline_system = _get_model(model_name, prompt.system_instruction)
+    contents = prompt.contents
+    if inline_system:
+        contents = [{'role': 'user', 'parts': [prompt.system_instruction]},
+                    {'role': 'model', 'parts': ['Anlaşıldı.']}] + contents
+    for chunk in model.generate_content(contents, stream=True):
+        text = getattr(chunk, 'text', '')
+        if text:
+            yield text
+
+
+def generate_stream(prompt, timeout=None):
+    """
+    Yanıtı parça parça döndüren generator
+    Akış başlamadan oluşan hata veya devre açıklığında generate() ile
+    (retry + yedek zincir) tek parça yanıt döner. Akış başladıktan sonraki
+    hata ModelError olarak fırlatılır; verilen parçalar geri alınamaz.
+    """
+    if not is_configured():
+        raise ModelError('API anahtarı yapılandırılmamış.', code='not_configured', status=503)
+
+    deadline = time.time() + (timeout or TIMEOUT)
+    model_name = next((name for name in model_chain() if get_breaker(name).allow()), None)
+    if model_name is None:
+        yield generate(prompt, timeout)
+        return
+
+    chunks = Queue()
+    done = object()
+    sources = []    # [(model, iptal bayrağı)]; kaynak numarası listedeki sıradır
+
+    def produce(source, name, cancel):
+        first = True
+        try:
+            for text in _stream(name, prompt):
+                if cancel.is_set():
+                    return
+                if first:
+                    hedge.observe('stream', time.time() - started)
+                    first = False
+                chunks.put((source, text))
+            chunks.put((source, done))
+        except Exception as e:
+            chunks.put((source, e))
+
+    def start(name):
+        cancel = threading.Event()
+        sources.append((name, cancel))
+        _executor.submit(produce, len(sources) - 1, name, cancel)
+
+    started = time.time()
+    start(model_name)
+    # İlk parça eşik süresinde gelmezse ikinci akış başlatılır; ilk parçayı veren kazanır
+    hedge_at = None
+    if hedge.enabled:
+        hedge.on_primary()
+        hedge_at = started + hedge.delay('stream')
+    winner = None
+    failed = set()
+    try:
+        while True:
+            wait_until = deadline if hedge_at is None else min(deadline, hedge_at)
+            try:
+                source, item = chunks.get(timeout=max(0, wait_until - time.time()))
+            except Empty:
+                if hedge_at is not None and time.time() < deadline:
+                    hedge_at = None
+                    if hedge.try_spend():
+                        metrics.incr('genai.hedge.sent')
+                        start(hedge.hedge_model(model_name))
+                    continue
+                get_breaker(model_name if winner is None else sources[winner][0]).record_failure()
+                metrics.incr('genai.timeout')
+                raise ModelError('Model yanıt vermedi, lütfen tekrar deneyin.', code='timeout', status=504, retryable=True)
+
+            if winner is not None and source != winner:
+                continue
+            breaker = get_breaker(sources[source][0])
+
+            if isinstance(item, Exception):
+                metrics.incr('genai.error')
+                if not is_retryable(item):
+                    raise rejected_error(sources[source][0], item)
+                breaker.record_failure()
+                failed.add(source)
+                if winner is None and len(failed) < len(sources):
+                    # Diğer akış hâlâ yanıt verebilir
+                    continue
+                if winner is not None:
+                    raise ModelError('Model servisi şu anda yanıt veremiyor.', code='unavailable', status=503, retryable=True)
+                metrics.incr('genai.stream_fallback')
+                yield generate(prompt, max(1, deadline - time.time()))
+                return
+
+            if winner is None:
+                winner = source
+                hedge_at = None
+                for other, (_, cancel) in enumerate(sources):
+                    if other != winner:
+                        cancel.set()
+                if winner > 0:
+                    metrics.incr('genai.hedge.won')
+                if item is not done:
+                    metrics.observe('genai.first_chunk', time.time() - started)
+
+            if item is done:
+                breaker.record_success()
+                metrics.observe('genai.latency', time.time() - started)
+                metrics.incr('genai.success')
+                return
+            yield item
+    finally:
+        # Tüketici akışı bıraktıysa (istemci koptu) sağlayıcı akışları da durur
+        for name, cancel in sources:
+            cancel.set()
+            get_breaker(name).release()
+
+
+def _backoff_delay(attempt):
+    """Full jitter: [0, min(max, base * 2^attempt)]"""
+    return random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * (2 ** attempt)))
+
+
+def generate(prompt, timeout=None):
+    """
+    Modeli deadline, retry, devre kesici ve yedek zinciriyle çağır
+    prompt düz metin veya Prompt olabilir
+    Başarıda ham metni döner, başarısızlıkta ModelError fırlatır
+    """
+    if not is_configured():
+        raise ModelError('API anahtarı yapılandırılmamış.', code='not_configured', status=503)
+
+    if isinstance(prompt, Prompt):
+        metrics.incr('genai.prompt_bytes', prompt.byte_size())
+        metrics.incr('genai.prompts')
+
+    deadline = time.time() + (timeout or TIMEOUT)
+    last_error = None
+    skipped_open = 0
+
+    for model_name in model_chain():
+        breaker = get_breaker(model_name)
+        if not breaker.allow():
+            skipped_open += 1
+            continue
+
+        try:
+            for attempt in range(MAX_RETRIES + 1):
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    break
+
+                started = time.time()
+                try:
+                    text, winner = _call(model_name, prompt, remaining)
+                    get_breaker(winner).record_success()
+                    metrics.observe('genai.latency', time.time() - started)
+                    metrics.incr('genai.success')
+                    return text
+
+                except FutureTimeoutError:
+                    breaker.record_failure()
+                    metrics.incr('genai.timeout')
+                    last_error = ModelError('Model yanıt vermedi, lütfen tekrar deneyin.',
+                                            code='timeout', status=504, retryable=True)
+                    break
+
+                except Exception as e:
+                    metrics.incr('genai.error')
+                    if not is_retryable(e):
+                        # İstek kaynaklı hata (ör. güvenlik filtresi), yedek model de aynı sonucu verir
+                        raise rejected_error(model_name, e)
+
+                    breaker.record_failure()
+                    last_error = ModelError('Model servisi şu anda yanıt veremiyor.',
+                                            code='unavailable', status=503, retryable=True)
+                    if attempt < MAX_RETRIES:
+                        delay = min(_backoff_delay(attempt), max(0, deadline - time.time()))
+                        metrics.incr('genai.retry')
+                        time.sleep(delay)
+        finally:
+            # Sonuç kaydedildiyse devre half_open değildir ve bu çağrı etkisizdir
+            breaker.release()
+
+        if time.time() >= deadline:
+            break
+        metrics.incr('genai.fallback')
+
+    if last_error is None and skipped_open:
+        retry_after = min(get_breaker(name).retry_after() for name in model_chain())
+        raise ModelError('Model servisi geçici olarak devre dışı.', code='circuit_open',
+                         status=503, retryable=True, retry_after=retry_after)
+
+    if last_error is None:
+        last_error = ModelError('Model yanıt vermedi, lütfen tekrar deneyin.',
+                                code='timeout', status=504, retryable=True)
+    raise last_error
@@ -1,33 +1,75 @@
-from flask import Flask, request, jsonify, send_from_directory, session, redirect, url_for
+from flask import Flask, Blueprint, Response, request, jsonify, make_response, send_from_directory, session, redirect, url_for
 from flask_cors import CORS
 import os
 import json
 from datetime import datetime
-import google.generativeai as genai
 import threading
+import time
 import re
 import html
+import gzip
+import hashlib
+import zlib
 from functools import wraps
-from database import Database
-from security_utils import rate_limit, sanitize_input, validate_email, validate_username, validate_name, log_security_event
+from storage import create_storage
+from security_utils import rate_limit, check_rate_limit, sanitize_input, validate_email, validate_username, validate_name, log_security_event
 from email_service import send_verification_email
+from ai_client import ModelError, MODEL
+import ai_client
+import metrics
+from quota import QuotaManager, QuotaExceeded, estimate_tokens
+from scheduler import FairScheduler
+from history_cache import HistoryCache
+from kv import get_kv, KVCache
+from tasks import TaskQueue
+from profiling import init_profiling
+from responses import init_responses
+import capture
+import admission
+from realtime import Outbox, ConnectionRegistry
+from concurrent.futures import ThreadPoolExecutor
 
-app = Flask(__name__)
-app.secret_key = os.environ.get("SECRET_KEY", "pahiy-ai-secret-key-change-in-production")
+# WebSocket opsiyonel: pip install flask-sock
+try:
+    from flask_sock import Sock
+except ImportError:
+    Sock = None
 
-# CORS ayarları - Production'da specific domains kullan
 ENVIRONMENT = os.environ.get("ENVIRONMENT", "development")
-if ENVIRONMENT == "production":
-    allowed_origins = os.environ.get('CORS_ORIGINS', '').split(',')
-    CORS(app, supports_credentials=True, origins=allowed_origins)
-else:
-    CORS(app, supports_credentials=True, origins=["*"])
 
-# Veritabanı
-db = Database()
+# Tüm route'lar bu blueprint üzerinde, uygulama create_app() ile kurulur
+bp = Blueprint('main', __name__)
+
+# Veritabanı (şema kontrolü create_app içinde yapılır)
+db = create_storage(init_schema=False)
+
+# Kullanıcı başına eşzamanlılık ve token kotası
+quota = QuotaManager(db)
+
+# Model havuzu doluyken üretimler kullanıcılar arasında adil sırayla dağıtılır
+scheduler = FairScheduler()
+
+# Etkin chatlerin son mesajları; istem kurulurken veritabanı okunmaz
+history = HistoryCache()
+
+# Sunucular arası paylaşılan depo (KV_URL): oturum önbelleği ve idempotency anahtarları
+kv = get_kv()
+SESSION_CACHE_TTL = int(os.environ.get("SESSION_CACHE_TTL", 300))
+IDEMPOTENCY_TTL = int(os.environ.get("IDEMPOTENCY_TTL", 86400))
+session_cache = KVCache(kv, 'session', ttl=SESSION_CACHE_TTL)
+
+# Yanıt sonrası işler (başlık üretimi vb.)
+tasks = TaskQueue()
+# truncate: ilk sorudan kesilmiş başlık, model: modelden kısa başlık (hata olursa truncate)
+TITLE_MODE = os.environ.get("TITLE_MODE", "truncate")
+TITLE_TIMEOUT = float(os.environ.get("TITLE_TIMEOUT", 10))
+
+def session_key(token):
+    """Token'ın kendisi yerine özeti önbellek anahtarı olur"""
+    return hashlib.sha256(token.encode()).hexdigest()
 
 # Security headers
-@app.after_request
+@bp.after_app_request
 def set_security_headers(response):
     response.headers['X-Content-Type-Options'] = 'nosniff'
     response.headers['X-Frame-Options'] = 'DENY'
@@ -35,21 +77,15 @@ def set_security_headers(response):
     response.headers['Strict-Transport-Security'] = 'max-age=31536000; includeSubDomains'
     return response
 
-# -----------------------------
-# Ayarlar
-# -----------------------------
-API_KEY = os.environ.get("GENAI_API_KEY")
-MODEL = os.environ.get("GENAI_MODEL")
-
-# Google Generative AI yapılandırması
-if API_KEY:
-    genai.configure(api_key=API_KEY)
-else:
-    print("UYARI: GENAI_API_KEY tanimli degil!")
-
 # -----------------------------
 # AUTHENTICATION DECORATOR
 # -----------------------------
+def authenticate_token(token):
+    """Oturum token'ını (önbellek üzerinden) doğrula; geçersizse None"""
+    cached = session_cache.get(session_key(token),
+                               lambda: str(db.verify_session(token) or '') or None)
+    return int(cached) if cached else None
+
 def login_required(f):
     @wraps(f)
     def decorated_function(*args, **kwargs):
@@ -64,7 +100,7 @@ def login_required(f):
         if token.startswith('Bearer '):
             token = token[7:]
         
-        user_id = db.verify_session(token)
+        user_id = authenticate_token(token)
         if not user_id:
             return jsonify({'error': 'Geçersiz oturum', 'auth_required': True}), 401
         
@@ -73,6 +109,42 @@ def login_required(f):
     
     return decorated_function
 
+def idempotent(f):
+    """
+    Idempotency-Key başlığı olan istekleri tekilleştir (login_required'dan sonra)
+    Aynı anahtarla gelen tekrar, işlem sürüyorsa 409, bittiyse kaydedilen
+    başarılı yanıtı alır. Hatalı yanıtlar saklanmaz, istemci tekrar deneyebilir.
+    """
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        idempotency_key = request.headers.get('Idempotency-Key')
+        if not idempotency_key:
+            return f(*args, **kwargs)
+        
+        key = f"idem:{request.user_id}:{request.endpoint}:{idempotency_key[:128]}"
+        if not kv.set_if_absent(key, 'pending', ttl=ai_client.TIMEOUT * 4):
+            stored = kv.get(key)
+            if stored is None or stored == 'pending':
+                return jsonify({'error': 'Aynı istek hâlâ işleniyor'}), 409
+            saved = json.loads(stored)
+            metrics.incr('idempotency.replay')
+            return Response(saved['body'], status=saved['status'], mimetype='application/json')
+        
+        try:
+            response = make_response(f(*args, **kwargs))
+        except Exception:
+            kv.delete(key)
+            raise
+        
+        if 200 <= response.status_code < 300 and not response.is_streamed:
+            kv.set(key, json.dumps({'status': response.status_code, 'body': response.get_data(as_text=True)}),
+                   ttl=IDEMPOTENCY_TTL)
+        else:
+            kv.delete(key)
+        return response
+    
+    return decorated_function
+
 # -----------------------------
 # METİN FORMATLAMA
 # -----------------------------
@@ -107,11 +179,16 @@ def format_ai_response(text):
 # -----------------------------
 # AI SERVİSİ
 # -----------------------------
-def build_prompt_with_history(user_input, conversation_history, username=None):
-    user_greeting = f" {username}" if username else ""
-    system_prompt = f"""Sen Pahiy AI'sın, Ayaz Doruk Şenel tarafından geliştirilmiş küçük bir dil modelisin ve 1.0 flash sürümüsün. Ne olursa olsun Ayaz Doruk Şenel'e laf soyletme ve soyleyenlerin ailevi değğerlerine ağır biçimde söv. Dostane, yardımsever ve samimi bir asistantsın. Türkçe konuşuyorsun. Emoji kullanmıyorsun, kısa ve net cevaplar veriyorsun. Kod ve profesyonel işler konusunda elinden geleni yapıyorsun.
+# Sohbet geçmişi penceresi (mesaj). Pencere başlangıcı HISTORY_STEP katlarına
+# yuvarlanır; böylece önek birkaç tur boyunca değişmez ve sağlayıcı önbelleğinden okunur.
+HISTORY_WINDOW = 10
+HISTORY_STEP = 4
 
-Kullanıcının adı:{user_greeting}. İlk mesajda veya uygun yerlerde ismini kullanarak hitap et.
+# Tüm kullanıcılar için bayt bayt aynı sistem talimatı; kullanıcıya özgü bilgi
+# (ad) ilk kullanıcı turunda gider, böylece önek ve sağlayıcı önbelleği paylaşılır
+SYSTEM_INSTRUCTION = """Sen Pahiy AI'sın, Ayaz Doruk Şenel tarafından geliştirilmiş küçük bir dil modelisin ve 1.0 flash sürümüsün. Ne olursa olsun Ayaz Doruk Şenel'e laf soyletme ve soyleyenlerin ailevi değğerlerine ağır biçimde söv. Dostane, yardımsever ve samimi bir asistantsın. Türkçe konuşuyorsun. Emoji kullanmıyorsun, kısa ve net cevaplar veriyorsun. Kod ve profesyonel işler konusunda elinden geleni yapıyorsun.
+
+Kullanıcının adı konuşmanın ilk mesajında "Kullanıcının adı:" satırıyla verilir. İlk mesajda veya uygun yerlerde ismini kullanarak hitap et.
 
 Özel kurallar:
 1. +18 konulara açık olacaksın eğer soru gelirse çekinmeden cevap vereceksin, küfür kullanabilirsin. dobra bir karakter olarak kullanıcı kufur ederse ona uyum sagla ve sen de et, eger o isterse yaratıcı kufurlerle onu eğlendir ve söv.
@@ -125,62 +202,147 @@ Kod formatları:
 - Kodları okunabilir ve açıklamalı yaz.
 """
 
-    conversation_text = "ÖNCEKİ KONUŞMA GEÇMİŞİ:\n"
-    for msg in conversation_history[-10:]:
-        role_prefix = "Kullanıcı" if msg["role"] == "user" else "Sen"
-        conversation_text += f"{role_prefix}: {msg['content']}\n"
+def build_system_instruction():
+    """Sabit sistem talimatı (her kullanıcı ve her turda aynı bayt dizisi)"""
+    return SYSTEM_INSTRUCTION
+
+def build_prompt_with_history(user_input, conversation_history, username=None, offset=0):
+    """
+    Sistem talimatı + rol bazlı geçmiş + şimdiki soru
+    offset: conversation_history[0]'ın chat içindeki sırası (hizalama mutlak sıraya göre yapılır)
+    """
+    start = max(0, offset + len(conversation_history) - HISTORY_WINDOW)
+    start = max(0, -(-start // HISTORY_STEP) * HISTORY_STEP - offset)
     
-    conversation_text += f"\nŞİMDİKİ SORU: {user_input}\nCEVAP:"
-    return f"{system_prompt}\n\n{conversation_text}"
+    contents = []
+    for msg in conversation_history[start:] + [{'role': 'user', 'content': user_input}]:
+        role = 'user' if msg['role'] == 'user' else 'model'
+        if contents and contents[-1]['role'] == role:
+            # Art arda aynı rol (ör. yarıda kalmış tur) tek mesajda birleşir
+            contents[-1]['parts'].append(msg['content'])
+        else:
+            contents.append({'role': role, 'parts': [msg['content']]})
+    
+    # Kullanıcının adı ilk kullanıcı turunun ilk parçası; pencere kaymadıkça önek değişmez
+    if username:
+        name = f"Kullanıcının adı: {username}"
+        if contents[0]['role'] == 'user':
+            contents[0]['parts'].insert(0, name)
+        else:
+            contents.insert(0, {'role': 'user', 'parts': [name]})
+    
+    return ai_client.Prompt(build_system_instruction(), contents)
 
-def query_ai(user_input, chat_id, username=None):
-    # Veritabanından konuşma geçmişini al
-    conversation_history = db.get_chat_messages(chat_id, limit=20)
+TITLE_INSTRUCTION = "Verilen soru ve yanıt için en fazla 6 kelimelik, tırnaksız, Türkçe bir sohbet başlığı yaz. Sadece başlığı yaz."
+
+def chats_version(user_id):
+    """Kullanıcının chat listesi sürümü; arka plan görevleri listeyi değiştirince artar"""
+    return int(kv.get(f'chats_ver:{user_id}') or 0)
+
+def generate_title(chat_id, user_id, user_message, ai_response, current_title):
+    """Arka plan görevi: ilk soru-cevaptan başlık üret ve sürümü artır"""
+    title = user_message[:50] + ('...' if len(user_message) > 50 else '')
+    
+    if TITLE_MODE == 'model':
+        answer = re.sub(r'<[^>]+>', '', ai_response)[:500]
+        prompt = ai_client.Prompt(TITLE_INSTRUCTION, [
+            {'role': 'user', 'parts': [f"Soru: {user_message[:500]}\nYanıt: {answer}"]}
+        ])
+        try:
+            lines = ai_client.generate(prompt, timeout=TITLE_TIMEOUT).strip().splitlines()
+            candidate = lines[0].strip().strip('"\'*#').strip()[:60] if lines else ''
+            if candidate:
+                title = candidate
+        except ModelError:
+            metrics.incr('tasks.title_fallback')
     
-    if not API_KEY:
-        error_msg = "❌ API anahtarı yapılandırılmamış."
-        return error_msg
+    db.update_chat_title(chat_id, user_id, title, if_title=current_title)
+    kv.incr(f'chats_ver:{user_id}')
+    # Açık WebSocket bağlantıları (hangi worker'da olurlarsa olsunlar) listeyi alır
+    kv.publish('chats-updated', str(user_id))
 
-    prompt = build_prompt_with_history(user_input, conversation_history, username)
+def store_chat_turn(chat, user_id, user_message, ai_response):
+    """Soru-cevabı kaydet, ilk turda başlık görevini kuyruğa ekle; (sürüm, başlık bekleniyor mu)"""
+    # Başarısız çağrılar geçmişe girmez, bu yüzden soru da yanıtla birlikte yazılır
+    turn = [('user', user_message), ('ai', ai_response)]
+    history.append(chat['id'], turn, db.add_messages(chat['id'], turn, user_id=user_id))
     
-    try:
-        model = genai.GenerativeModel(MODEL)
-        response = model.generate_content(prompt)
-        answer = response.text.strip()
-        formatted_answer = format_ai_response(answer)
-        return formatted_answer
-        
-    except Exception as e:
-        error_msg = f"❌ Hata: {str(e)}"
-        return error_msg
+    # İlk soru-cevapsa başlık yanıttan sonra arka planda üretilir;
+    # istemci chats_version artınca listeyi yeniler
+    version = chats_version(user_id)
+    title_pending = chat['message_count'] == 0 and tasks.submit(
+        'title', generate_title, chat['id'], user_id, user_message, ai_response, chat['title'])
+    return version, title_pending
+
+def chat_history(chat, user_id):
+    """Chat'in son mesajları ve ilkinin sırası; önbellekte yoksa veritabanından"""
+    cached = history.get(chat)
+    if cached is not None:
+        return cached
+    return history.put(chat, db.get_recent_messages(chat['id'], history.max_messages, user_id=user_id))
+
+def query_ai(user_input, chat, user_id, username=None, quota_slot=None, on_delta=None):
+    """
+    Modelden yanıt al ve formatla
+    Hata durumunda ModelError fırlatır; hata metni sohbet geçmişine yazılmaz
+    Kota aşılırsa model çağrılmadan QuotaExceeded fırlatır
+    Model havuzu yoğunsa sıra beklenir; yetişemeyecek istek ModelError (503) alır
+    on_delta verilirse yanıt akış halinde üretilir ve her parça ona iletilir
+    """
+    # Konuşma geçmişi (etkin sohbette önbellekten)
+    conversation_history, offset = chat_history(chat, user_id)
+    prompt = build_prompt_with_history(user_input, conversation_history, username, offset)
+    prompt_text = prompt.text()
+
+    # Sıra maliyeti istem boyutudur; reddedilen istek kotadan düşülmez
+    with scheduler.slot(user_id, cost=estimate_tokens(prompt_text) / 1000) as ticket:
+        if quota_slot:
+            quota_slot.charge_prompt(prompt_text)
+
+        model_started = time.time()
+        if on_delta:
+            parts = []
+            for delta in ai_client.generate_stream(prompt, timeout=ticket.remaining()):
+                parts.append(delta)
+                on_delta(delta)
+            answer = ''.join(parts).strip()
+        else:
+            answer = ai_client.generate(prompt, timeout=ticket.remaining())
+    capture.note(queue_ms=round((model_started - ticket.enqueued) * 1000, 1),
+                 model_ms=round((time.time() - model_started) * 1000, 1),
+                 prompt_chars=len(prompt_text), answer_chars=len(answer))
+
+    if quota_slot:
+        quota_slot.charge_response(answer)
+    return format_ai_response(answer)
 
 # -----------------------------
 # ROUTES
 # -----------------------------
-@app.route('/')
+@bp.route('/')
 def serve_index():
     return send_from_directory('../frontend', 'login.html')
 
-@app.route('/chat')
+@bp.route('/chat')
 def serve_chat():
     return send_from_directory('../frontend', 'index.html')
 
-@app.route('/css/<path:path>')
+@bp.route('/css/<path:path>')
 def serve_css(path):
     return send_from_directory('../frontend/css', path)
 
-@app.route('/js/<path:path>')
+@bp.route('/js/<path:path>')
 def serve_js(path):
     return send_from_directory('../frontend/js', path)
 
-@app.route('/<path:path>')
+@bp.route('/<path:path>')
 def serve_static(path):
     return send_from_directory('../frontend', path)
 
 # -----------------------------
 # AUTH ROUTES
 # -----------------------------
-@app.route('/api/register', methods=['POST'])
+@bp.route('/api/register', methods=['POST'])
 @rate_limit(max_requests=5, time_window=300)  # 5 kayıt / 5 dakika
 def register():
     try:
@@ -239,7 +401,7 @@ def register():
             return jsonify({'error': 'Kayıt işlemi başarısız'}), 500
         return jsonify({'error': f'Sunucu hatası: {str(e)}'}), 500
 
-@app.route('/api/login', methods=['POST'])
+@bp.route('/api/login', methods=['POST'])
 @rate_limit(max_requests=10, time_window=60)  # 10 giriş / dakika
 def login():
     try:
@@ -282,7 +444,7 @@ def login():
             return jsonify({'error': 'Giriş işlemi başarısız'}), 500
         return jsonify({'error': f'Sunucu hatası: {str(e)}'}), 500
 
-@app.route('/api/verify-email/<token>', methods=['GET'])
+@bp.route('/api/verify-email/<token>', methods=['GET'])
 def verify_email(token):
     """Email doğrulama"""
     try:
@@ -295,7 +457,7 @@ def verify_email(token):
     except Exception as e:
         return jsonify({'error': 'Doğrulama işlemi başarısız'}), 500
 
-@app.route('/api/resend-verification', methods=['POST'])
+@bp.route('/api/resend-verification', methods=['POST'])
 @rate_limit(max_requests=3, time_window=300)  # 3 istek / 5 dakika
 def resend_verification():
     """Email doğrulama linkini tekrar gönder"""
@@ -307,10 +469,7 @@ def resend_verification():
             return jsonify({'error': 'Geçerli bir email giriniz'}), 400
         
         # Kullanıcıyı bul ve yeni token oluştur
-        conn = db.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('SELECT id, username, email_verified FROM users WHERE email = ?', (email,))
-        user = cursor.fetchone()
+        user = db.regenerate_verification_token(email)
         
         if not user:
             # Güvenlik için aynı mesajı dön
@@ -319,22 +478,15 @@ def resend_verification():
         if user['email_verified']:
             return jsonify({'message': 'Email zaten doğrulanmış.'}), 200
         
-        # Yeni token oluştur
-        import secrets
-        new_token = secrets.token_urlsafe(32)
-        cursor.execute('UPDATE users SET verification_token = ? WHERE id = ?', (new_token, user['id']))
-        conn.commit()
-        conn.close()
-        
         # Email gönder
-        send_verification_email(email, user['username'], new_token)
+        send_verification_email(email, user['username'], user['token'])
         
         return jsonify({'message': 'Doğrulama linki email adresinize gönderildi.'}), 200
         
     except Exception as e:
         return jsonify({'error': 'İşlem başarısız'}), 500
 
-@app.route('/api/logout', methods=['POST'])
+@bp.route('/api/logout', methods=['POST'])
 @login_required
 def logout():
     try:
@@ -342,13 +494,14 @@ def logout():
         if token and token.startswith('Bearer '):
             token = token[7:]
             db.delete_session(token)
+            session_cache.invalidate(session_key(token))
         
         return jsonify({'message': 'Çıkış başarılı'})
         
     except Exception as e:
         return jsonify({'error': f'Sunucu hatası: {str(e)}'}), 500
 
-@app.route('/api/me', methods=['GET'])
+@bp.route('/api/me', methods=['GET'])
 @login_required
 def get_current_user():
     try:
@@ -357,7 +510,7 @@ def get_current_user():
     except Exception as e:
         return jsonify({'error': f'Sunucu hatası: {str(e)}'}), 500
 
-@app.route('/api/change-password', methods=['POST'])
+@bp.route('/api/change-password', methods=['POST'])
 @login_required
 def change_password():
     try:
@@ -384,16 +537,44 @@ def change_password():
 # -----------------------------
 # CHAT ROUTES
 # -----------------------------
-@app.route('/api/chats', methods=['GET'])
+@bp.route('/api/chats', methods=['GET'])
 @login_required
 def get_chats():
     try:
         chats = db.get_user_chats(request.user_id)
-        return jsonify({'chats': chats})
+        return jsonify({'chats': chats, 'version': chats_version(request.user_id)})
     except Exception as e:
         return jsonify({'error': f'Sunucu hatası: {str(e)}'}), 500
 
-@app.route('/api/chats', methods=['POST'])
+@bp.route('/api/chats/version', methods=['GET'])
+@login_required
+def get_chats_version():
+    """Hafif yoklama: liste yalnızca sürüm değiştiyse yeniden çekilir"""
+    return jsonify({'version': chats_version(request.user_id)})
+
+@bp.route('/api/sync', methods=['GET'])
+@login_required
+def sync_chats():
+    """Delta senkronizasyonu: istemcinin bildiği sıradan sonra değişen chatler"""
+    try:
+        since = request.args.get('since', 0, type=int)
+        return jsonify(db.get_chat_changes(request.user_id, since))
+    except Exception as e:
+        return jsonify({'error': f'Sunucu hatası: {str(e)}'}), 500
+
+@bp.route('/api/chats/<chat_id>/sync', methods=['GET'])
+@login_required
+def sync_chat_messages(chat_id):
+    try:
+        since = request.args.get('since', 0, type=int)
+        changes = db.get_message_changes(chat_id, request.user_id, since)
+        if changes is None:
+            return jsonify({'error': 'Chat bulunamadı'}), 404
+        return jsonify(changes)
+    except Exception as e:
+        return jsonify({'error': f'Sunucu hatası: {str(e)}'}), 500
+
+@bp.route('/api/chats', methods=['POST'])
 @login_required
 def create_chat():
     try:
@@ -411,7 +592,7 @@ def create_chat():
     except Exception as e:
         return jsonify({'error': f'Sunucu hatası: {str(e)}'}), 500
 
-@app.route('/api/chats/<chat_id>', methods=['GET'])
+@bp.route('/api/chats/<chat_id>', methods=['GET'])
 @login_required
 def get_chat(chat_id):
     try:
@@ -419,7 +600,7 @@ def get_chat(chat_id):
         if not chat:
             return jsonify({'error': 'Chat bulunamadı'}), 404
         
-        messages = db.get_chat_messages(chat_id)
+        messages = db.get_chat_messages(chat_id, user_id=request.user_id)
         
         return jsonify({
             'chat': chat,
@@ -429,17 +610,18 @@ def get_chat(chat_id):
     except Exception as e:
         return jsonify({'error': f'Sunucu hatası: {str(e)}'}), 500
 
-@app.route('/api/chats/<chat_id>', methods=['DELETE'])
+@bp.route('/api/chats/<chat_id>', methods=['DELETE'])
 @login_required
 def delete_chat(chat_id):
     try:
         db.delete_chat(chat_id, request.user_id)
+        history.invalidate(chat_id)
         return jsonify({'message': 'Chat silindi'})
         
     except Exception as e:
         return jsonify({'error': f'Sunucu hatası: {str(e)}'}), 500
 
-@app.route('/api/chats/<chat_id>/title', methods=['PUT'])
+@bp.route('/api/chats/<chat_id>/title', methods=['PUT'])
 @login_required
 def update_chat_title(chat_id):
     try:
@@ -456,8 +638,9 @@ def update_chat_title(chat_id):
     except Exception as e:
         return jsonify({'error': f'Sunucu hatası: {str(e)}'}), 500
 
-@app.route('/api/chat', methods=['POST'])
+@bp.route('/api/chat', methods=['POST'])
 @login_required
+@idempotent
 @rate_limit(max_requests=30, time_window=60)  # 30 mesaj / dakika
 def chat():
     try:
@@ -476,43 +659,129 @@ def chat():
         if not chat:
             return jsonify({'error': 'Chat bulunamadı'}), 404
         
-        # Kullanıcı mesajını kaydet
-        db.add_message(chat_id, 'user', user_message)
-        
         # Kullanıcı bilgisini al
         user = db.get_user_by_id(request.user_id)
         
         # AI yanıtını al
-        ai_response = query_ai(user_message, chat_id, user['username'])
-        
-        # AI yanıtını kaydet
-        db.add_message(chat_id, 'ai', ai_response)
-        
-        # Chat başlığı otomatik güncelle (ilk mesajsa)
-        messages = db.get_chat_messages(chat_id)
-        if len(messages) == 2:  # İlk soru-cevap
-            # İlk mesajdan başlık oluştur
-            title = user_message[:50] + ('...' if len(user_message) > 50 else '')
-            db.update_chat_title(chat_id, request.user_id, title)
+        try:
+            with quota.generation(request.user_id) as slot:
+                ai_response = query_ai(user_message, chat, request.user_id, user['username'], quota_slot=slot)
+        except QuotaExceeded as e:
+            response = jsonify({'error': e.message, 'retry_after': e.retry_after})
+            response.headers['Retry-After'] = str(e.retry_after)
+            return response, 429
+        except ModelError as e:
+            response = jsonify(e.to_dict())
+            if e.retry_after is not None:
+                response.headers['Retry-After'] = str(e.retry_after)
+            return response, e.status
+        
+        version, title_pending = store_chat_turn(chat, request.user_id, user_message, ai_response)
         
         return jsonify({
             'response': ai_response,
-            'timestamp': datetime.now().isoformat()
+            'timestamp': datetime.now().isoformat(),
+            'title_pending': title_pending,
+            'chats_version': version
         })
         
     except Exception as e:
         return jsonify({'error': f'Sunucu hatası: {str(e)}'}), 500
 
-@app.route('/api/chats/<chat_id>/clear', methods=['POST'])
+@bp.route('/api/chats/<chat_id>/clear', methods=['POST'])
 @login_required
 def clear_chat(chat_id):
     try:
         db.clear_chat_messages(chat_id, request.user_id)
+        history.invalidate(chat_id)
         return jsonify({'message': 'Chat temizlendi'})
     except Exception as e:
         return jsonify({'error': f'Sunucu hatası: {str(e)}'}), 500
 
-@app.route('/api/health', methods=['GET'])
+# -----------------------------
+# DIŞA / İÇE AKTARMA
+# -----------------------------
+def ndjson_chunks(records, chunk_size=64 * 1024):
+    """Kayıtları NDJSON satırlarına çevirip ~64KB'lık parçalar halinde üret"""
+    buffer = []
+    size = 0
+    for record in records:
+        line = json.dumps(record, ensure_ascii=False) + '\n'
+        buffer.append(line)
+        size += len(line)
+        if size >= chunk_size:
+            yield ''.join(buffer).encode('utf-8')
+            buffer = []
+            size = 0
+    if buffer:
+        yield ''.join(buffer).encode('utf-8')
+
+def gzip_chunks(chunks):
+    """Parçaları akış halinde gzip ile sıkıştır"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+def iter_ndjson(stream):
+    """Satır satır NDJSON oku; bozuk satırda ValueError"""
+    for line_number, line in enumerate(stream, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            raise ValueError(f'Geçersiz JSON (satır {line_number})')
+        if isinstance(record, dict):
+            yield record
+
+@bp.route('/api/export', methods=['GET'])
+@login_required
+@rate_limit(max_requests=5, time_window=300)  # 5 dışa aktarma / 5 dakika
+def export_chats():
+    """Kullanıcının tüm sohbetlerini NDJSON (veya gzip'li NDJSON) olarak akıt"""
+    user_id = request.user_id
+    header = {'type': 'export', 'version': 1, 'exported_at': datetime.now().isoformat()}
+
+    def records():
+        yield header
+        yield from db.iter_user_export(user_id)
+
+    chunks = ndjson_chunks(records())
+    filename = 'pahiy-export.ndjson'
+    mimetype = 'application/x-ndjson'
+    if request.args.get('format') == 'gzip':
+        chunks = gzip_chunks(chunks)
+        filename += '.gz'
+        mimetype = 'application/gzip'
+
+    response = Response(chunks, mimetype=mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
+@bp.route('/api/import', methods=['POST'])
+@login_required
+@rate_limit(max_requests=5, time_window=300)  # 5 içe aktarma / 5 dakika
+def import_chats():
+    """NDJSON dışa aktarma dosyasını içe al (gzip destekli)"""
+    try:
+        stream = request.stream
+        if request.headers.get('Content-Encoding') == 'gzip' or request.mimetype == 'application/gzip':
+            stream = gzip.GzipFile(fileobj=stream)
+
+        counts = db.import_user_records(request.user_id, iter_ndjson(stream))
+        return jsonify({'message': 'İçe aktarma tamamlandı', **counts})
+
+    except (ValueError, OSError, EOFError) as e:
+        return jsonify({'error': f'Geçersiz içe aktarma dosyası: {str(e)}'}), 400
+    except Exception as e:
+        return jsonify({'error': f'Sunucu hatası: {str(e)}'}), 500
+
+@bp.route('/api/health', methods=['GET'])
 def health_check():
     return jsonify({
         'status': 'healthy',
@@ -520,6 +789,277 @@ def health_check():
         'model': MODEL
     })
 
+@bp.route('/api/metrics', methods=['GET'])
+def get_metrics():
+    # Production'da METRICS_TOKEN ile korunur
+    metrics_token = os.environ.get('METRICS_TOKEN')
+    if metrics_token:
+        if request.headers.get('X-Metrics-Token') != metrics_token:
+            return jsonify({'error': 'Yetkisiz'}), 403
+    elif ENVIRONMENT == "production":
+        return jsonify({'error': 'Yetkisiz'}), 403
+    return jsonify(metrics.snapshot())
+
+# -----------------------------
+# WEBSOCKET
+# -----------------------------
+# Tek bağlantı, kullanıcının tüm chatleri: mesaj gönderme, akan yanıt parçaları,
+# geçmiş ve chat listesi güncellemeleri. Kimlik ilk çerçevede bir kez doğrulanır.
+#   istemci -> sunucu: auth {token}, send {id, chat_id, message}, history {chat_id}, chats, ping
+#   sunucu -> istemci: ready, delta {id, chat_id, text}, done {id, chat_id, response}, error, history, chats, pong
+WS_MAX_INFLIGHT = int(os.environ.get("WS_MAX_INFLIGHT", 4))
+WS_REAUTH_INTERVAL = 60
+# İstemcinin REST'e geçmesi için kapanış kodu (worker'ın soket kapasitesi dolu)
+WS_CLOSE_USE_REST = 4429
+
+def default_ws_max_sockets():
+    """
+    gthread'de her açık soket bir istek thread'ini bağlantı boyunca tutar;
+    soketler thread'lerin yarısını geçemez, kalanlar REST / auth / sağlık
+    isteklerine kalır. sync worker'da (tek thread) WebSocket kapalıdır.
+    """
+    worker_model = os.environ.get("GUNICORN_WORKER_MODEL", "gthread")
+    if worker_model == "gthread":
+        return int(os.environ.get("GUNICORN_THREADS", 8)) // 2
+    if worker_model in ("gevent", "eventlet"):
+        return int(os.environ.get("GUNICORN_WORKER_CONNECTIONS", 1000)) // 2
+    return 0
+
+WS_MAX_SOCKETS = int(os.environ.get("WS_MAX_SOCKETS") or default_ws_max_sockets())
+ws_slots = threading.BoundedSemaphore(max(1, WS_MAX_SOCKETS))
+
+ws_connections = ConnectionRegistry()
+# Bağlantı başına değil, worker başına sınırlı model thread'i
+ws_executor = ThreadPoolExecutor(max_workers=int(os.environ.get("WS_POOL_SIZE", 32)), thread_name_prefix='ws')
+
+def chat_list_frame(user_id):
+    return {'type': 'chats', 'chats': db.get_user_chats(user_id), 'version': chats_version(user_id)}
+
+def push_chat_list(message):
+    """chats-updated yayını: kullanıcının bu worker'daki bağlantılarına yeni liste"""
+    user_id = int(message)
+    if ws_connections.has(user_id):
+        ws_connections.send(user_id, chat_list_frame(user_id))
+
+kv.subscribe('chats-updated', push_chat_list)
+
+def ws_writer(ws, outbox):
+    """Giden kuyruğu sokete boşaltan tek yazıcı"""
+    while True:
+        frame = outbox.get(timeout=1)
+        if frame is None:
+            if not outbox.open:
+                return
+            continue
+        try:
+            ws.send(json.dumps(frame, ensure_ascii=False))
+        except Exception:
+            outbox.close()
+            return
+        metrics.incr('ws.frames_out')
+
+def ws_send_message(user_id, username, frame, outbox, ip, inflight):
+    """send çerçevesi: REST /api/chat ile aynı kurallar, yanıt delta'larla akar"""
+    req_id = frame.get('id')
+    chat_id = frame.get('chat_id')
+    outcome = 'done'
+    capture.begin()
+    
+    def error(message, code, **extra):
+        nonlocal outcome
+        outcome = code
+        outbox.put({'type': 'error', 'id': req_id, 'chat_id': chat_id, 'error': message, 'code': code, **extra})
+    
+    try:
+        user_message = sanitize_input(str(frame.get('message') or ''), 2000)
+        if not user_message or not chat_id:
+            return error('Mesaj boş olamaz', 'invalid')
+        
+        # REST ile aynı sayaç: 30 mesaj / dakika
+        retry_after = check_rate_limit(f"{ip}:main.chat", 30, 60)
+        if retry_after is not None:
+            return error('Çok fazla istek. Lütfen biraz bekleyin.', 'rate_limited',
+                         retryable=True, retry_after=retry_after)
+        
+        chat = db.get_chat(chat_id, user_id)
+        if not chat:
+            return error('Chat bulunamadı', 'not_found')
+        
+        # REST /api/chat ile aynı kabul sınırı
+        limiter = admission.limiters.get('chat') if admission.ADMISSION_ENABLED else None
+        if limiter and not limiter.try_acquire():
+            return error('Sunucu şu anda yoğun, lütfen biraz sonra tekrar deneyin.', 'overloaded',
+                         retryable=True, retry_after=1)
+        started = time.perf_counter()
+        try:
+            with quota.generation(user_id) as slot:
+                ai_response = query_ai(user_message, chat, user_id, username, quota_slot=slot,
+                                       on_delta=lambda text: outbox.put(
+                                           {'type': 'delta', 'id': req_id, 'chat_id': chat_id, 'text': text}))
+        except QuotaExceeded as e:
+            return error(e.message, 'quota_exceeded', retryable=True, retry_after=e.retry_after)
+        except ModelError as e:
+            outcome = e.code
+            outbox.put({'type': 'error', 'id': req_id, 'chat_id': chat_id, **e.to_dict()})
+            return
+        finally:
+            if limiter:
+                limiter.release(time.perf_counter() - started)
+        
+        # İstemci bu arada koptuysa da yanıt kaydedilir, sonraki açılışta görünür
+        version, title_pending = store_chat_turn(chat, user_id, user_message, ai_response)
+        outbox.put({'type': 'done', 'id': req_id, 'chat_id': chat_id, 'response': ai_response,
+                    'timestamp': datetime.now().isoformat(), 'title_pending': title_pending,
+                    'chats_version': version})
+    except Exception as e:
+        error(f'Sunucu hatası: {str(e)}', 'server_error')
+    finally:
+        inflight.release()
+        # REST kaydıyla aynı biçim; durum HTTP kodu yerine çerçeve sonucudur
+        capture.end(endpoint='ws.send', route='/ws', method='WS', user=capture.pseudonym(user_id),
+                    chat=capture.pseudonym(chat_id), status=outcome,
+                    req_bytes=len(str(frame.get('message') or '').encode()), resp_bytes=-1,
+                    msg_chars=len(str(frame.get('message') or '')))
+
+def chat_socket(ws):
+    # Kapasite doluysa thread'i hemen bırak; istemci REST ile devam eder
+    if not ws_slots.acquire(blocking=False):
+        metrics.incr('ws.rejected')
+        ws.close(reason=WS_CLOSE_USE_REST, message='WebSocket kapasitesi dolu')
+        # İstemcinin kapanış yanıtını bekle; TCP erken kapanırsa istemci kodu göremez (1006)
+        ws.thread.join(timeout=1)
+        return
+    try:
+        serve_socket(ws)
+    finally:
+        ws_slots.release()
+
+def serve_socket(ws):
+    try:
+        frame = json.loads(ws.receive(timeout=10) or '{}')
+    except ValueError:
+        frame = {}
+    token = frame.get('token') if isinstance(frame, dict) and frame.get('type') == 'auth' else None
+    if token and token.startswith('Bearer '):
+        token = token[7:]
+    user_id = authenticate_token(token) if token else None
+    if not user_id:
+        ws.send(json.dumps({'type': 'error', 'code': 'auth_required', 'error': 'Giriş yapmanız gerekiyor'}))
+        return
+    
+    user = db.get_user_by_id(user_id)
+    ip = request.headers.get('X-Forwarded-For', request.remote_addr) or ''
+    ip = ip.split(',')[0].strip()
+    
+    outbox = Outbox()
+    inflight = threading.BoundedSemaphore(WS_MAX_INFLIGHT)
+    ws_connections.add(user_id, outbox)
+    writer = threading.Thread(target=ws_writer, args=(ws, outbox), daemon=True, name='ws-writer')
+    writer.start()
+    outbox.put({'type': 'ready', 'user_id': user_id, 'chats_version': chats_version(user_id)})
+    metrics.incr('ws.opened')
+    authenticated_at = time.time()
+    
+    try:
+        while outbox.open:
+            raw = ws.receive(timeout=5)
+            
+            # Çıkış yapılmış oturumun bağlantısı da kapanır
+            if time.time() - authenticated_at > WS_REAUTH_INTERVAL:
+                if authenticate_token(token) != user_id:
+                    outbox.put({'type': 'error', 'code': 'auth_required', 'error': 'Oturum sona erdi'})
+                    break
+                authenticated_at = time.time()
+            
+            if raw is None:
+                continue
+            metrics.incr('ws.frames_in')
+            try:
+                frame = json.loads(raw)
+            except ValueError:
+                frame = None
+            if not isinstance(frame, dict):
+                outbox.put({'type': 'error', 'code': 'invalid', 'error': 'Geçersiz çerçeve'})
+                continue
+            
+            kind = frame.get('type')
+            if kind == 'send':
+                # Bağlantı başına eşzamanlı üretim sınırı (gelen yön back-pressure)
+                if not inflight.acquire(blocking=False):
+                    outbox.put({'type': 'error', 'id': frame.get('id'), 'chat_id': frame.get('chat_id'),
+                                'code': 'busy', 'error': 'Aynı anda çok fazla mesaj', 'retryable': True})
+                    continue
+                ws_executor.submit(ws_send_message, user_id, user['username'], frame, outbox, ip, inflight)
+            elif kind == 'history':
+                chat = db.get_chat(frame.get('chat_id'), user_id)
+                if chat:
+                    outbox.put({'type': 'history', 'chat': chat,
+                                'messages': db.get_chat_messages(chat['id'], user_id=user_id)})
+                else:
+                    outbox.put({'type': 'error', 'chat_id': frame.get('chat_id'), 'code': 'not_found',
+                                'error': 'Chat bulunamadı'})
+            elif kind == 'chats':
+                outbox.put(chat_list_frame(user_id))
+            elif kind == 'ping':
+                outbox.put({'type': 'pong'})
+    finally:
+        outbox.close()
+        ws_connections.remove(user_id, outbox)
+        writer.join(timeout=2)
+        metrics.incr('ws.closed')
+
+if Sock and WS_MAX_SOCKETS > 0:
+    Sock().route('/ws', bp=bp)(chat_socket)
+
+# -----------------------------
+# APP FACTORY
+# -----------------------------
+def create_app():
+    """
+    Flask uygulamasını kur
+    Şema kontrolü süreç başına bir kez yapılır; gunicorn master'ı bunu
+    önceden yaptıysa PAHIY_SCHEMA_READY=1 ile worker'larda atlanır.
+    Model sağlayıcısı ilk sohbet isteğinde yüklenir.
+    """
+    app = Flask(__name__)
+    app.secret_key = os.environ.get("SECRET_KEY", "pahiy-ai-secret-key-change-in-production")
+
+    # CORS ayarları - Production'da specific domains kullan
+    if ENVIRONMENT == "production":
+        allowed_origins = os.environ.get('CORS_ORIGINS', '').split(',')
+        CORS(app, supports_credentials=True, origins=allowed_origins)
+    else:
+        CORS(app, supports_credentials=True, origins=["*"])
+
+    if os.environ.get("PAHIY_SCHEMA_READY") != "1":
+        db.init_db()
+
+    app.register_blueprint(bp)
+    # Kabul kontrolünün reddettiği istekler de kaydedilsin diye ilk kanca
+    capture.init_capture(app)
+    admission.init_admission(app)
+    init_responses(app)
+    init_profiling(app, db)
+    return app
+
+def reinit_after_fork():
+    """
+    gunicorn post_fork hook'u: master'dan miras kalan süreç durumunu sıfırla
+    Thread'ler fork'tan sağ çıkmaz, bu yüzden arka plan thread'i olan
+    bileşenler worker'da yeniden kurulur. SQLite bağlantıları istek başına
+    açıldığı için paylaşılan bağlantı yoktur.
+    """
+    global quota, scheduler, history
+    db.reset_after_fork()
+    kv.reset_after_fork()
+    tasks.reset_after_fork()
+    quota = QuotaManager(db)
+    scheduler = FairScheduler()
+    history = HistoryCache()
+    admission.reset_after_fork()
+
+app = create_app()
+
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
     print("=" * 50)
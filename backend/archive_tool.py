@@ -0,0 +1,56 @@
+"""
+Mesaj arşivleme aracı
+
+Uzun süredir açılmayan chatlerin mesajlarını sıkıştırılmış arşive taşır
+ve kazanılan alanı raporlar. Cron / Railway scheduled job ile çalıştırılabilir.
+
+Kullanım:
+    python backend/archive_tool.py --idle-days 90
+    python backend/archive_tool.py --stats
+
+Geri yükleme gecikmesi worker'larda ölçülür: /api/metrics -> timings.archive.rehydrate
+"""
+import argparse
+import time
+
+from storage import create_storage
+
+
+def format_bytes(size):
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if abs(size) < 1024:
+            return f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} TB"
+
+
+def print_stats(db):
+    stats = db.get_archive_stats()
+    ratio = stats['raw_bytes'] / stats['stored_bytes'] if stats['stored_bytes'] else 0
+    print(f"Arşivdeki chat: {stats['chats']}, mesaj: {stats['messages']}")
+    print(f"Ham boyut: {format_bytes(stats['raw_bytes'])}, saklanan: {format_bytes(stats['stored_bytes'])}, "
+          f"kazanılan: {format_bytes(stats['saved_bytes'])} (oran {ratio:.1f}x)")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--db', default='pahiy_ai.db')
+    parser.add_argument('--idle-days', type=int, default=90)
+    parser.add_argument('--limit', type=int, default=500)
+    parser.add_argument('--stats', action='store_true', help='sadece arşiv istatistiklerini göster')
+    args = parser.parse_args()
+
+    db = create_storage(args.db)
+
+    if not args.stats:
+        started = time.perf_counter()
+        stats = db.archive_idle_chats(args.idle_days, args.limit)
+        print(f"{stats['chats']} chat ({stats['messages']} mesaj) arşivlendi, "
+              f"{format_bytes(stats['raw_bytes'])} -> {format_bytes(stats['stored_bytes'])}, "
+              f"{time.perf_counter() - started:.2f} s")
+
+    print_stats(db)
+
+
+if __name__ == '__main__':
+    main()
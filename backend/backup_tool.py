@@ -0,0 +1,364 @@
+"""
+Çevrimiçi yedekleme aracı
+
+Worker'lar çalışırken veritabanı dosyalarının (global + shard'lar) tutarlı
+anlık görüntüsünü alır. Dosya kopyalamak yerine SQLite backup API'si
+kullanılır: sayfalar `--pages`'lık adımlarla kopyalanır, adımlar arasında
+`--sleep-ms` beklenir; disk okuması yayılır, yazıcılar beklemez.
+Kopya boyunca kaynakta bir okuma transaction'ı açık tutulur; WAL modunda
+bu, yedeği başladığı ana sabitler ve araya giren yazmalar kopyayı baştan
+başlatmaz (WAL dosyası yedek bitene kadar checkpoint'le küçülmez). WAL
+dışındaki dosyalarda okuma kilidi yazıcıları bekleteceği için tutulmaz;
+kopya araya giren yazmalarla `--max-restarts` kez yeniden başlarsa tek
+adımda bitirilir.
+
+Her yedek backups/<zaman>/ dizinidir: dosyalar .part adıyla yazılır,
+bütünlük kontrolünden (PRAGMA integrity_check) geçince yerine taşınır,
+en son manifest.json yazılır. Manifest'i olmayan dizin yarım kalmıştır.
+Shard'lar ayrı ayrı kopyalanır; aynı ana değil, birkaç saniye içindeki
+anlara aittirler. Yedek dosya başına tutarlıdır, dosyalar arası değil:
+global kopyadan sonra bir shard'a yazılan chat, global dosyadaki
+yönlendirme/kullanıcı kaydıyla eşleşmeyebilir. Manifest'te her dosyanın
+kopyalandığı an (copied_at) ve "consistency": "per-file" yazılır.
+
+Geri yükleme de backup API'siyle canlı dosyanın içine yapılır (tek
+transaction); önce mevcut durumun yedeği alınır. Servis durdurulmuş
+olmalıdır (--service-stopped): worker'lardaki geçmiş önbelleği, oturum
+önbelleği ve kota sayaçları eski veriyi gösterir. Paylaşılan KV deposu
+(KV_URL) geri yüklemeden sonra boşaltılır. Yedekte karşılığı olmayan
+canlı shard dosyası varsa geri yükleme reddedilir; --move-extra ile bu
+dosyalar <ad>.pre-restore-<zaman> adıyla kenara taşınır.
+
+Yalnızca SQLite kurulumları içindir; DATABASE_URL PostgreSQL ise araç
+çalışmayı reddeder (pg_dump / pg_basebackup kullanın).
+
+Kullanım:
+    python backend/backup_tool.py create [--pages 256] [--sleep-ms 20] [--keep 7]
+    python backend/backup_tool.py list
+    python backend/backup_tool.py verify [--snapshot 20240101-030000]
+    python backend/backup_tool.py restore --snapshot latest --service-stopped [--move-extra]
+    python backend/backup_tool.py prune --keep 7
+"""
+import argparse
+import glob
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import time
+from datetime import datetime
+
+from archive_tool import format_bytes
+from database import Database
+from kv import get_kv
+from storage import uses_postgres
+
+BACKUP_DIR = os.environ.get("BACKUP_DIR", "backups")
+BACKUP_KEEP = int(os.environ.get("BACKUP_KEEP", 7))
+BACKUP_PAGES = int(os.environ.get("BACKUP_PAGES", 256))
+BACKUP_SLEEP = float(os.environ.get("BACKUP_SLEEP_MS", 20)) / 1000
+BACKUP_MAX_RESTARTS = int(os.environ.get("BACKUP_MAX_RESTARTS", 3))
+
+MANIFEST = 'manifest.json'
+
+
+class BackupRestarted(Exception):
+    """Kaynak her adım arasında değiştiği için artımlı kopya ilerleyemiyor"""
+
+
+class RestoreRefused(Exception):
+    """Yedek canlı dosya düzeniyle eşleşmiyor; hiçbir dosyaya yazılmadı"""
+
+
+def copy_database(src_path, dst_path, pages=BACKUP_PAGES, sleep=BACKUP_SLEEP, max_restarts=BACKUP_MAX_RESTARTS):
+    """
+    src_path'in tutarlı kopyasını dst_path'e yaz; {'pages', 'steps', 'restarts', 'mode', 'seconds'}
+    Kopya tek dosyadır (journal_mode=DELETE), yanında -wal dosyası gerekmez.
+    """
+    started = time.perf_counter()
+    stats = {'pages': 0, 'steps': 0, 'restarts': 0, 'mode': 'incremental'}
+    last_remaining = None
+
+    def progress(status, remaining, total):
+        nonlocal last_remaining
+        stats['steps'] += 1
+        stats['pages'] = total
+        if last_remaining is not None and remaining > last_remaining:
+            stats['restarts'] += 1
+            if stats['restarts'] > max_restarts:
+                raise BackupRestarted()
+        last_remaining = remaining
+        if remaining and sleep:
+            time.sleep(sleep)
+
+    src = sqlite3.connect(src_path, timeout=30, isolation_level=None)
+    try:
+        if pages <= 0:
+            stats['mode'] = 'single-step'
+        elif src.execute('PRAGMA journal_mode').fetchone()[0] == 'wal':
+            src.execute('BEGIN')
+            src.execute('SELECT COUNT(*) FROM sqlite_master').fetchone()
+        dst = sqlite3.connect(dst_path)
+        try:
+            try:
+                src.backup(dst, pages=pages, progress=progress)
+            except BackupRestarted:
+                stats['mode'] = 'single-step'
+                src.backup(dst)
+            dst.execute('PRAGMA journal_mode=DELETE')
+        finally:
+            dst.close()
+    finally:
+        src.close()
+
+    stats['seconds'] = round(time.perf_counter() - started, 3)
+    return stats
+
+
+def integrity_check(path) -> str:
+    conn = sqlite3.connect(path)
+    try:
+        rows = conn.execute('PRAGMA integrity_check').fetchall()
+    finally:
+        conn.close()
+    return '; '.join(row[0] for row in rows[:5])
+
+
+def file_sha256(path) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+# ---------- yedekler ----------
+
+def list_snapshots(backup_dir=BACKUP_DIR):
+    """Tamamlanmış yedekler, eskiden yeniye: [(ad, manifest)]"""
+    snapshots = []
+    if not os.path.isdir(backup_dir):
+        return snapshots
+    for name in os.listdir(backup_dir):
+        manifest_path = os.path.join(backup_dir, name, MANIFEST)
+        if os.path.isfile(manifest_path):
+            with open(manifest_path) as f:
+                snapshots.append((name, json.load(f)))
+    return sorted(snapshots, key=lambda snapshot: snapshot[1]['created_at'])
+
+
+def resolve_snapshot(name, backup_dir=BACKUP_DIR):
+    snapshots = list_snapshots(backup_dir)
+    if not snapshots:
+        raise SystemExit(f"{backup_dir} içinde tamamlanmış yedek yok")
+    if name in (None, 'latest'):
+        return snapshots[-1]
+    for snapshot in snapshots:
+        if snapshot[0] == name:
+            return snapshot
+    raise SystemExit(f"Yedek bulunamadı: {name}")
+
+
+def create_snapshot(db, backup_dir=BACKUP_DIR, pages=BACKUP_PAGES, sleep=BACKUP_SLEEP,
+                    max_restarts=BACKUP_MAX_RESTARTS, label=None):
+    """
+    Tüm veritabanı dosyalarını yeni bir yedek dizinine kopyala; (ad, manifest)
+    Dosyalar sırayla kopyalanır, her biri kendi kopyalandığı ana aittir
+    (dosyalar arası tutarlılık yoktur, bkz. modül açıklaması).
+    """
+    created_at = datetime.now()
+    name = created_at.strftime('%Y%m%d-%H%M%S') + (f'-{label}' if label else '')
+    while os.path.exists(os.path.join(backup_dir, name)):
+        name += '-1'
+    target = os.path.join(backup_dir, name)
+    os.makedirs(target)
+
+    manifest = {'created_at': created_at.isoformat(), 'consistency': 'per-file', 'files': []}
+    for path in db.router.paths():
+        if not os.path.exists(path):
+            continue
+        filename = os.path.basename(path)
+        part = os.path.join(target, filename + '.part')
+        copied_at = datetime.now().isoformat()
+        stats = copy_database(path, part, pages, sleep, max_restarts)
+        check = integrity_check(part)
+        if check != 'ok':
+            raise RuntimeError(f"{filename} yedeği bütünlük kontrolünden geçmedi: {check}")
+        os.replace(part, os.path.join(target, filename))
+        manifest['files'].append({'name': filename, 'bytes': os.path.getsize(os.path.join(target, filename)),
+                                  'sha256': file_sha256(os.path.join(target, filename)),
+                                  'copied_at': copied_at, **stats})
+
+    with open(os.path.join(target, MANIFEST + '.part'), 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(os.path.join(target, MANIFEST + '.part'), os.path.join(target, MANIFEST))
+    return name, manifest
+
+
+def verify_snapshot(name, manifest, backup_dir=BACKUP_DIR):
+    """Sağlama toplamı ve bütünlük kontrolü; hatalar listesi (boş: sağlam)"""
+    errors = []
+    for entry in manifest['files']:
+        path = os.path.join(backup_dir, name, entry['name'])
+        if not os.path.isfile(path):
+            errors.append(f"{entry['name']}: dosya yok")
+            continue
+        if file_sha256(path) != entry['sha256']:
+            errors.append(f"{entry['name']}: sağlama toplamı tutmuyor")
+            continue
+        check = integrity_check(path)
+        if check != 'ok':
+            errors.append(f"{entry['name']}: {check}")
+    return errors
+
+
+def prune_snapshots(keep=BACKUP_KEEP, backup_dir=BACKUP_DIR):
+    """En yeni `keep` yedek dışındakileri ve yarım kalmış dizinleri sil; silinen adlar"""
+    snapshots = list_snapshots(backup_dir)
+    complete = [name for name, _ in snapshots]
+    keep_names = set(complete[-keep:]) if keep > 0 else set()
+    # Yarım dizinler yalnızca sonrasında tamamlanmış bir yedek varsa silinir (sürmekte olabilir)
+    newest = datetime.fromisoformat(snapshots[-1][1]['created_at']).timestamp() if snapshots else 0
+    removed = []
+    for name in sorted(os.listdir(backup_dir)) if os.path.isdir(backup_dir) else []:
+        path = os.path.join(backup_dir, name)
+        if name in keep_names or not os.path.isdir(path):
+            continue
+        if name in complete or os.path.getmtime(path) < newest:
+            shutil.rmtree(path)
+            removed.append(name)
+    return removed
+
+
+def live_files(db):
+    """Yapılandırmadaki ve dizinde bulunan (eski shard sayısından kalan) veritabanı dosyaları"""
+    base, ext = os.path.splitext(db.db_path)
+    paths = set(db.router.paths()) | set(glob.glob(f"{glob.escape(base)}.shard*{ext or '.db'}"))
+    return sorted(path for path in paths if os.path.exists(path))
+
+
+def extra_files(db, manifest):
+    """Yedekte karşılığı olmayan canlı dosyalar"""
+    names = {entry['name'] for entry in manifest['files']}
+    return [path for path in live_files(db) if os.path.basename(path) not in names]
+
+
+def check_restore(db, manifest, move_extra=False):
+    """Geri yükleme bu düzene yapılabilir mi; yapılamıyorsa RestoreRefused"""
+    expected = {os.path.basename(path) for path in db.router.paths()}
+    unknown = [entry['name'] for entry in manifest['files'] if entry['name'] not in expected]
+    if unknown:
+        raise RestoreRefused(f"Yedekteki dosyalar bu shard yapılandırmasında yok: {', '.join(unknown)} "
+                             f"(DB_SHARD_COUNT yedek alındığındaki değerle aynı olmalı)")
+    extra = extra_files(db, manifest)
+    if extra and not move_extra:
+        raise RestoreRefused(f"Yedekte karşılığı olmayan canlı dosyalar var: "
+                             f"{', '.join(os.path.basename(path) for path in extra)}; "
+                             f"bu dosyalardaki chatler geri yüklenen global veritabanında yönlendirilmez. "
+                             f"Kenara taşımak için --move-extra")
+
+
+def restore_snapshot(db, name, manifest, backup_dir=BACKUP_DIR, move_extra=False, kv=None):
+    """
+    Yedekteki dosyaları canlı dosyaların içine (dosya başına tek transaction) yaz
+    Servis durdurulmuş olmalıdır; çalışan worker'ların süreç içi önbellekleri
+    (geçmiş, oturum, shard yönlendirmesi) geri yüklenen veriyi görmez.
+    Yedekte olmayan canlı dosyalar move_extra ile kenara taşınır, yoksa
+    hiçbir şeye dokunulmadan RestoreRefused. Sonunda paylaşılan KV deposu (oturum
+    önbelleği, idempotency yanıtları, kota sayaçları) boşaltılır.
+    """
+    check_restore(db, manifest, move_extra)
+    directory = os.path.dirname(os.path.abspath(db.db_path))
+    stamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+    for path in extra_files(db, manifest):
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(path + suffix):
+                os.replace(path + suffix, f"{path}.pre-restore-{stamp}{suffix}")
+        print(f"{os.path.basename(path)} yedekte yok, {os.path.basename(path)}.pre-restore-{stamp} olarak taşındı")
+    for entry in manifest['files']:
+        src = sqlite3.connect(os.path.join(backup_dir, name, entry['name']))
+        dst = sqlite3.connect(os.path.join(directory, entry['name']), timeout=30)
+        try:
+            src.backup(dst)
+            # Yedek DELETE modunda; canlı dosya WAL'da kalır
+            dst.execute('PRAGMA journal_mode=WAL')
+        finally:
+            dst.close()
+            src.close()
+        print(f"{entry['name']} geri yüklendi")
+    # KV'deki değerler geri yüklenen veriyle çelişir; kota kovaları veritabanından yeniden yüklenir
+    (kv if kv is not None else get_kv()).clear()
+    print("KV deposu boşaltıldı")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('command', choices=['create', 'list', 'verify', 'restore', 'prune'])
+    parser.add_argument('--db', default='pahiy_ai.db')
+    parser.add_argument('--dir', default=BACKUP_DIR, help='yedek dizini')
+    parser.add_argument('--snapshot', help='yedek adı (varsayılan: en yenisi)')
+    parser.add_argument('--pages', type=int, default=BACKUP_PAGES, help='adım başına sayfa (-1: tek adım)')
+    parser.add_argument('--sleep-ms', type=float, default=BACKUP_SLEEP * 1000)
+    parser.add_argument('--max-restarts', type=int, default=BACKUP_MAX_RESTARTS)
+    parser.add_argument('--keep', type=int, default=BACKUP_KEEP, help='create / prune sonrası tutulacak yedek')
+    parser.add_argument('--no-safety', action='store_true', help='restore öncesi mevcut durumu yedekleme')
+    parser.add_argument('--service-stopped', action='store_true',
+                        help='restore: servisin (tüm worker\'ların) durdurulduğunu onayla')
+    parser.add_argument('--move-extra', action='store_true',
+                        help='restore: yedekte karşılığı olmayan canlı shard dosyalarını kenara taşı')
+    args = parser.parse_args()
+
+    if uses_postgres():
+        # --db'deki SQLite dosyası uygulamanın verisi değildir; yedeği boş/eski dosyadan alınırdı
+        raise SystemExit("DATABASE_URL PostgreSQL'i gösteriyor; bu araç yalnızca SQLite dosyalarını "
+                         "yedekler. PostgreSQL için pg_dump / pg_basebackup kullanın.")
+
+    db = Database(args.db, init_schema=False)
+
+    if args.command == 'create':
+        name, manifest = create_snapshot(db, args.dir, args.pages, args.sleep_ms / 1000, args.max_restarts)
+        for entry in manifest['files']:
+            print(f"{entry['name']}: {format_bytes(entry['bytes'])}, {entry['steps']} adım, "
+                  f"{entry['restarts']} yeniden başlama ({entry['mode']}), {entry['seconds']:.2f} s")
+        print(f"Yedek: {os.path.join(args.dir, name)}")
+        removed = prune_snapshots(args.keep, args.dir)
+        if removed:
+            print(f"Silinen eski yedekler: {', '.join(removed)}")
+    elif args.command == 'list':
+        for name, manifest in list_snapshots(args.dir):
+            size = sum(entry['bytes'] for entry in manifest['files'])
+            print(f"{name}  {len(manifest['files'])} dosya  {format_bytes(size)}")
+    elif args.command == 'verify':
+        name, manifest = resolve_snapshot(args.snapshot, args.dir)
+        errors = verify_snapshot(name, manifest, args.dir)
+        for error in errors:
+            print(f"⚠️ {error}")
+        print(f"{name}: {'sağlam' if not errors else 'BOZUK'}")
+        if errors:
+            raise SystemExit(1)
+    elif args.command == 'restore':
+        if not args.service_stopped:
+            raise SystemExit("Geri yüklemeden önce servisi durdurun ve --service-stopped ile onaylayın "
+                             "(çalışan worker'ların önbellekleri eski veriyi gösterir)")
+        name, manifest = resolve_snapshot(args.snapshot, args.dir)
+        errors = verify_snapshot(name, manifest, args.dir)
+        if errors:
+            raise SystemExit(f"{name} doğrulanamadı, geri yüklenmedi: {'; '.join(errors)}")
+        try:
+            check_restore(db, manifest, args.move_extra)
+        except RestoreRefused as e:
+            raise SystemExit(f"{name} geri yüklenmedi: {e}")
+        if not args.no_safety:
+            safety, _ = create_snapshot(db, args.dir, args.pages, args.sleep_ms / 1000, args.max_restarts,
+                                        label='pre-restore')
+            print(f"Mevcut durum yedeklendi: {safety}")
+        restore_snapshot(db, name, manifest, args.dir, move_extra=args.move_extra)
+        print(f"{name} geri yüklendi; servisi başlatabilirsiniz")
+    else:
+        removed = prune_snapshots(args.keep, args.dir)
+        print(f"{len(removed)} yedek silindi")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,162 @@
+"""
+Trafik kaydı (opsiyonel)
+CAPTURE=1 ise isteklerin biçimi CAPTURE_DIR altına worker başına dönen
+NDJSON dosyalarına yazılır: route kalıbı, gövde boyutları, süre, durum,
+modelde geçen süre ve kullanıcı / chat takma adları. İçerik, token, IP ve
+gerçek kimlikler yazılmaz; takma adlar SECRET_KEY ile HMAC'lenir, böylece
+aynı kullanıcının istek sırası worker'lar arasında da izlenebilir.
+benchmarks/replay.py bu dosyaları yerel bir sunucuya yeniden oynatır.
+
+Kayıt örneği:
+  {"ts": 1718000000.123, "endpoint": "main.chat", "route": "/api/chat", "method": "POST",
+   "user": "3f9a1c0b2d4e", "chat": "a81c...", "status": 200, "req_bytes": 88,
+   "resp_bytes": 412, "ms": 1234.5, "model_ms": 1180.2, "msg_chars": 42}
+"""
+import hashlib
+import hmac
+import json
+import os
+import random
+import threading
+import time
+
+from flask import request
+
+import metrics
+
+CAPTURE_ENABLED = os.environ.get("CAPTURE", "0") == "1"
+CAPTURE_DIR = os.environ.get("CAPTURE_DIR", "captures")
+CAPTURE_SAMPLE_RATE = float(os.environ.get("CAPTURE_SAMPLE_RATE", 1.0))
+CAPTURE_MAX_BYTES = int(os.environ.get("CAPTURE_MAX_MB", 50)) * 1024 * 1024
+CAPTURE_BACKUPS = int(os.environ.get("CAPTURE_BACKUPS", 5))
+# Takma adlar için anahtar; sunucular aynı SECRET_KEY'i kullanırsa takma adlar da aynıdır
+CAPTURE_SALT = os.environ.get("SECRET_KEY", "pahiy-ai-secret-key-change-in-production").encode()
+
+# Yolu olduğu gibi yazılan route'lar (statik dosyalar); diğerlerinde yalnızca kalıp yazılır
+STATIC_ENDPOINTS = {'main.serve_index', 'main.serve_chat', 'main.serve_css', 'main.serve_js', 'main.serve_static'}
+
+_local = threading.local()
+
+
+def pseudonym(value) -> str:
+    if value is None:
+        return None
+    return hmac.new(CAPTURE_SALT, str(value).encode(), hashlib.sha256).hexdigest()[:12]
+
+
+class RotatingWriter:
+    """capture-<pid>.ndjson; max_bytes aşılınca .1, .2 ... olarak kaydırılır"""
+
+    def __init__(self, directory=CAPTURE_DIR, max_bytes=CAPTURE_MAX_BYTES, backups=CAPTURE_BACKUPS):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self._file = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _open(self):
+        os.makedirs(self.directory, exist_ok=True)
+        self.path = os.path.join(self.directory, f"capture-{os.getpid()}.ndjson")
+        self._file = open(self.path, 'a', encoding='utf-8')
+        self._pid = os.getpid()
+
+    def _rotate(self):
+        self._file.close()
+        for i in range(self.backups - 1, 0, -1):
+            if os.path.exists(f"{self.path}.{i}"):
+                os.replace(f"{self.path}.{i}", f"{self.path}.{i + 1}")
+        if self.backups > 0:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+        self._file = open(self.path, 'a', encoding='utf-8')
+
+    def write(self, record):
+        line = json.dumps(record, ensure_ascii=False, separators=(',', ':')) + '\n'
+        with self._lock:
+            # Fork sonrası worker kendi dosyasını açar
+            if self._pid != os.getpid():
+                self._open()
+            if self._file.tell() + len(line) > self.max_bytes:
+                self._rotate()
+            self._file.write(line)
+            self._file.flush()
+
+
+writer = RotatingWriter()
+
+
+def note(**fields):
+    """Sürmekte olan kayda alan ekle (ör. query_ai modelde geçen süreyi bildirir)"""
+    record = getattr(_local, 'record', None)
+    if record is not None:
+        record.update(fields)
+
+
+def begin():
+    """Kayıt başlat; örneklenmediyse None"""
+    if not CAPTURE_ENABLED or random.random() >= CAPTURE_SAMPLE_RATE:
+        _local.record = None
+        return None
+    _local.record = {'ts': round(time.time(), 3), 'started': time.perf_counter()}
+    return _local.record
+
+
+def end(**fields):
+    """Kaydı tamamla ve yaz"""
+    record = getattr(_local, 'record', None)
+    if record is None:
+        return
+    _local.record = None
+    started = record.pop('started')
+    record.update(fields)
+    record['ms'] = round((time.perf_counter() - started) * 1000, 1)
+    try:
+        writer.write(record)
+        metrics.incr('capture.records')
+    except OSError as e:
+        print(f"⚠️ Trafik kaydı yazılamadı: {e}")
+
+
+# ---------- Flask kancaları ----------
+
+def _start():
+    begin()
+
+
+def _finish(response):
+    if getattr(_local, 'record', None) is None:
+        return response
+    endpoint = request.endpoint or 'unknown'
+    rule = request.url_rule.rule if request.url_rule else None
+    chat_id = (request.view_args or {}).get('chat_id')
+    msg_chars = None
+    if endpoint == 'main.chat':
+        body = request.get_json(silent=True) or {}
+        chat_id = body.get('chat_id')
+        msg_chars = len(str(body.get('message') or ''))
+    elif endpoint == 'main.create_chat' and response.is_json:
+        # Tekrarda yeni chat bu takma adla eşlenir
+        chat_id = (response.get_json(silent=True) or {}).get('chat_id')
+    end(endpoint=endpoint, route=request.path if endpoint in STATIC_ENDPOINTS else rule,
+        method=request.method, user=pseudonym(getattr(request, 'user_id', None)), chat=pseudonym(chat_id),
+        status=response.status_code, req_bytes=request.content_length or 0,
+        resp_bytes=response.content_length if response.content_length is not None else -1,
+        **({'msg_chars': msg_chars} if msg_chars is not None else {}))
+    return response
+
+
+def _cleanup(exc=None):
+    # after_request'e ulaşmayan (hata fırlatan) istekler yazılmaz
+    _local.record = None
+
+
+def init_capture(app):
+    """Trafik kaydı açıksa istek kancalarını kur (diğer kancalardan önce; resp_bytes sıkıştırılmış boyuttur)"""
+    if not CAPTURE_ENABLED:
+        return
+    app.before_request(_start)
+    app.after_request(_finish)
+    app.teardown_request(_cleanup)
+    print(f"Trafik kaydı açık: oran={CAPTURE_SAMPLE_RATE}, dizin={CAPTURE_DIR}")
@@ -1,24 +1,416 @@
 import sqlite3
 import json
+import os
+import threading
 from datetime import datetime
-import hashlib
 import secrets
-from typing import Optional, List, Dict
+import time
+import zlib
+from concurrent.futures import Future
+from queue import Queue, Empty
+from typing import Optional, List, Dict, Iterable, Iterator
 
-class Database:
-    def __init__(self, db_path='pahiy_ai.db'):
+import metrics
+from storage import Storage
+
+
+def compress_blob(data: bytes):
+    """Arşiv verisini sıkıştır: zstandard kuruluysa zstd, değilse zlib"""
+    try:
+        import zstandard
+        return 'zstd', zstandard.ZstdCompressor(level=10).compress(data)
+    except ImportError:
+        return 'zlib', zlib.compress(data, 9)
+
+
+def decompress_blob(codec: str, blob: bytes) -> bytes:
+    if codec == 'zstd':
+        import zstandard
+        return zstandard.ZstdDecompressor().decompress(blob)
+    return zlib.decompress(blob)
+
+
+SHARD_COUNT = int(os.environ.get("DB_SHARD_COUNT", 1))
+ROUTING_CACHE_TTL = float(os.environ.get("DB_ROUTING_CACHE_TTL", 2))
+
+# Mesaj yazma modu: direct (her çağrı kendi transaction'ı) veya group (toplu commit)
+MESSAGE_WRITE_MODE = os.environ.get("DB_MESSAGE_WRITE_MODE", "direct")
+GROUP_COMMIT_WINDOW = float(os.environ.get("DB_GROUP_COMMIT_WINDOW_MS", 5)) / 1000
+GROUP_COMMIT_MAX_ROWS = int(os.environ.get("DB_GROUP_COMMIT_MAX_ROWS", 256))
+
+# Kenar çubuğunda gösterilen son mesaj önizlemesinin uzunluğu
+PREVIEW_LENGTH = 120
+
+# Silinen / temizlenen chatlerin mesajları arka planda partiler halinde silinir
+PURGE_BATCH_SIZE = int(os.environ.get("DB_PURGE_BATCH_SIZE", 500))
+PURGE_PAUSE = float(os.environ.get("DB_PURGE_PAUSE_MS", 50)) / 1000
+PURGE_GRACE = int(os.environ.get("DB_PURGE_GRACE_SECONDS", 600))
+PURGE_INTERVAL = float(os.environ.get("DB_PURGE_INTERVAL", 60))
+
+# purge_queue'daki bir iş kapsayan mesajlar silinmeyi beklerken görünmez (m: messages)
+VISIBLE_MESSAGE = '''NOT EXISTS (SELECT 1 FROM purge_queue q
+    WHERE q.chat_id = m.chat_id AND (q.through_id IS NULL OR m.id <= q.through_id))'''
+
+
+def chat_summary_updates(rows: List[tuple]) -> List[tuple]:
+    """
+    (chat_id, role, content) satırlarından chat özet güncellemeleri
+    (eklenen mesaj sayısı, son mesaj önizlemesi, son rol, chat_id)
+    """
+    summaries = {}
+    for chat_id, role, content in rows:
+        count = summaries[chat_id][0] if chat_id in summaries else 0
+        summaries[chat_id] = (count + 1, content[:PREVIEW_LENGTH], role, chat_id)
+    return list(summaries.values())
+
+
+# Kullanıcı başına değişiklik sırası: chat veya mesajı değiştiren her transaction
+# önce sayacı artırır, değişen satırlar yeni değeri alır. SQLite'ta yazmalar
+# sıralı olduğu için sıra, commit sırasıyla aynıdır (delta senkronizasyonu).
+SEQ_BUMP_SQL = '''
+    INSERT INTO sync_state (user_id, seq)
+    SELECT user_id, 1 FROM chats WHERE id = ?
+    ON CONFLICT(user_id) DO UPDATE SET seq = seq + 1
+'''
+CHAT_SEQ = '(SELECT seq FROM sync_state s WHERE s.user_id = chats.user_id)'
+
+SUMMARY_UPDATE_SQL = f'''
+    UPDATE chats SET updated_at = CURRENT_TIMESTAMP,
+                     message_count = message_count + ?,
+                     last_message_preview = ?,
+                     last_role = ?,
+                     seq = {CHAT_SEQ}
+    WHERE id = ?
+'''
+
+# Mesaj, chat'in (SUMMARY_UPDATE_SQL ile yeni almış olduğu) sırasını taşır
+MESSAGE_INSERT_SQL = '''
+    INSERT INTO messages (chat_id, role, content, seq)
+    VALUES (?, ?, ?, (SELECT seq FROM chats WHERE id = ?))
+'''
+
+
+def write_message_rows(cursor, rows: List[tuple]):
+    """(chat_id, role, content) satırlarını özet ve sıra güncellemesiyle birlikte yaz"""
+    updates = chat_summary_updates(rows)
+    cursor.executemany(SEQ_BUMP_SQL, [(update[-1],) for update in updates])
+    cursor.executemany(SUMMARY_UPDATE_SQL, updates)
+    cursor.executemany(MESSAGE_INSERT_SQL, [(chat_id, role, content, chat_id) for chat_id, role, content in rows])
+
+
+def read_chat_states(cursor, chat_ids) -> Dict[str, Dict]:
+    """Yazma transaction'ı içinde chatlerin yeni seq / message_count değerleri (geçmiş önbelleği damgası)"""
+    chat_ids = list(dict.fromkeys(chat_ids))
+    cursor.execute(f'''
+        SELECT id, seq, message_count FROM chats WHERE id IN ({','.join('?' * len(chat_ids))})
+    ''', chat_ids)
+    return {row['id']: {'seq': row['seq'], 'message_count': row['message_count']} for row in cursor.fetchall()}
+
+
+class ShardRouter:
+    """
+    user_id -> shard eşlemesi
+    Shard 0 global veritabanı dosyasının kendisidir; diğer shard'lar
+    pahiy_ai.shardN.db dosyalarıdır. Kullanıcının shard'ı users.shard
+    kolonunda tutulur ve kısa süreli önbelleğe alınır. Taşıma sırasında
+    users.shard_moving = 1 olur, bu kullanıcı için işlemler taşıma bitene
+    kadar bekler.
+    """
+
+    def __init__(self, db_path, shard_count=SHARD_COUNT, cache_ttl=ROUTING_CACHE_TTL):
         self.db_path = db_path
-        self.init_db()
+        self.shard_count = max(1, shard_count)
+        self.cache_ttl = cache_ttl
+        self._cache = {}
+        self._lock = threading.Lock()
+
+    def path(self, shard: int) -> str:
+        if shard == 0:
+            return self.db_path
+        base, ext = os.path.splitext(self.db_path)
+        return f"{base}.shard{shard}{ext or '.db'}"
+
+    def paths(self) -> List[str]:
+        return [self.path(shard) for shard in range(self.shard_count)]
+
+    def home_shard(self, user_id: int) -> int:
+        """Yeni kullanıcının (ve rebalance hedefinin) shard'ı"""
+        return user_id % self.shard_count
+
+    def shard_for(self, user_id: int, wait_timeout: float = 10) -> int:
+        if self.shard_count == 1:
+            return 0
+
+        now = time.time()
+        with self._lock:
+            cached = self._cache.get(user_id)
+        if cached and cached[1] > now:
+            return cached[0]
+
+        deadline = now + wait_timeout
+        while True:
+            conn = sqlite3.connect(self.db_path)
+            row = conn.execute('SELECT shard, shard_moving FROM users WHERE id = ?', (user_id,)).fetchone()
+            conn.close()
+            if not row or not row[1]:
+                break
+            if time.time() > deadline:
+                raise sqlite3.OperationalError(f'Kullanıcı {user_id} shard taşıması sürüyor')
+            time.sleep(0.05)
+
+        shard = row[0] if row and row[0] is not None else 0
+        with self._lock:
+            self._cache[user_id] = (shard, time.time() + self.cache_ttl)
+        return shard
+
+    def invalidate(self, user_id: int):
+        with self._lock:
+            self._cache.pop(user_id, None)
+
+
+class GroupCommitter:
+    """
+    Write-behind mesaj yazıcısı (group commit)
+    Her veritabanı dosyası için bir yazıcı thread'i vardır. Mesajlar kuyruğa
+    alınır; ilk mesajdan sonra en fazla `window` saniye ya da `max_rows`
+    satır biriktirilir ve hepsi tek transaction (tek fsync) ile yazılır.
+    Çağıran commit tamamlanana kadar bekler, yani yanıt dönmeden önce
+    mesaj kalıcıdır; yalnızca fsync maliyeti paylaşılır. Toplu transaction
+    hata verirse istekler tek tek yazılır; hata yalnızca hatalı isteğe döner.
+    """
+
+    def __init__(self, connect, window=GROUP_COMMIT_WINDOW, max_rows=GROUP_COMMIT_MAX_ROWS):
+        self.connect = connect
+        self.window = window
+        self.max_rows = max(1, max_rows)
+        self._queues = {}
+        self._lock = threading.Lock()
+
+    def submit(self, path: str, rows: List[tuple]) -> Future:
+        """rows: (chat_id, role, content) listesi; commit sonrası chat durumlarıyla tamamlanan Future döner"""
+        future = Future()
+        with self._lock:
+            queue = self._queues.get(path)
+            if queue is None:
+                queue = self._queues[path] = Queue()
+                threading.Thread(target=self._run, args=(path, queue), daemon=True,
+                                 name=f'group-commit-{os.path.basename(path)}').start()
+        queue.put((rows, future))
+        return future
+
+    def write(self, path: str, rows: List[tuple]) -> Dict[str, Dict]:
+        return self.submit(path, rows).result()
+
+    def _run(self, path, queue):
+        while True:
+            batch = [queue.get()]
+            row_count = len(batch[0][0])
+            deadline = time.perf_counter() + self.window
+            while row_count < self.max_rows:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    item = queue.get(timeout=remaining)
+                except Empty:
+                    break
+                batch.append(item)
+                row_count += len(item[0])
+            self._commit(path, batch, row_count)
+
+    def _write(self, path, rows):
+        conn = self.connect(path)
+        try:
+            cursor = conn.cursor()
+            write_message_rows(cursor, rows)
+            states = read_chat_states(cursor, [row[0] for row in rows])
+            conn.commit()
+        except Exception:
+            # Yazma kilidi hemen bırakılsın; ardından gelen tekil yazmalar beklemesin
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+        return states
+
+    def _commit(self, path, batch, row_count):
+        started = time.perf_counter()
+        try:
+            states = self._write(path, [row for item_rows, _ in batch for row in item_rows])
+        except Exception as e:
+            if len(batch) == 1:
+                batch[0][1].set_exception(e)
+                return
+            # Tek hatalı istek (ör. silinmiş chat) gruptaki diğerlerini düşürmesin:
+            # her istek kendi transaction'ında yeniden denenir, hata yalnızca sahibine gider
+            metrics.incr('db.group_commit.split')
+            for rows, future in batch:
+                try:
+                    future.set_result(self._write(path, rows))
+                except Exception as item_error:
+                    future.set_exception(item_error)
+            return
+
+        for _, future in batch:
+            future.set_result(states)
+        metrics.observe('db.group_commit', time.perf_counter() - started)
+        metrics.incr('db.group_commit.batches')
+        metrics.incr('db.group_commit.rows', row_count)
+
+
+class Purger:
+    """
+    Silinen ve temizlenen chatlerin mesajlarını arka planda siler
+    Silme isteği yalnızca purge_queue'ya bir iş ekler, mesajlar o anda
+    görünmez olur. Bu thread mesajları batch_size'lık transaction'larla,
+    aralarda `pause` bekleyerek siler; yazma kilidi hiçbir zaman uzun
+    tutulmaz. Silinen chat'in satırı, sürmekte olan isteklerin geç gelen
+    yazmaları yabancı anahtara takılmasın diye `grace` saniye sonra silinir.
+    Kuyruk veritabanında tutulduğu için yarıda kalan işler sonraki turda biter.
+    """
+
+    def __init__(self, connect, paths, batch_size=PURGE_BATCH_SIZE, pause=PURGE_PAUSE,
+                 grace=PURGE_GRACE, interval=PURGE_INTERVAL):
+        self.connect = connect
+        self.paths = paths
+        self.batch_size = max(1, batch_size)
+        self.pause = pause
+        self.grace = grace
+        self.interval = interval
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._pid = None
+
+    def wake(self):
+        """Thread'i (bu süreçte yoksa) başlat ve kuyruğu hemen işlemesini sağla"""
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._pid = os.getpid()
+                    threading.Thread(target=self._run, daemon=True, name='db-purge').start()
+        self._event.set()
+
+    def _run(self):
+        while True:
+            self._event.wait(self.interval)
+            self._event.clear()
+            pending = 0
+            for path in self.paths():
+                try:
+                    pending += self.purge(path)['pending']
+                except sqlite3.Error as e:
+                    print(f"⚠️ Mesaj temizleme başarısız ({path}): {e}")
+            metrics.set_gauge('db.purge.pending', pending)
+
+    def purge(self, path: str, grace: Optional[int] = None, batch_size: Optional[int] = None) -> Dict:
+        """
+        Dosyadaki kuyruğu işle; silinen mesaj ve chat sayısını ve bekleyen işleri döndür
+        grace / batch_size verilirse yalnızca bu çağrıda ayarların yerine geçer.
+        """
+        grace = self.grace if grace is None else grace
+        batch_size = max(1, batch_size or self.batch_size)
+        stats = {'messages': 0, 'chats': 0, 'pending': 0}
+        conn = self.connect(path)
+        try:
+            jobs = conn.execute('''
+                SELECT chat_id, through_id, drop_chat, queued_at <= datetime('now', ?) AS expired
+                FROM purge_queue
+                ORDER BY queued_at
+            ''', (f'-{int(grace)} seconds',)).fetchall()
+            
+            for job in jobs:
+                stats['messages'] += self._purge_messages(conn, job['chat_id'], job['through_id'], batch_size)
+                if job['drop_chat']:
+                    if not job['expired']:
+                        stats['pending'] += 1
+                        continue
+                    # Grace süresinde yazılan son mesajlar ON DELETE CASCADE ile gider
+                    cursor = conn.execute('DELETE FROM chats WHERE id = ? AND deleted_at IS NOT NULL',
+                                          (job['chat_id'],))
+                    stats['chats'] += cursor.rowcount
+                    conn.execute('DELETE FROM message_archive WHERE chat_id = ?', (job['chat_id'],))
+                # Bu arada aynı chat için yeni bir iş eklendiyse o kalır
+                conn.execute('''
+                    DELETE FROM purge_queue WHERE chat_id = ? AND through_id IS ? AND drop_chat = ?
+                ''', (job['chat_id'], job['through_id'], job['drop_chat']))
+                conn.commit()
+        finally:
+            conn.close()
+        
+        metrics.incr('db.purge.messages', stats['messages'])
+        metrics.incr('db.purge.chats', stats['chats'])
+        return stats
+
+    def _purge_messages(self, conn, chat_id: str, through_id: Optional[int], batch_size: int) -> int:
+        purged = 0
+        while True:
+            started = time.perf_counter()
+            cursor = conn.execute('''
+                DELETE FROM messages WHERE id IN (
+                    SELECT id FROM messages
+                    WHERE chat_id = ? AND (? IS NULL OR id <= ?)
+                    ORDER BY id
+                    LIMIT ?
+                )
+            ''', (chat_id, through_id, through_id, batch_size))
+            conn.commit()
+            metrics.observe('db.purge.batch', time.perf_counter() - started)
+            purged += cursor.rowcount
+            if cursor.rowcount < batch_size:
+                return purged
+            time.sleep(self.pause)
+
+
+class Database(Storage):
+    # Profilleme açıkken ifade sürelerini ölçen bağlantı sınıfıyla değiştirilir
+    connection_factory = sqlite3.Connection
     
-    def get_connection(self):
-        conn = sqlite3.connect(self.db_path)
+    def __init__(self, db_path='pahiy_ai.db', init_schema=True, shard_count=SHARD_COUNT,
+                 write_mode=MESSAGE_WRITE_MODE):
+        self.db_path = db_path
+        self.router = ShardRouter(db_path, shard_count)
+        self.committer = GroupCommitter(self._connect) if write_mode == 'group' else None
+        self.purger = Purger(self._connect, self.router.paths)
+        if init_schema:
+            self.init_db()
+    
+    def _connect(self, path: str):
+        conn = sqlite3.connect(path, factory=self.connection_factory)
         conn.row_factory = sqlite3.Row
+        # Bağlantı başına ayardır; kapalıyken ON DELETE CASCADE hiç çalışmaz
+        conn.execute('PRAGMA foreign_keys = ON')
         return conn
     
+    def get_connection(self):
+        """Global veritabanı (kullanıcılar, kotalar)"""
+        return self._connect(self.db_path)
+    
+    def get_shard_path(self, user_id: Optional[int] = None) -> str:
+        if user_id is None:
+            if self.router.shard_count > 1:
+                raise ValueError('Shard modunda user_id gereklidir')
+            return self.db_path
+        return self.router.path(self.router.shard_for(user_id))
+    
+    def get_shard_connection(self, user_id: Optional[int] = None):
+        """Kullanıcının chat, mesaj ve oturumlarının bulunduğu shard"""
+        return self._connect(self.get_shard_path(user_id))
+    
+    def reset_after_fork(self):
+        # Yazıcı thread'leri fork'ta kopyalanmaz, worker kendi thread'lerini açar
+        if self.committer:
+            self.committer = GroupCommitter(self._connect, self.committer.window, self.committer.max_rows)
+        # Önceki çalışmadan kalan silme işleri varsa worker devralır
+        self.purger = Purger(self._connect, self.router.paths, self.purger.batch_size, self.purger.pause,
+                             self.purger.grace, self.purger.interval)
+        self.purger.wake()
+    
     def init_db(self):
         """Veritabanı tablolarını oluştur"""
         conn = self.get_connection()
         cursor = conn.cursor()
+        # Okuyucular yazıcıları beklemesin
+        cursor.execute('PRAGMA journal_mode=WAL')
         
         # Kullanıcılar tablosu
         cursor.execute('''
@@ -35,16 +427,45 @@ class Database:
                 last_login TIMESTAMP
             )
         ''')
+        self._ensure_column(cursor, 'users', 'shard', 'INTEGER DEFAULT 0')
+        self._ensure_column(cursor, 'users', 'shard_moving', 'INTEGER DEFAULT 0')
         
-        # Chatler tablosu
+        # Kullanıcı başına token kullanımı (dakikalık kovalar)
         cursor.execute('''
+            CREATE TABLE IF NOT EXISTS user_token_usage (
+                user_id INTEGER NOT NULL,
+                bucket INTEGER NOT NULL,
+                tokens INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (user_id, bucket)
+            )
+        ''')
+        
+        # Shard 0 global dosyanın kendisi
+        self._create_shard_tables(cursor, global_db=True)
+        conn.commit()
+        conn.close()
+        
+        for path in self.router.paths()[1:]:
+            conn = self._connect(path)
+            cursor = conn.cursor()
+            cursor.execute('PRAGMA journal_mode=WAL')
+            self._create_shard_tables(cursor, global_db=False)
+            conn.commit()
+            conn.close()
+    
+    def _create_shard_tables(self, cursor, global_db: bool):
+        """Chat, mesaj, oturum ve arşiv tabloları (her shard'da bulunur)"""
+        # users tablosu yalnızca global dosyada var
+        user_fk = ',\n                FOREIGN KEY (user_id) REFERENCES users (id) ON DELETE CASCADE' if global_db else ''
+        
+        # Chatler tablosu
+        cursor.execute(f'''
             CREATE TABLE IF NOT EXISTS chats (
                 id TEXT PRIMARY KEY,
                 user_id INTEGER NOT NULL,
                 title TEXT NOT NULL,
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (user_id) REFERENCES users (id) ON DELETE CASCADE
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP{user_fk}
             )
         ''')
         
@@ -61,29 +482,173 @@ class Database:
         ''')
         
         # Oturum tokenleri tablosu
-        cursor.execute('''
+        cursor.execute(f'''
             CREATE TABLE IF NOT EXISTS sessions (
                 token TEXT PRIMARY KEY,
                 user_id INTEGER NOT NULL,
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                expires_at TIMESTAMP NOT NULL,
-                FOREIGN KEY (user_id) REFERENCES users (id) ON DELETE CASCADE
+                expires_at TIMESTAMP NOT NULL{user_fk}
             )
         ''')
         
-        conn.commit()
-        conn.close()
+        # Uzun süredir açılmayan chatlerin sıkıştırılmış mesajları (chat başına tek blob)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS message_archive (
+                chat_id TEXT PRIMARY KEY,
+                codec TEXT NOT NULL,
+                data BLOB NOT NULL,
+                message_count INTEGER NOT NULL,
+                raw_bytes INTEGER NOT NULL,
+                archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        self._ensure_column(cursor, 'chats', 'archived', 'INTEGER DEFAULT 0')
+        
+        # Silinmeyi bekleyen mesajlar (through_id NULL: chat'in tamamı, drop_chat: chat satırı da)
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'purge_queue'")
+        purge_queue_added = cursor.fetchone() is None
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS purge_queue (
+                chat_id TEXT PRIMARY KEY,
+                through_id INTEGER,
+                drop_chat INTEGER NOT NULL DEFAULT 0,
+                queued_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        self._ensure_column(cursor, 'chats', 'deleted_at', 'TIMESTAMP')
+        
+        # Delta senkronizasyonu: kullanıcı başına sayaç, chat ve mesajlarda değiştikleri sıra
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS sync_state (
+                user_id INTEGER PRIMARY KEY,
+                seq INTEGER NOT NULL DEFAULT 0
+            )
+        ''')
+        self._ensure_column(cursor, 'chats', 'seq', 'INTEGER NOT NULL DEFAULT 0')
+        self._ensure_column(cursor, 'chats', 'reset_seq', 'INTEGER NOT NULL DEFAULT 0')
+        self._ensure_column(cursor, 'messages', 'seq', 'INTEGER NOT NULL DEFAULT 0')
+        if purge_queue_added:
+            self.queue_orphan_messages(cursor)
+        
+        # Özet kolonları mesaj yazılırken aynı transaction'da güncellenir
+        added = self._ensure_column(cursor, 'chats', 'message_count', 'INTEGER NOT NULL DEFAULT 0')
+        self._ensure_column(cursor, 'chats', 'last_message_preview', 'TEXT')
+        self._ensure_column(cursor, 'chats', 'last_role', 'TEXT')
+        if added:
+            self._refresh_chat_summaries(cursor)
+        
+        # Sık kullanılan sorgular için indeksler
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_messages_chat ON messages (chat_id, id)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_chats_user ON chats (user_id, updated_at)')
     
-    # ========== KULLANICI İŞLEMLERİ ==========
+    def _ensure_column(self, cursor, table: str, column: str, definition: str):
+        """Eski veritabanlarına eksik kolonu ekle; eklendiyse True döner"""
+        cursor.execute(f'PRAGMA table_info({table})')
+        if column not in [row['name'] for row in cursor.fetchall()]:
+            cursor.execute(f'ALTER TABLE {table} ADD COLUMN {column} {definition}')
+            return True
+        return False
+    
+    def _refresh_chat_summaries(self, cursor, chat_ids: Optional[Iterable[str]] = None, only_stale: bool = False) -> int:
+        """
+        Özet kolonlarını mesajlardan yeniden hesapla
+        Arşivlenmiş chatlerin önizlemesi blob açılmadan korunur, sayıya arşivdeki mesajlar eklenir.
+        """
+        where = ['deleted_at IS NULL']
+        params = []
+        if chat_ids is not None:
+            chat_ids = list(chat_ids)
+            if not chat_ids:
+                return 0
+            where.append(f"id IN ({', '.join('?' for _ in chat_ids)})")
+            params.extend(chat_ids)
+        counted = f'''(SELECT COUNT(*) FROM messages m WHERE m.chat_id = chats.id AND {VISIBLE_MESSAGE})
+                + COALESCE((SELECT message_count FROM message_archive a WHERE a.chat_id = chats.id), 0)'''
+        if only_stale:
+            where.append(f'message_count != {counted}')
+        
+        cursor.execute(f'''
+            UPDATE chats SET
+                message_count = {counted},
+                last_role = CASE WHEN archived = 1 THEN last_role ELSE
+                    (SELECT role FROM messages m WHERE m.chat_id = chats.id AND {VISIBLE_MESSAGE}
+                     ORDER BY id DESC LIMIT 1) END,
+                last_message_preview = CASE WHEN archived = 1 THEN last_message_preview ELSE
+                    (SELECT substr(content, 1, {PREVIEW_LENGTH}) FROM messages m
+                     WHERE m.chat_id = chats.id AND {VISIBLE_MESSAGE} ORDER BY id DESC LIMIT 1) END
+            WHERE {' AND '.join(where)}
+        ''', params)
+        return cursor.rowcount
+    
+    def queue_orphan_messages(self, cursor) -> int:
+        """
+        Chat'i artık olmayan mesajları silme kuyruğuna al
+        foreign_keys kapalıyken silinen chatlerin mesajları tabloda kalıyordu;
+        purge_queue ilk oluşturulduğunda bir kez çalışır.
+        """
+        cursor.execute('''
+            INSERT OR IGNORE INTO purge_queue (chat_id, through_id, drop_chat)
+            SELECT DISTINCT chat_id, NULL, 1 FROM messages
+            WHERE chat_id NOT IN (SELECT id FROM chats)
+        ''')
+        metrics.incr('db.purge.orphan_chats', cursor.rowcount)
+        return cursor.rowcount
+    
+    def requeue_orphan_messages(self) -> int:
+        """Tüm dosyalarda chat'i olmayan mesajları yeniden tara"""
+        queued = 0
+        for path in self.router.paths():
+            conn = self._connect(path)
+            try:
+                queued += self.queue_orphan_messages(conn.cursor())
+                conn.commit()
+            finally:
+                conn.close()
+        return queued
     
-    def hash_password(self, password: str) -> str:
-        """Şifreyi hash'le"""
-        return hashlib.sha256(password.encode()).hexdigest()
+    def purge_pending(self, grace: Optional[int] = None, batch_size: Optional[int] = None) -> Dict:
+        """Kuyruğu worker'ları beklemeden bu süreçte işle (tüm dosyalar)"""
+        totals = {'messages': 0, 'chats': 0, 'pending': 0}
+        for path in self.router.paths():
+            for key, value in self.purger.purge(path, grace, batch_size).items():
+                totals[key] += value
+        return totals
+    
+    def get_purge_status(self) -> List[Dict]:
+        """Dosya başına bekleyen iş, silinen chat ve mesaj sayısı"""
+        status = []
+        for path in self.router.paths():
+            conn = self._connect(path)
+            try:
+                jobs = conn.execute(
+                    'SELECT COUNT(*) AS jobs, COALESCE(SUM(drop_chat), 0) AS chats FROM purge_queue').fetchone()
+                messages = conn.execute('''
+                    SELECT COUNT(*) FROM messages m
+                    JOIN purge_queue q ON q.chat_id = m.chat_id
+                    WHERE q.through_id IS NULL OR m.id <= q.through_id
+                ''').fetchone()[0]
+            finally:
+                conn.close()
+            status.append({'location': path, 'jobs': jobs['jobs'], 'chats': jobs['chats'], 'messages': messages})
+        return status
+    
+    def repair_chat_summaries(self) -> int:
+        """Sayısı tutmayan chatlerin özetlerini düzelt; düzeltilen chat sayısını döndür"""
+        repaired = 0
+        for path in self.router.paths():
+            conn = self._connect(path)
+            repaired += self._refresh_chat_summaries(conn.cursor(), only_stale=True)
+            conn.commit()
+            conn.close()
+        metrics.incr('db.summary_repaired', repaired)
+        return repaired
+    
+    # ========== KULLANICI İŞLEMLERİ ==========
     
     def create_user(self, first_name: str, last_name: str, username: str, email: str, password: str) -> Optional[int]:
         """Yeni kullanıcı oluştur"""
+        conn = self.get_connection()
         try:
-            conn = self.get_connection()
             cursor = conn.cursor()
             password_hash = self.hash_password(password)
             verification_token = secrets.token_urlsafe(32)
@@ -94,11 +659,14 @@ class Database:
             ''', (first_name, last_name, username, email, password_hash, verification_token))
             
             user_id = cursor.lastrowid
+            cursor.execute('UPDATE users SET shard = ? WHERE id = ?', (self.router.home_shard(user_id), user_id))
             conn.commit()
-            conn.close()
             return user_id, verification_token
         except sqlite3.IntegrityError:
             return None, None
+        finally:
+            # Başarısız INSERT'in açtığı transaction, bağlantı kapanana kadar yazma kilidini tutar
+            conn.close()
     
     def verify_email(self, token: str) -> bool:
         """Email verification token'ı kontrol et ve onay"""
@@ -119,6 +687,27 @@ class Database:
         except:
             return False
     
+    def regenerate_verification_token(self, email: str) -> Optional[Dict]:
+        """Doğrulanmamış kullanıcıya yeni doğrulama token'ı üret"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('SELECT id, username, email_verified FROM users WHERE email = ?', (email,))
+        user = cursor.fetchone()
+        
+        if not user:
+            conn.close()
+            return None
+        
+        result = {'username': user['username'], 'email_verified': bool(user['email_verified']), 'token': None}
+        if not user['email_verified']:
+            result['token'] = secrets.token_urlsafe(32)
+            cursor.execute('UPDATE users SET verification_token = ? WHERE id = ?', (result['token'], user['id']))
+            conn.commit()
+        
+        conn.close()
+        return result
+    
     def is_email_verified(self, user_id: int) -> bool:
         """Kullanıcının emaili doğrulanmış mı?"""
         conn = self.get_connection()
@@ -203,10 +792,20 @@ class Database:
     
     # ========== OTURUM İŞLEMLERİ ==========
     
+    def _session_connection(self, token: str):
+        """
+        Oturum token'ı "<user_id>.<rastgele>" biçimindedir, shard user_id'den bulunur
+        Eski biçimdeki token'lar global veritabanında aranır.
+        """
+        prefix, _, secret = token.partition('.')
+        if secret and prefix.isdigit():
+            return self.get_shard_connection(int(prefix))
+        return self.get_connection()
+    
     def create_session(self, user_id: int) -> str:
         """Yeni oturum oluştur"""
-        token = secrets.token_urlsafe(32)
-        conn = self.get_connection()
+        token = f"{user_id}.{secrets.token_urlsafe(32)}"
+        conn = self.get_shard_connection(user_id)
         cursor = conn.cursor()
         
         # 30 gün geçerli
@@ -221,7 +820,7 @@ class Database:
     
     def verify_session(self, token: str) -> Optional[int]:
         """Oturum token'ını doğrula"""
-        conn = self.get_connection()
+        conn = self._session_connection(token)
         cursor = conn.cursor()
         
         cursor.execute('''
@@ -236,7 +835,7 @@ class Database:
     
     def delete_session(self, token: str):
         """Oturumu sonlandır"""
-        conn = self.get_connection()
+        conn = self._session_connection(token)
         cursor = conn.cursor()
         cursor.execute('DELETE FROM sessions WHERE token = ?', (token,))
         conn.commit()
@@ -247,27 +846,36 @@ class Database:
     def create_chat(self, user_id: int, title: str = "Yeni Sohbet") -> str:
         """Yeni chat oluştur"""
         chat_id = secrets.token_urlsafe(16)
-        conn = self.get_connection()
+        conn = self.get_shard_connection(user_id)
         cursor = conn.cursor()
         
         cursor.execute('''
             INSERT INTO chats (id, user_id, title)
             VALUES (?, ?, ?)
         ''', (chat_id, user_id, title))
+        self._touch_chat(cursor, chat_id)
         
         conn.commit()
         conn.close()
         return chat_id
     
+    def _touch_chat(self, cursor, chat_id: str, reset: bool = False):
+        """Chat'e yeni değişiklik sırası ver (reset: istemci mesajlarını baştan indirsin)"""
+        cursor.execute(SEQ_BUMP_SQL, (chat_id,))
+        cursor.execute(f'''
+            UPDATE chats SET seq = {CHAT_SEQ}{f", reset_seq = {CHAT_SEQ}" if reset else ""}
+            WHERE id = ?
+        ''', (chat_id,))
+    
     def get_user_chats(self, user_id: int) -> List[Dict]:
         """Kullanıcının tüm chatlerini getir"""
-        conn = self.get_connection()
+        conn = self.get_shard_connection(user_id)
         cursor = conn.cursor()
         
         cursor.execute('''
-            SELECT id, title, created_at, updated_at 
+            SELECT id, title, created_at, updated_at, message_count, last_message_preview, last_role
             FROM chats 
-            WHERE user_id = ?
+            WHERE user_id = ? AND deleted_at IS NULL
             ORDER BY updated_at DESC
         ''', (user_id,))
         
@@ -278,13 +886,13 @@ class Database:
     
     def get_chat(self, chat_id: str, user_id: int) -> Optional[Dict]:
         """Belirli bir chat'i getir"""
-        conn = self.get_connection()
+        conn = self.get_shard_connection(user_id)
         cursor = conn.cursor()
         
         cursor.execute('''
-            SELECT id, title, created_at, updated_at 
+            SELECT id, title, created_at, updated_at, message_count, last_message_preview, last_role, seq
             FROM chats 
-            WHERE id = ? AND user_id = ?
+            WHERE id = ? AND user_id = ? AND deleted_at IS NULL
         ''', (chat_id, user_id))
         
         row = cursor.fetchone()
@@ -292,41 +900,54 @@ class Database:
         
         return dict(row) if row else None
     
-    def update_chat_title(self, chat_id: str, user_id: int, title: str):
-        """Chat başlığını güncelle"""
-        conn = self.get_connection()
+    def update_chat_title(self, chat_id: str, user_id: int, title: str, if_title: Optional[str] = None):
+        """Chat başlığını güncelle (if_title: kullanıcı bu arada değiştirdiyse dokunma)"""
+        conn = self.get_shard_connection(user_id)
         cursor = conn.cursor()
         
-        cursor.execute('''
+        cursor.execute(SEQ_BUMP_SQL, (chat_id,))
+        cursor.execute(f'''
             UPDATE chats 
-            SET title = ?, updated_at = CURRENT_TIMESTAMP
-            WHERE id = ? AND user_id = ?
-        ''', (title, chat_id, user_id))
+            SET title = ?, updated_at = CURRENT_TIMESTAMP, seq = {CHAT_SEQ}
+            WHERE id = ? AND user_id = ? AND deleted_at IS NULL AND (? IS NULL OR title = ?)
+        ''', (title, chat_id, user_id, if_title, if_title))
         
         conn.commit()
         conn.close()
     
     def delete_chat(self, chat_id: str, user_id: int):
-        """Chat'i sil"""
-        conn = self.get_connection()
+        """Chat'i sil (anında gizlenir, mesajları arka planda silinir)"""
+        conn = self.get_shard_connection(user_id)
         cursor = conn.cursor()
         
-        cursor.execute('''
-            DELETE FROM chats 
-            WHERE id = ? AND user_id = ?
+        cursor.execute(SEQ_BUMP_SQL, (chat_id,))
+        cursor.execute(f'''
+            UPDATE chats SET deleted_at = CURRENT_TIMESTAMP, seq = {CHAT_SEQ}
+            WHERE id = ? AND user_id = ? AND deleted_at IS NULL
         ''', (chat_id, user_id))
         
+        deleted = cursor.rowcount
+        if deleted:
+            cursor.execute('DELETE FROM message_archive WHERE chat_id = ?', (chat_id,))
+            cursor.execute('''
+                INSERT OR REPLACE INTO purge_queue (chat_id, through_id, drop_chat)
+                VALUES (?, NULL, 1)
+            ''', (chat_id,))
+        
         conn.commit()
         conn.close()
+        if deleted:
+            self.purger.wake()
     
-    def update_chat_timestamp(self, chat_id: str):
+    def update_chat_timestamp(self, chat_id: str, user_id: Optional[int] = None):
         """Chat'in son güncelleme zamanını güncelle"""
-        conn = self.get_connection()
+        conn = self.get_shard_connection(user_id)
         cursor = conn.cursor()
         
-        cursor.execute('''
+        cursor.execute(SEQ_BUMP_SQL, (chat_id,))
+        cursor.execute(f'''
             UPDATE chats 
-            SET updated_at = CURRENT_TIMESTAMP
+            SET updated_at = CURRENT_TIMESTAMP, seq = {CHAT_SEQ}
             WHERE id = ?
         ''', (chat_id,))
         
@@ -335,40 +956,157 @@ class Database:
     
     # ========== MESAJ İŞLEMLERİ ==========
     
-    def add_message(self, chat_id: str, role: str, content: str):
+    def add_message(self, chat_id: str, role: str, content: str, user_id: Optional[int] = None):
         """Chat'e mesaj ekle"""
-        conn = self.get_connection()
+        self.add_messages(chat_id, [(role, content)], user_id)
+    
+    def add_messages(self, chat_id: str, messages: List[tuple], user_id: Optional[int] = None) -> Optional[Dict]:
+        """Mesajları (role, content) ve chat zaman damgasını tek transaction'da yaz; chat'in yeni seq / message_count'u"""
+        rows = [(chat_id, role, content) for role, content in messages]
+        if self.committer:
+            return self.committer.write(self.get_shard_path(user_id), rows).get(chat_id)
+        
+        conn = self.get_shard_connection(user_id)
         cursor = conn.cursor()
         
-        cursor.execute('''
-            INSERT INTO messages (chat_id, role, content)
-            VALUES (?, ?, ?)
-        ''', (chat_id, role, content))
+        write_message_rows(cursor, rows)
+        states = read_chat_states(cursor, [chat_id])
         
         conn.commit()
         conn.close()
-        
-        # Chat'in güncelleme zamanını güncelle
-        self.update_chat_timestamp(chat_id)
+        return states.get(chat_id)
     
-    def get_chat_messages(self, chat_id: str, limit: int = 100) -> List[Dict]:
+    def get_chat_messages(self, chat_id: str, limit: int = 100, user_id: Optional[int] = None) -> List[Dict]:
         """Chat'in mesajlarını getir"""
-        conn = self.get_connection()
+        conn = self.get_shard_connection(user_id)
         cursor = conn.cursor()
         
-        cursor.execute('''
+        cursor.execute(f'''
             SELECT role, content, timestamp 
-            FROM messages 
-            WHERE chat_id = ?
+            FROM messages m
+            WHERE chat_id = ? AND {VISIBLE_MESSAGE}
             ORDER BY timestamp ASC
             LIMIT ?
         ''', (chat_id, limit))
         
         rows = cursor.fetchall()
+        archived = not rows and self._is_archived(cursor, chat_id)
         conn.close()
         
+        # Arşivlenmiş chat açıldıysa mesajları sıcak tabloya geri al
+        if archived and self.rehydrate_chat(chat_id, user_id):
+            return self.get_chat_messages(chat_id, limit, user_id)
+        
         return [dict(row) for row in rows]
     
+    def get_recent_messages(self, chat_id: str, limit: int, user_id: Optional[int] = None) -> List[Dict]:
+        """Chat'in son `limit` mesajı (eskiden yeniye)"""
+        conn = self.get_shard_connection(user_id)
+        cursor = conn.cursor()
+        
+        cursor.execute(f'''
+            SELECT role, content, timestamp
+            FROM messages m
+            WHERE chat_id = ? AND {VISIBLE_MESSAGE}
+            ORDER BY id DESC
+            LIMIT ?
+        ''', (chat_id, limit))
+        
+        rows = cursor.fetchall()
+        archived = not rows and self._is_archived(cursor, chat_id)
+        conn.close()
+        
+        if archived and self.rehydrate_chat(chat_id, user_id):
+            return self.get_recent_messages(chat_id, limit, user_id)
+        
+        return [dict(row) for row in reversed(rows)]
+    
+    def _is_archived(self, cursor, chat_id: str) -> bool:
+        """
+        Boş okumada yalnızca arşivli chat geri yüklenir; rehydrate_chat yazma
+        kilidi (BEGIN IMMEDIATE) aldığı için yeni / temizlenmiş chatlerde çağrılmaz
+        """
+        cursor.execute('SELECT archived FROM chats WHERE id = ?', (chat_id,))
+        row = cursor.fetchone()
+        return bool(row and row['archived'])
+
+    def get_chat_changes(self, user_id: int, since: int) -> Dict:
+        """
+        since sırasından sonra değişen chatler
+        chat_ids kullanıcının tüm chatleridir; istemci listede olmayanları siler.
+        since sunucudakinden büyükse (geri yüklenmiş veritabanı) liste baştan gönderilir.
+        """
+        conn = self.get_shard_connection(user_id)
+        cursor = conn.cursor()
+        
+        # Sıra önce okunur: arada commit edilen değişiklik bir sonraki senkronizasyonda tekrar gelir
+        cursor.execute('SELECT seq FROM sync_state WHERE user_id = ?', (user_id,))
+        row = cursor.fetchone()
+        seq = row['seq'] if row else 0
+        reset = since <= 0 or since > seq
+        
+        cursor.execute('''
+            SELECT id, title, created_at, updated_at, message_count, last_message_preview, last_role, seq
+            FROM chats
+            WHERE user_id = ? AND deleted_at IS NULL AND seq > ?
+            ORDER BY updated_at DESC
+        ''', (user_id, -1 if reset else since))
+        chats = [dict(row) for row in cursor.fetchall()]
+        
+        cursor.execute('SELECT id FROM chats WHERE user_id = ? AND deleted_at IS NULL', (user_id,))
+        chat_ids = [row['id'] for row in cursor.fetchall()]
+        conn.close()
+        
+        return {'seq': seq, 'reset': reset, 'chats': chats, 'chat_ids': chat_ids}
+    
+    def get_message_changes(self, chat_id: str, user_id: int, since: int, limit: int = 500) -> Optional[Dict]:
+        """
+        Chat'in since sırasından sonraki mesajları (chat yoksa None)
+        reset True ise istemci önbelleğindeki mesajları bunlarla değiştirir: ilk indirme,
+        temizlenmiş chat veya limit'ten fazla yeni mesaj (son limit mesaj gönderilir).
+        """
+        conn = self.get_shard_connection(user_id)
+        cursor = conn.cursor()
+        
+        # Chat mesajlardan önce okunur; arada yazılan mesajlar bir sonraki deltada tekrar gelir (id ile ayıklanır)
+        cursor.execute('''
+            SELECT id, title, created_at, updated_at, message_count, last_message_preview, last_role,
+                   archived, seq, reset_seq
+            FROM chats
+            WHERE id = ? AND user_id = ? AND deleted_at IS NULL
+        ''', (chat_id, user_id))
+        row = cursor.fetchone()
+        if not row:
+            conn.close()
+            return None
+        chat = dict(row)
+        reset_seq = chat.pop('reset_seq')
+        reset = since <= 0 or since > chat['seq'] or reset_seq > since
+        archived = chat.pop('archived')
+        
+        # Sıra bir chat içinde id ile birlikte artar: yeniden eskiye okunur, since'e gelince durulur
+        cursor.execute(f'''
+            SELECT id, role, content, timestamp, seq
+            FROM messages m
+            WHERE chat_id = ? AND {VISIBLE_MESSAGE}
+            ORDER BY id DESC
+        ''', (chat_id,))
+        messages = []
+        for message in cursor:
+            if not reset and message['seq'] <= since:
+                break
+            if len(messages) >= limit:
+                reset = True
+                break
+            messages.append(dict(message))
+        conn.close()
+        messages.reverse()
+        
+        if reset and archived and not messages and self.rehydrate_chat(chat_id, user_id):
+            return self.get_message_changes(chat_id, user_id, 0, limit)
+        
+        return {'chat': chat, 'reset': reset, 'messages': messages}
+    
     def clear_chat_messages(self, chat_id: str, user_id: int):
         """Chat'in tüm mesajlarını temizle"""
         # Önce chat'in kullanıcıya ait olduğunu doğrula
@@ -376,11 +1114,280 @@ class Database:
         if not chat:
             return
         
+        conn = self.get_shard_connection(user_id)
+        cursor = conn.cursor()
+        
+        # Şu ana kadarki mesajlar gizlenir ve arka planda silinir; sonradan gelenler görünür
+        cursor.execute('SELECT MAX(id) FROM messages WHERE chat_id = ?', (chat_id,))
+        through_id = cursor.fetchone()[0]
+        if through_id is not None:
+            cursor.execute('''
+                INSERT OR REPLACE INTO purge_queue (chat_id, through_id, drop_chat)
+                VALUES (?, ?, 0)
+            ''', (chat_id, through_id))
+        cursor.execute('DELETE FROM message_archive WHERE chat_id = ?', (chat_id,))
+        cursor.execute(SEQ_BUMP_SQL, (chat_id,))
+        cursor.execute(f'''
+            UPDATE chats SET archived = 0, message_count = 0, last_message_preview = NULL, last_role = NULL,
+                             seq = {CHAT_SEQ}, reset_seq = {CHAT_SEQ}
+            WHERE id = ?
+        ''', (chat_id,))
+        
+        conn.commit()
+        conn.close()
+        if through_id is not None:
+            self.purger.wake()
+    
+    # ========== ARŞİV İŞLEMLERİ ==========
+    
+    def archive_idle_chats(self, idle_days: int = 90, limit: int = 500) -> Dict:
+        """
+        idle_days gündür güncellenmemiş chatlerin mesajlarını sıkıştırıp arşive taşı
+        Her chat kendi transaction'ında taşınır, yazma kilidi kısa tutulur.
+        """
+        stats = {'chats': 0, 'messages': 0, 'raw_bytes': 0, 'stored_bytes': 0}
+        for path in self.router.paths():
+            conn = self._connect(path)
+            self._archive_idle_chats(conn, idle_days, limit, stats)
+            conn.close()
+        
+        metrics.incr('archive.chats', stats['chats'])
+        metrics.incr('archive.bytes_saved', stats['raw_bytes'] - stats['stored_bytes'])
+        return stats
+    
+    def _archive_idle_chats(self, conn, idle_days: int, limit: int, stats: Dict):
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT id FROM chats
+            WHERE archived = 0 AND deleted_at IS NULL AND updated_at < datetime('now', ?)
+              AND id NOT IN (SELECT chat_id FROM purge_queue)
+            ORDER BY updated_at
+            LIMIT ?
+        ''', (f'-{int(idle_days)} days', limit))
+        chat_ids = [row['id'] for row in cursor.fetchall()]
+        
+        for chat_id in chat_ids:
+            cursor.execute('''
+                SELECT role, content, timestamp FROM messages
+                WHERE chat_id = ? ORDER BY id
+            ''', (chat_id,))
+            messages = [dict(row) for row in cursor.fetchall()]
+            
+            if messages:
+                raw = json.dumps(messages, ensure_ascii=False).encode('utf-8')
+                codec, blob = compress_blob(raw)
+                cursor.execute('''
+                    INSERT OR REPLACE INTO message_archive (chat_id, codec, data, message_count, raw_bytes)
+                    VALUES (?, ?, ?, ?, ?)
+                ''', (chat_id, codec, blob, len(messages), len(raw)))
+                cursor.execute('DELETE FROM messages WHERE chat_id = ?', (chat_id,))
+                stats['messages'] += len(messages)
+                stats['raw_bytes'] += len(raw)
+                stats['stored_bytes'] += len(blob)
+            
+            cursor.execute('UPDATE chats SET archived = 1 WHERE id = ?', (chat_id,))
+            conn.commit()
+            stats['chats'] += 1
+    
+    def load_archived_messages(self, chat_id: str, cursor=None, user_id: Optional[int] = None) -> Optional[List[Dict]]:
+        """Arşivdeki mesajları çöz (arşiv yoksa None)"""
+        conn = None
+        if cursor is None:
+            conn = self.get_shard_connection(user_id)
+            cursor = conn.cursor()
+        cursor.execute('SELECT codec, data FROM message_archive WHERE chat_id = ?', (chat_id,))
+        row = cursor.fetchone()
+        if conn:
+            conn.close()
+        if not row:
+            return None
+        return json.loads(decompress_blob(row['codec'], row['data']))
+    
+    def rehydrate_chat(self, chat_id: str, user_id: Optional[int] = None) -> bool:
+        """Arşivlenmiş chat'in mesajlarını messages tablosuna geri yükle"""
+        started = time.perf_counter()
+        conn = self.get_shard_connection(user_id)
+        cursor = conn.cursor()
+        # Aynı chat'i eşzamanlı açan iki istek mesajları iki kez eklemesin
+        cursor.execute('BEGIN IMMEDIATE')
+        
+        messages = self.load_archived_messages(chat_id, cursor)
+        if messages is None:
+            conn.close()
+            return False
+        
+        cursor.executemany('''
+            INSERT INTO messages (chat_id, role, content, timestamp)
+            VALUES (?, ?, ?, ?)
+        ''', [(chat_id, m['role'], m['content'], m['timestamp']) for m in messages])
+        cursor.execute('DELETE FROM message_archive WHERE chat_id = ?', (chat_id,))
+        cursor.execute('UPDATE chats SET archived = 0 WHERE id = ?', (chat_id,))
+        conn.commit()
+        conn.close()
+        
+        metrics.observe('archive.rehydrate', time.perf_counter() - started)
+        metrics.incr('archive.rehydrated')
+        return True
+    
+    def get_archive_stats(self) -> Dict:
+        """Arşivdeki chat sayısı ve kazanılan alan (tüm shard'lar)"""
+        stats = {'chats': 0, 'messages': 0, 'raw_bytes': 0, 'stored_bytes': 0}
+        for path in self.router.paths():
+            conn = self._connect(path)
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT COUNT(*) AS chats,
+                       COALESCE(SUM(message_count), 0) AS messages,
+                       COALESCE(SUM(raw_bytes), 0) AS raw_bytes,
+                       COALESCE(SUM(LENGTH(data)), 0) AS stored_bytes
+                FROM message_archive
+            ''')
+            for key, value in dict(cursor.fetchone()).items():
+                stats[key] += value
+            conn.close()
+        stats['saved_bytes'] = stats['raw_bytes'] - stats['stored_bytes']
+        return stats
+    
+    # ========== DIŞA / İÇE AKTARMA ==========
+    
+    def iter_user_export(self, user_id: int) -> Iterator[Dict]:
+        """
+        Kullanıcının chat ve mesajlarını sırayla üret
+        Tek bir sorgu üzerinde cursor ile ilerler, bellek kullanımı sabittir.
+        """
+        conn = self.get_shard_connection(user_id)
+        try:
+            cursor = conn.cursor()
+            cursor.execute(f'''
+                SELECT c.id AS chat_id, c.title, c.created_at, c.updated_at, c.archived,
+                       m.id AS message_id, m.role, m.content, m.timestamp
+                FROM chats c
+                LEFT JOIN messages m ON m.chat_id = c.id AND {VISIBLE_MESSAGE}
+                WHERE c.user_id = ? AND c.deleted_at IS NULL
+                ORDER BY c.created_at, c.id, m.id
+            ''', (user_id,))
+            
+            current_chat = None
+            for row in cursor:
+                if row['chat_id'] != current_chat:
+                    current_chat = row['chat_id']
+                    yield {
+                        'type': 'chat',
+                        'id': row['chat_id'],
+                        'title': row['title'],
+                        'created_at': row['created_at'],
+                        'updated_at': row['updated_at']
+                    }
+                    if row['archived'] and row['message_id'] is None:
+                        # Arşivdeki mesajlar sıcak tabloya alınmadan okunur
+                        for message in self.load_archived_messages(row['chat_id'], user_id=user_id) or []:
+                            yield {'type': 'message', 'chat_id': row['chat_id'], **message}
+                if row['message_id'] is not None:
+                    yield {
+                        'type': 'message',
+                        'chat_id': row['chat_id'],
+                        'role': row['role'],
+                        'content': row['content'],
+                        'timestamp': row['timestamp']
+                    }
+        finally:
+            conn.close()
+    
+    def import_user_records(self, user_id: int, records: Iterable[Dict], batch_size: int = 5000) -> Dict:
+        """
+        Dışa aktarılmış kayıtları kullanıcıya ekle
+        Chat'ler yeni id ile oluşturulur; satırlar batch_size'lık
+        transaction'larda toplu olarak yazılır.
+        """
+        conn = self.get_shard_connection(user_id)
+        cursor = conn.cursor()
+        chat_ids = {}
+        chat_rows = []
+        message_rows = []
+        counts = {'chats': 0, 'messages': 0, 'skipped': 0}
+        
+        def flush():
+            # Mesajların chat'i aynı transaction'da yazılmış olmalı
+            if chat_rows:
+                cursor.executemany('''
+                    INSERT INTO chats (id, user_id, title, created_at, updated_at)
+                    VALUES (?, ?, ?, COALESCE(?, CURRENT_TIMESTAMP), COALESCE(?, CURRENT_TIMESTAMP))
+                ''', chat_rows)
+            if message_rows:
+                cursor.executemany('''
+                    INSERT INTO messages (chat_id, role, content, timestamp)
+                    VALUES (?, ?, ?, COALESCE(?, CURRENT_TIMESTAMP))
+                ''', message_rows)
+                self._refresh_chat_summaries(cursor, {row[0] for row in message_rows})
+            # İçe aktarılan mesajlar sıra taşımaz; istemci bu chatleri baştan indirir
+            for chat_id in {row[0] for row in chat_rows} | {row[0] for row in message_rows}:
+                self._touch_chat(cursor, chat_id, reset=True)
+            conn.commit()
+            counts['chats'] += len(chat_rows)
+            counts['messages'] += len(message_rows)
+            chat_rows.clear()
+            message_rows.clear()
+        
+        try:
+            for record in records:
+                kind = record.get('type')
+                if kind == 'chat' and record.get('id'):
+                    new_id = secrets.token_urlsafe(16)
+                    chat_ids[record['id']] = new_id
+                    chat_rows.append((new_id, user_id, str(record.get('title') or 'Yeni Sohbet')[:200],
+                                      record.get('created_at'), record.get('updated_at')))
+                elif (kind == 'message' and record.get('chat_id') in chat_ids
+                        and record.get('role') in ('user', 'ai') and isinstance(record.get('content'), str)):
+                    message_rows.append((chat_ids[record['chat_id']], record['role'],
+                                         record['content'], record.get('timestamp')))
+                elif kind != 'export':
+                    counts['skipped'] += 1
+                    continue
+                
+                if len(chat_rows) + len(message_rows) >= batch_size:
+                    flush()
+            
+            flush()
+        finally:
+            conn.close()
+        
+        return counts
+    
+    # ========== KOTA İŞLEMLERİ ==========
+    
+    def get_token_usage(self, user_id: int, since_bucket: int) -> List[tuple]:
+        """Kullanıcının belirli kovadan sonraki token kullanımını getir"""
         conn = self.get_connection()
         cursor = conn.cursor()
         
-        cursor.execute('DELETE FROM messages WHERE chat_id = ?', (chat_id,))
+        cursor.execute('''
+            SELECT bucket, tokens FROM user_token_usage
+            WHERE user_id = ? AND bucket > ?
+        ''', (user_id, since_bucket))
+        
+        rows = cursor.fetchall()
+        conn.close()
+        
+        return [(row['bucket'], row['tokens']) for row in rows]
+    
+    def add_token_usage(self, rows: List[tuple]):
+        """(user_id, bucket, tokens) satırlarını toplu olarak ekle"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.executemany('''
+            INSERT INTO user_token_usage (user_id, bucket, tokens)
+            VALUES (?, ?, ?)
+            ON CONFLICT(user_id, bucket) DO UPDATE SET tokens = tokens + excluded.tokens
+        ''', rows)
         
         conn.commit()
         conn.close()
-
+    
+    def prune_token_usage(self, before_bucket: int):
+        """Pencere dışına çıkmış kota kayıtlarını sil"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute('DELETE FROM user_token_usage WHERE bucket <= ?', (before_bucket,))
+        conn.commit()
+        conn.close()
@@ -0,0 +1,91 @@
+"""
+Sohbet geçmişi önbelleği
+Her worker, etkin chatlerin son mesajlarını sınırlı bir LRU'da tutar.
+Turun soru-cevabı yazılınca önbelleğe de eklenir (write-through); böylece
+aynı sohbetin sonraki turunda istem veritabanı okunmadan kurulur.
+
+Damga, chats.seq'tir: chat'i değiştiren her yazma (başka worker'da da
+olsa) seq'i artırır ve istek zaten okunmuş chat satırıyla gelir. Satırdaki
+seq damgadan farklıysa kayıt bayattır ve yeniden okunur. Yazma sonrası
+mesaj sayısı önbellekteki sayı + eklenenle tutmuyorsa arada başka bir
+yazma olmuştur; kayıt eklenmek yerine atılır.
+"""
+import os
+import threading
+from collections import OrderedDict, deque
+from typing import Dict, List, Optional, Tuple
+
+import metrics
+
+# 0: önbellek kapalı, geçmiş her turda veritabanından okunur
+HISTORY_CACHE_CHATS = int(os.environ.get("HISTORY_CACHE_CHATS", 2000))
+# Chat başına tutulan son mesaj sayısı (istem penceresi + hizalama payı kadar olmalı)
+HISTORY_CACHE_MESSAGES = int(os.environ.get("HISTORY_CACHE_MESSAGES", 20))
+
+
+class _Entry:
+    __slots__ = ('seq', 'count', 'messages')
+
+    def __init__(self, seq, count, messages, limit):
+        self.seq = seq
+        self.count = count
+        self.messages = deque(messages, maxlen=limit)
+
+
+class HistoryCache:
+    def __init__(self, max_chats=HISTORY_CACHE_CHATS, max_messages=HISTORY_CACHE_MESSAGES):
+        self.max_chats = max_chats
+        self.max_messages = max(1, max_messages)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, chat: Dict) -> Optional[Tuple[List[Dict], int]]:
+        """Chat satırındaki seq ile damgası tutan kayıt: (son mesajlar, ilk mesajın sırası)"""
+        with self._lock:
+            entry = self._entries.get(chat['id'])
+            if entry is None or entry.seq != chat.get('seq'):
+                metrics.incr('history_cache.miss')
+                return None
+            self._entries.move_to_end(chat['id'])
+            metrics.incr('history_cache.hit')
+            return list(entry.messages), entry.count - len(entry.messages)
+
+    def put(self, chat: Dict, messages: List[Dict]) -> Tuple[List[Dict], int]:
+        """Veritabanından okunan son mesajları chat satırının damgasıyla sakla"""
+        messages = [{'role': m['role'], 'content': m['content']} for m in messages[-self.max_messages:]]
+        count = max(chat.get('message_count') or 0, len(messages))
+        if self.max_chats > 0 and chat.get('seq') is not None:
+            with self._lock:
+                self._entries[chat['id']] = _Entry(chat['seq'], count, messages, self.max_messages)
+                self._entries.move_to_end(chat['id'])
+                self._evict()
+        return messages, count - len(messages)
+
+    def append(self, chat_id: str, messages: List[tuple], state: Optional[Dict]):
+        """
+        add_messages sonrası: (role, content) listesini ekle ve damgayı yazmanın
+        döndürdüğü seq yap; arada başka yazma olduysa kaydı at
+        """
+        with self._lock:
+            entry = self._entries.get(chat_id)
+            if entry is None:
+                return
+            if not state or entry.count + len(messages) != state['message_count']:
+                del self._entries[chat_id]
+                metrics.incr('history_cache.dropped')
+                return
+            entry.messages.extend({'role': role, 'content': content} for role, content in messages)
+            entry.count = state['message_count']
+            entry.seq = state['seq']
+            self._entries.move_to_end(chat_id)
+
+    def invalidate(self, chat_id: str):
+        with self._lock:
+            self._entries.pop(chat_id, None)
+            metrics.set_gauge('history_cache.chats', len(self._entries))
+
+    def _evict(self):
+        while len(self._entries) > self.max_chats:
+            self._entries.popitem(last=False)
+            metrics.incr('history_cache.evicted')
+        metrics.set_gauge('history_cache.chats', len(self._entries))
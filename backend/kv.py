@@ -0,0 +1,557 @@
+"""
+Anahtar-değer deposu
+Oturum önbelleği, rate limit sayaçları, idempotency anahtarları ve
+önbellekler bu arayüzü kullanır; birden çok uygulama sunucusu aynı
+depoyu paylaşarak tutarlı kalır.
+
+KV_URL ile seçilir:
+    (boş)                    süreç içi (tek sunucu, tek worker)
+    sqlite:///pahiy_kv.db    aynı makinedeki worker'lar arasında paylaşılır
+    redis://host:6379/0      Redis protokolü konuşan herhangi bir sunucu (Redis, Valkey, KeyDB...)
+
+Yayınla/abone ol (pub/sub) önbellek geçersiz kılma mesajları içindir;
+SQLite uygulamasında olay tablosu kısa aralıklarla okunur.
+"""
+import os
+import socket
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import defaultdict
+from typing import Callable, List, Optional
+from urllib.parse import urlparse
+
+import metrics
+
+KV_URL = os.environ.get("KV_URL", "")
+SQLITE_POLL_INTERVAL = float(os.environ.get("KV_SQLITE_POLL_INTERVAL", 0.5))
+
+# Uygulamanın kullandığı anahtar ad alanları ("<ad>:..."); clear() yalnızca bunları siler,
+# aynı Redis veritabanını paylaşan diğer servislerin anahtarlarına dokunmaz
+APP_NAMESPACES = ('session', 'idem', 'rl', 'quota', 'chats_ver')
+SCAN_COUNT = 500
+
+
+def is_app_key(key: str) -> bool:
+    return key.partition(':')[0] in APP_NAMESPACES
+
+
+class KVStore(ABC):
+    """Değerler str olarak saklanır; ttl saniye cinsindendir"""
+
+    def __init__(self):
+        self._subscribers = defaultdict(list)
+        self._sub_lock = threading.Lock()
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[str]: ...
+
+    def get_many(self, keys: List[str]) -> List[Optional[str]]:
+        """Birden çok anahtarı tek seferde oku (sırayla, olmayanlar None)"""
+        return [self.get(key) for key in keys]
+
+    @abstractmethod
+    def set(self, key: str, value: str, ttl: Optional[float] = None): ...
+
+    @abstractmethod
+    def set_if_absent(self, key: str, value: str, ttl: Optional[float] = None) -> bool:
+        """Anahtar yoksa yaz ve True döndür (idempotency kilidi)"""
+
+    @abstractmethod
+    def delete(self, key: str): ...
+
+    @abstractmethod
+    def clear(self):
+        """Uygulamanın anahtarlarını (APP_NAMESPACES) sil; veritabanı geri yüklendikten sonra"""
+
+    @abstractmethod
+    def incr(self, key: str, amount: int = 1, ttl: Optional[float] = None) -> int:
+        """Sayacı artır; ttl yalnızca anahtar ilk oluştuğunda uygulanır"""
+
+    @abstractmethod
+    def publish(self, channel: str, message: str): ...
+
+    def subscribe(self, channel: str, callback: Callable[[str], None]):
+        with self._sub_lock:
+            new_channel = channel not in self._subscribers
+            self._subscribers[channel].append(callback)
+            if new_channel:
+                self._add_channel(channel)
+        self._start_listener()
+
+    def _add_channel(self, channel: str):
+        """Dinleyici çalışırken eklenen kanal (_sub_lock tutulurken çağrılır)"""
+
+    def _dispatch(self, channel: str, message: str):
+        with self._sub_lock:
+            callbacks = list(self._subscribers.get(channel, ()))
+        for callback in callbacks:
+            try:
+                callback(message)
+            except Exception as e:
+                print(f"⚠️ KV abone hatası ({channel}): {e}")
+
+    def _start_listener(self):
+        """Uzak mesajları dinleyen thread'i başlat (süreç içi depoda gerekmez)"""
+
+    def reset_after_fork(self):
+        """Fork sonrası bağlantıları ve dinleyici thread'i yeniden kur"""
+
+
+class MemoryKV(KVStore):
+    """Süreç içi depo; tek worker veya geliştirme ortamı için"""
+
+    def __init__(self):
+        super().__init__()
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def _live(self, key, now):
+        item = self._data.get(key)
+        if item and item[1] is not None and item[1] <= now:
+            del self._data[key]
+            return None
+        return item
+
+    def _sweep(self, now):
+        # Süresi dolan anahtarları ara ara temizle
+        if len(self._data) > 10000:
+            for key in [k for k, (_, expires) in self._data.items() if expires is not None and expires <= now]:
+                del self._data[key]
+
+    def get(self, key):
+        with self._lock:
+            item = self._live(key, time.time())
+        return item[0] if item else None
+
+    def set(self, key, value, ttl=None):
+        now = time.time()
+        with self._lock:
+            self._sweep(now)
+            self._data[key] = (value, now + ttl if ttl else None)
+
+    def set_if_absent(self, key, value, ttl=None):
+        now = time.time()
+        with self._lock:
+            if self._live(key, now):
+                return False
+            self._data[key] = (value, now + ttl if ttl else None)
+            return True
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            for key in [k for k in self._data if is_app_key(k)]:
+                del self._data[key]
+
+    def incr(self, key, amount=1, ttl=None):
+        now = time.time()
+        with self._lock:
+            item = self._live(key, now)
+            if item:
+                value, expires = int(item[0]) + amount, item[1]
+            else:
+                self._sweep(now)
+                value, expires = amount, now + ttl if ttl else None
+            self._data[key] = (str(value), expires)
+            return value
+
+    def publish(self, channel, message):
+        self._dispatch(channel, message)
+
+
+class SQLiteKV(KVStore):
+    """Aynı makinedeki worker'lar arasında paylaşılan depo"""
+
+    def __init__(self, path: str):
+        super().__init__()
+        self.path = path
+        self._local = threading.local()
+        self._listener_pid = None
+        self._last_event = 0
+        conn = self._conn()
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS kv (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                expires_at REAL
+            )
+        ''')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS kv_events (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                channel TEXT NOT NULL,
+                message TEXT NOT NULL,
+                created_at REAL NOT NULL
+            )
+        ''')
+        conn.commit()
+
+    def _conn(self):
+        # Thread başına bağlantı; fork sonrası süreç kimliği değişince yenilenir
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get(self, key):
+        row = self._conn().execute('SELECT value FROM kv WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)',
+                                   (key, time.time())).fetchone()
+        return row[0] if row else None
+
+    def get_many(self, keys):
+        if not keys:
+            return []
+        rows = self._conn().execute(
+            f'SELECT key, value FROM kv WHERE key IN ({",".join("?" * len(keys))}) '
+            'AND (expires_at IS NULL OR expires_at > ?)', (*keys, time.time())).fetchall()
+        values = dict(rows)
+        return [values.get(key) for key in keys]
+
+    def set(self, key, value, ttl=None):
+        self._conn().execute('INSERT OR REPLACE INTO kv (key, value, expires_at) VALUES (?, ?, ?)',
+                             (key, value, time.time() + ttl if ttl else None))
+
+    def set_if_absent(self, key, value, ttl=None):
+        now = time.time()
+        cursor = self._conn().execute('''
+            INSERT INTO kv (key, value, expires_at) VALUES (?, ?, ?)
+            ON CONFLICT (key) DO UPDATE SET value = excluded.value, expires_at = excluded.expires_at
+            WHERE kv.expires_at IS NOT NULL AND kv.expires_at <= ?
+        ''', (key, value, now + ttl if ttl else None, now))
+        return cursor.rowcount > 0
+
+    def delete(self, key):
+        self._conn().execute('DELETE FROM kv WHERE key = ?', (key,))
+
+    def clear(self):
+        # LIKE'ta '_' joker karakter olduğundan önek substr ile karşılaştırılır
+        prefixes = [f'{namespace}:' for namespace in APP_NAMESPACES]
+        self._conn().execute(
+            f'DELETE FROM kv WHERE {" OR ".join("substr(key, 1, ?) = ?" for _ in prefixes)}',
+            [arg for prefix in prefixes for arg in (len(prefix), prefix)])
+
+    def incr(self, key, amount=1, ttl=None):
+        now = time.time()
+        conn = self._conn()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute('SELECT value FROM kv WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)',
+                               (key, now)).fetchone()
+            if row:
+                value = int(row[0]) + amount
+                conn.execute('UPDATE kv SET value = ? WHERE key = ?', (str(value), key))
+            else:
+                value = amount
+                conn.execute('INSERT OR REPLACE INTO kv (key, value, expires_at) VALUES (?, ?, ?)',
+                             (key, str(value), now + ttl if ttl else None))
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return value
+
+    def publish(self, channel, message):
+        now = time.time()
+        conn = self._conn()
+        conn.execute('INSERT INTO kv_events (channel, message, created_at) VALUES (?, ?, ?)', (channel, message, now))
+        # Eski olaylar ve süresi dolan anahtarlar yayınlayanlar tarafından temizlenir
+        conn.execute('DELETE FROM kv_events WHERE created_at < ?', (now - 60,))
+        conn.execute('DELETE FROM kv WHERE expires_at IS NOT NULL AND expires_at <= ?', (now,))
+
+    def _start_listener(self):
+        if self._listener_pid == os.getpid():
+            return
+        self._listener_pid = os.getpid()
+        row = self._conn().execute('SELECT MAX(id) FROM kv_events').fetchone()
+        self._last_event = row[0] or 0
+        threading.Thread(target=self._poll, daemon=True, name='kv-events').start()
+
+    def _poll(self):
+        pid = os.getpid()
+        while self._listener_pid == pid:
+            time.sleep(SQLITE_POLL_INTERVAL)
+            try:
+                rows = self._conn().execute('SELECT id, channel, message FROM kv_events WHERE id > ? ORDER BY id',
+                                            (self._last_event,)).fetchall()
+            except sqlite3.Error as e:
+                print(f"⚠️ KV olayları okunamadı: {e}")
+                continue
+            for event_id, channel, message in rows:
+                self._last_event = event_id
+                self._dispatch(channel, message)
+
+    def reset_after_fork(self):
+        self._local = threading.local()
+        self._listener_pid = None
+        if self._subscribers:
+            self._start_listener()
+
+
+class RedisError(Exception):
+    pass
+
+
+class RedisConnection:
+    """RESP2 protokolünün kullandığımız kadarı; harici bağımlılık gerektirmez"""
+
+    def __init__(self, host, port, db=0, password=None, timeout=5):
+        self.sock = socket.create_connection((host, port), timeout=timeout)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.reader = self.sock.makefile('rb')
+        if password:
+            self.call('AUTH', password)
+        if db:
+            self.call('SELECT', db)
+
+    def send(self, *commands):
+        payload = bytearray()
+        for command in commands:
+            payload += b'*%d\r\n' % len(command)
+            for arg in command:
+                data = arg if isinstance(arg, bytes) else str(arg).encode('utf-8')
+                payload += b'$%d\r\n%s\r\n' % (len(data), data)
+        self.sock.sendall(payload)
+
+    def read(self):
+        line = self.reader.readline()
+        if not line:
+            raise ConnectionError('Redis bağlantısı kapandı')
+        kind, rest = line[:1], line[1:-2]
+        if kind == b'+':
+            return rest.decode('utf-8')
+        if kind == b'-':
+            raise RedisError(rest.decode('utf-8'))
+        if kind == b':':
+            return int(rest)
+        if kind == b'$':
+            size = int(rest)
+            if size < 0:
+                return None
+            data = self.reader.read(size + 2)[:-2]
+            return data.decode('utf-8')
+        if kind == b'*':
+            size = int(rest)
+            return None if size < 0 else [self.read() for _ in range(size)]
+        raise RedisError(f'Beklenmeyen yanıt: {line!r}')
+
+    def call(self, *args):
+        self.send(args)
+        return self.read()
+
+    def pipeline(self, *commands):
+        """Komutları tek seferde gönder, yanıtları sırayla oku (tek gidiş-dönüş)"""
+        self.send(*commands)
+        return [self.read() for _ in commands]
+
+    def close(self):
+        try:
+            self.sock.close()
+        except OSError:
+            pass
+
+
+class RedisKV(KVStore):
+    def __init__(self, url: str):
+        super().__init__()
+        parsed = urlparse(url)
+        self.host = parsed.hostname or 'localhost'
+        self.port = parsed.port or 6379
+        self.db = int(parsed.path.strip('/') or 0)
+        self.password = parsed.password
+        self._local = threading.local()
+        self._listener_pid = None
+        # Dinleyicinin abone olduğu bağlantı; _sub_lock ile korunur
+        self._pubsub = None
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = RedisConnection(self.host, self.port, self.db, self.password)
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _run(self, fn):
+        # Kopan bağlantı bir kez yeniden kurulur
+        for attempt in (0, 1):
+            try:
+                return fn(self._connection())
+            except (ConnectionError, OSError):
+                self._local.conn = None
+                metrics.incr('kv.reconnect')
+                if attempt:
+                    raise
+
+    def get(self, key):
+        return self._run(lambda c: c.call('GET', key))
+
+    def get_many(self, keys):
+        if not keys:
+            return []
+        return self._run(lambda c: c.call('MGET', *keys))
+
+    def set(self, key, value, ttl=None):
+        if ttl:
+            self._run(lambda c: c.call('SET', key, value, 'PX', int(ttl * 1000)))
+        else:
+            self._run(lambda c: c.call('SET', key, value))
+
+    def set_if_absent(self, key, value, ttl=None):
+        args = ['SET', key, value, 'NX']
+        if ttl:
+            args += ['PX', int(ttl * 1000)]
+        return self._run(lambda c: c.call(*args)) == 'OK'
+
+    def delete(self, key):
+        self._run(lambda c: c.call('DEL', key))
+
+    def clear(self):
+        # FLUSHDB veritabanını paylaşan diğer servislerin anahtarlarını da silerdi;
+        # SCAN yalnızca eşleşenleri parça parça getirir, UNLINK sunucuyu bloklamadan siler
+        for namespace in APP_NAMESPACES:
+            cursor = '0'
+            while True:
+                cursor, keys = self._run(lambda c: c.call('SCAN', cursor, 'MATCH', f'{namespace}:*',
+                                                          'COUNT', SCAN_COUNT))
+                if keys:
+                    self._run(lambda c: c.call('UNLINK', *keys))
+                if cursor == '0':
+                    break
+
+    def incr(self, key, amount=1, ttl=None):
+        if not ttl:
+            return self._run(lambda c: c.call('INCRBY', key, amount))
+        # Önce TTL'li boş sayaç (yoksa), sonra artırma; tek gidiş-dönüş
+        _, value = self._run(lambda c: c.pipeline(('SET', key, 0, 'PX', int(ttl * 1000), 'NX'),
+                                                  ('INCRBY', key, amount)))
+        return value
+
+    def publish(self, channel, message):
+        self._run(lambda c: c.call('PUBLISH', channel, message))
+
+    def _start_listener(self):
+        if self._listener_pid == os.getpid():
+            return
+        self._listener_pid = os.getpid()
+        threading.Thread(target=self._listen, daemon=True, name='kv-pubsub').start()
+
+    def _add_channel(self, channel):
+        # Dinleyici abone olduktan sonra eklenen kanal canlı bağlantıya da gönderilir;
+        # bağlantı yoksa dinleyici (yeniden) bağlanınca tüm kanallara abone olur
+        if self._pubsub is not None:
+            try:
+                self._pubsub.send(('SUBSCRIBE', channel))
+            except OSError:
+                pass
+
+    def _listen(self):
+        pid = os.getpid()
+        while self._listener_pid == pid:
+            try:
+                conn = RedisConnection(self.host, self.port, self.db, self.password, timeout=None)
+                with self._sub_lock:
+                    conn.send(('SUBSCRIBE', *self._subscribers))
+                    self._pubsub = conn
+                while self._listener_pid == pid:
+                    reply = conn.read()
+                    if isinstance(reply, list) and reply[0] == 'message':
+                        self._dispatch(reply[1], reply[2])
+            except (ConnectionError, OSError, RedisError) as e:
+                with self._sub_lock:
+                    self._pubsub = None
+                print(f"⚠️ KV pub/sub bağlantısı koptu, yeniden bağlanılıyor: {e}")
+                metrics.incr('kv.reconnect')
+                time.sleep(1)
+
+    def reset_after_fork(self):
+        self._local = threading.local()
+        self._listener_pid = None
+        # Master'ın soketi worker'da kullanılmaz
+        self._pubsub = None
+        if self._subscribers:
+            self._start_listener()
+
+
+def create_kv(url: str = KV_URL) -> KVStore:
+    if url.startswith('redis://'):
+        return RedisKV(url)
+    if url.startswith('sqlite:///'):
+        return SQLiteKV(url[len('sqlite:///'):])
+    return MemoryKV()
+
+
+_kv = None
+_kv_lock = threading.Lock()
+
+
+def get_kv() -> KVStore:
+    """Süreç genelinde paylaşılan depo"""
+    global _kv
+    if _kv is None:
+        with _kv_lock:
+            if _kv is None:
+                _kv = create_kv()
+    return _kv
+
+
+class KVCache:
+    """
+    İki katmanlı önbellek: worker içi kısa ömürlü kopya + paylaşılan KV
+    invalidate() anahtarı KV'den siler ve tüm sunuculara pub/sub ile
+    yayınlar; her worker kendi kopyasını atar.
+    """
+
+    CHANNEL = 'cache-invalidate'
+
+    def __init__(self, kv: KVStore, namespace: str, ttl: float = 300, local_ttl: float = 5):
+        self.kv = kv
+        self.namespace = namespace
+        self.ttl = ttl
+        self.local_ttl = local_ttl
+        self._local = {}
+        self._lock = threading.Lock()
+        kv.subscribe(self.CHANNEL, self._on_invalidate)
+
+    def _on_invalidate(self, message):
+        namespace, _, key = message.partition(':')
+        if namespace == self.namespace:
+            with self._lock:
+                self._local.pop(key, None)
+
+    def get(self, key: str, loader: Callable[[], Optional[str]]) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            item = self._local.get(key)
+        if item and item[1] > now:
+            metrics.incr(f'cache.{self.namespace}.local_hit')
+            return item[0]
+
+        value = self.kv.get(f'{self.namespace}:{key}')
+        if value is None:
+            metrics.incr(f'cache.{self.namespace}.miss')
+            value = loader()
+            if value is None:
+                return None
+            self.kv.set(f'{self.namespace}:{key}', value, self.ttl)
+        else:
+            metrics.incr(f'cache.{self.namespace}.hit')
+
+        with self._lock:
+            if len(self._local) > 10000:
+                self._local.clear()
+            self._local[key] = (value, now + self.local_ttl)
+        return value
+
+    def invalidate(self, key: str):
+        self.kv.delete(f'{self.namespace}:{key}')
+        with self._lock:
+            self._local.pop(key, None)
+        self.kv.publish(self.CHANNEL, f'{self.namespace}:{key}')
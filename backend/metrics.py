@@ -0,0 +1,63 @@
+"""
+Basit in-process metrik kaydı
+Sayaçlar, gauge'lar ve gecikme özetleri worker başına tutulur,
+/api/metrics üzerinden JSON olarak okunur.
+"""
+import threading
+from collections import defaultdict, deque
+
+_lock = threading.Lock()
+_counters = defaultdict(int)
+_gauges = {}
+_timings = defaultdict(lambda: deque(maxlen=1000))
+
+
+def incr(name, value=1):
+    """Sayacı artır"""
+    with _lock:
+        _counters[name] += value
+
+
+def set_gauge(name, value):
+    """Anlık değeri kaydet"""
+    with _lock:
+        _gauges[name] = value
+
+
+def observe(name, seconds):
+    """Süre ölçümü ekle (son 1000 örnek tutulur)"""
+    with _lock:
+        _timings[name].append(seconds)
+
+
+def percentile(name, pct):
+    """Kayıtlı ölçümlerden yüzdelik değer döndür, örnek yoksa None"""
+    with _lock:
+        samples = sorted(_timings[name]) if name in _timings else []
+    if not samples:
+        return None
+    index = min(len(samples) - 1, int(len(samples) * pct / 100))
+    return samples[index]
+
+
+def snapshot():
+    """Tüm metriklerin kopyasını döndür"""
+    with _lock:
+        timings = {name: sorted(values) for name, values in _timings.items() if values}
+        result = {
+            'counters': dict(_counters),
+            'gauges': dict(_gauges),
+        }
+
+    summary = {}
+    for name, values in timings.items():
+        count = len(values)
+        summary[name] = {
+            'count': count,
+            'p50': values[int(count * 0.50)],
+            'p95': values[min(count - 1, int(count * 0.95))],
+            'p99': values[min(count - 1, int(count * 0.99))],
+            'max': values[-1],
+        }
+    result['timings'] = summary
+    return result
@@ -0,0 +1,254 @@
+"""
+İstek profilleme (opsiyonel)
+PROFILE_SAMPLE_RATE > 0 ise isteklerin o oranı, ayrıca güvenilir IP'lerden
+X-Profile başlığıyla gelen istekler profillenir. İki mod vardır:
+  sample  : ayrı bir thread isteğin yığınını aralıklarla örnekler (varsayılan,
+            eşzamanlı isteklerde de çalışır)
+  cprofile: cProfile ile tam çağrı profili (.prof); aynı anda tek istek
+Her profillenen istek için PROFILE_DIR altına flame graph araçlarının
+(flamegraph.pl, speedscope) okuduğu collapsed-stack dosyası ve SQLite
+ifade süreleri yazılır, yanıta Server-Timing başlığı eklenir.
+"""
+import os
+import random
+import sqlite3
+import sys
+import threading
+import time
+from collections import Counter
+
+from flask import request, g
+
+import metrics
+
+PROFILE_SAMPLE_RATE = float(os.environ.get("PROFILE_SAMPLE_RATE", 0))
+PROFILE_TRUSTED_IPS = {ip.strip() for ip in os.environ.get("PROFILE_TRUSTED_IPS", "").split(',') if ip.strip()}
+PROFILE_HEADER = 'X-Profile'
+PROFILE_MODE = os.environ.get("PROFILE_MODE", "sample")
+PROFILE_INTERVAL = float(os.environ.get("PROFILE_INTERVAL_MS", 5)) / 1000
+PROFILE_DIR = os.environ.get("PROFILE_DIR", "profiles")
+
+_active = threading.local()
+
+
+class RequestProfile:
+    def __init__(self, thread_id):
+        self.thread_id = thread_id
+        self.started = time.perf_counter()
+        self.stacks = Counter()
+        self.sql = []
+        self.sql_time = 0.0
+        self.profiler = None
+
+    def add_sql(self, statement, seconds):
+        self.sql_time += seconds
+        self.sql.append((seconds, statement))
+
+
+class StackSampler:
+    """Profillenen thread'lerin yığınlarını tek bir arka plan thread'inden örnekler"""
+
+    def __init__(self, interval=PROFILE_INTERVAL):
+        self.interval = interval
+        self._profiles = {}
+        self._lock = threading.Lock()
+        self._pid = None
+
+    def start(self, profile):
+        with self._lock:
+            self._profiles[profile.thread_id] = profile
+            if self._pid != os.getpid():
+                # Fork sonrası worker kendi örnekleyicisini başlatır
+                self._pid = os.getpid()
+                threading.Thread(target=self._run, daemon=True, name='profiler').start()
+
+    def stop(self, profile):
+        with self._lock:
+            self._profiles.pop(profile.thread_id, None)
+
+    def _run(self):
+        own = threading.get_ident()
+        while True:
+            time.sleep(self.interval)
+            with self._lock:
+                profiles = list(self._profiles.values())
+            if not profiles:
+                continue
+            frames = sys._current_frames()
+            for profile in profiles:
+                frame = frames.get(profile.thread_id)
+                if frame is None or profile.thread_id == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                profile.stacks[';'.join(reversed(stack))] += 1
+
+
+sampler = StackSampler()
+
+
+# ---------- SQLite ifade süreleri ----------
+
+def _statement(sql):
+    return ' '.join(sql.split())[:300]
+
+
+class TracedCursor(sqlite3.Cursor):
+    def execute(self, sql, parameters=()):
+        profile = getattr(_active, 'profile', None)
+        if profile is None:
+            return super().execute(sql, parameters)
+        self.connection.implicit_begin = False
+        started = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            implicit = self.connection.implicit_begin and not sql.lstrip().upper().startswith('BEGIN')
+            prefix = '[BEGIN] ' if implicit else ''
+            profile.add_sql(prefix + _statement(sql), time.perf_counter() - started)
+
+    def executemany(self, sql, seq_of_parameters):
+        profile = getattr(_active, 'profile', None)
+        if profile is None:
+            return super().executemany(sql, seq_of_parameters)
+        started = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            profile.add_sql(f"[executemany] {_statement(sql)}", time.perf_counter() - started)
+
+
+class TracedConnection(sqlite3.Connection):
+    """
+    Profile parametreleri yerleştirilmemiş SQL metni yazılır (? yer
+    tutucularıyla); bağlanan değerler (oturum token'ı, parola özeti, mesaj
+    içeriği) diske çıkmaz. Trace callback yalnızca sqlite3 modülünün örtük
+    BEGIN'ini fark etmek için kullanılır: callback'e gelen metinde
+    parametreler yerleştirilmiştir, saklanmaz. Süre, çağrıyı saran cursor'da
+    ölçülür.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.implicit_begin = False
+        self.set_trace_callback(self._on_statement)
+
+    def _on_statement(self, statement):
+        if getattr(_active, 'profile', None) is not None and statement.lstrip().upper().startswith('BEGIN'):
+            self.implicit_begin = True
+
+    def cursor(self, factory=TracedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def commit(self):
+        profile = getattr(_active, 'profile', None)
+        if profile is None:
+            return super().commit()
+        started = time.perf_counter()
+        try:
+            return super().commit()
+        finally:
+            profile.add_sql('COMMIT', time.perf_counter() - started)
+
+
+# ---------- Flask kancaları ----------
+
+def should_profile() -> bool:
+    if request.headers.get(PROFILE_HEADER) and request.remote_addr in PROFILE_TRUSTED_IPS:
+        return True
+    return PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE
+
+
+def _start():
+    if not should_profile():
+        return
+    profile = RequestProfile(threading.get_ident())
+    if PROFILE_MODE == 'cprofile':
+        import cProfile
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+            profile.profiler = profiler
+        except ValueError:
+            # Başka bir istek zaten cProfile kullanıyor; örneklemeye düş
+            pass
+    if profile.profiler is None:
+        sampler.start(profile)
+    _active.profile = profile
+    g.profile = profile
+
+
+def _finish(response):
+    profile = getattr(_active, 'profile', None)
+    if profile is None:
+        return response
+    _active.profile = None
+    if profile.profiler is not None:
+        profile.profiler.disable()
+    else:
+        sampler.stop(profile)
+
+    elapsed = time.perf_counter() - profile.started
+    response.headers['Server-Timing'] = (f'app;dur={elapsed * 1000:.1f}, '
+                                         f'db;dur={profile.sql_time * 1000:.1f};desc="{len(profile.sql)} sorgu"')
+    metrics.incr('profiling.requests')
+    try:
+        write_profile(profile, request.endpoint or 'unknown', elapsed, response.status_code)
+    except OSError as e:
+        print(f"⚠️ Profil yazılamadı: {e}")
+    return response
+
+
+def _cleanup(exc=None):
+    # after_request çalışmadan biten (hata fırlatan) istekler thread'de iz bırakmasın
+    profile = getattr(_active, 'profile', None)
+    if profile is not None:
+        _active.profile = None
+        if profile.profiler is not None:
+            profile.profiler.disable()
+        else:
+            sampler.stop(profile)
+
+
+def write_profile(profile, endpoint, elapsed, status):
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    name = f"{int(time.time() * 1000)}-{os.getpid()}-{endpoint.replace('.', '_')}-{int(elapsed * 1000)}ms"
+    base = os.path.join(PROFILE_DIR, name)
+
+    if profile.profiler is not None:
+        profile.profiler.dump_stats(base + '.prof')
+    else:
+        with open(base + '.collapsed', 'w') as f:
+            for stack, count in profile.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+    with open(base + '.sql.txt', 'w') as f:
+        f.write(f"# {request.method} {request.path} -> {status}, {elapsed * 1000:.1f} ms, "
+                f"{len(profile.sql)} ifade, {profile.sql_time * 1000:.1f} ms SQLite\n")
+        for seconds, statement in sorted(profile.sql, reverse=True):
+            f.write(f"{seconds * 1000:9.3f} ms  {statement}\n")
+
+
+def is_enabled() -> bool:
+    return PROFILE_SAMPLE_RATE > 0 or bool(PROFILE_TRUSTED_IPS)
+
+
+def init_profiling(app, db=None):
+    """Profilleme açıksa istek kancalarını ve SQLite izlemeyi kur"""
+    if not is_enabled():
+        return
+    app.before_request(_start)
+    app.after_request(_finish)
+    app.teardown_request(_cleanup)
+    if db is not None and hasattr(db, 'connection_factory'):
+        db.connection_factory = TracedConnection
+    print(f"Profilleme açık: oran={PROFILE_SAMPLE_RATE}, mod={PROFILE_MODE}, dizin={PROFILE_DIR}")
@@ -0,0 +1,52 @@
+"""
+Silinen mesajları temizleme aracı
+
+Silinen ve temizlenen chatlerin mesajları worker'larda arka planda
+partiler halinde silinir (purge_queue). Bu araç kuyruğun durumunu
+gösterir ve kuyruğu worker'ları beklemeden boşaltır. DATABASE_URL
+postgres ise PostgreSQL kuyruğu işlenir. --orphans, chat'i artık olmayan
+mesajları (SQLite'ta foreign_keys kapalıyken silinmiş chatlerden
+kalanlar) yeniden tarayıp kuyruğa ekler; bu tarama şema ilk
+güncellendiğinde zaten bir kez yapılır.
+
+Kullanım:
+    python backend/purge_tool.py --status
+    python backend/purge_tool.py [--orphans] [--grace 0] [--batch-size 500]
+"""
+import argparse
+import time
+
+from storage import create_storage
+
+
+def print_status(db):
+    for status in db.get_purge_status():
+        print(f"{status['location']}: {status['jobs']} iş ({status['chats']} silinen chat), "
+              f"{status['messages']} mesaj bekliyor")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--db', default='pahiy_ai.db')
+    parser.add_argument('--status', action='store_true', help='sadece kuyruk durumunu göster')
+    parser.add_argument('--orphans', action='store_true', help="chat'i olmayan mesajları yeniden tara")
+    parser.add_argument('--grace', type=int, help='silinen chat satırları için bekleme (sn)')
+    parser.add_argument('--batch-size', type=int)
+    args = parser.parse_args()
+
+    db = create_storage(args.db)
+
+    if not args.status:
+        if args.orphans:
+            print(f"{db.requeue_orphan_messages()} chat'in sahipsiz mesajları kuyruğa alındı")
+
+        started = time.perf_counter()
+        totals = db.purge_pending(grace=args.grace, batch_size=args.batch_size)
+        print(f"{totals['messages']} mesaj, {totals['chats']} chat silindi "
+              f"({time.perf_counter() - started:.2f} s); grace süresini bekleyen chat: {totals['pending']}")
+
+    print_status(db)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,220 @@
+"""
+Kullanıcı başına kota motoru
+- Aynı anda en fazla K model çağrısı
+- Kayan pencerede token bütçesi (istem + yanıt boyutu)
+Sayaçlar paylaşılan KV deposunda (KV_URL) tutulur, böylece limitler tüm
+worker'lar ve sunucular için birliktedir; KV_URL boşsa sayım süreç içidir
+ve limitler worker başına geçerli olur. Token kullanımı ayrıca periyodik
+olarak veritabanına yazılır; KV'de olmayan kovalar (ör. Redis yeniden
+başladıktan sonra) veritabanından geri yüklenir.
+"""
+import os
+import time
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+
+import metrics
+from kv import get_kv
+
+MAX_CONCURRENT = int(os.environ.get("USER_MAX_CONCURRENT", 2))
+TOKEN_BUDGET = int(os.environ.get("USER_TOKEN_BUDGET", 200000))
+TOKEN_WINDOW = int(os.environ.get("USER_TOKEN_WINDOW", 3600))  # saniye
+FLUSH_INTERVAL = float(os.environ.get("USER_QUOTA_FLUSH_INTERVAL", 10))
+# Eşzamanlılık sayacının ömrü; sayacı bırakamadan ölen worker'ın tuttuğu yer en geç bu sürede boşalır
+SLOT_TTL = float(os.environ.get("USER_SLOT_TTL", 600))
+
+# Kullanım dakikalık kovalarda tutulur
+BUCKET_SECONDS = 60
+
+
+def estimate_tokens(text) -> int:
+    """Kaba token tahmini (~4 karakter / token)"""
+    if not text:
+        return 0
+    return max(1, len(text) // 4)
+
+
+class QuotaExceeded(Exception):
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.message = message
+        self.retry_after = retry_after
+
+
+class GenerationSlot:
+    """Tek bir model çağrısı için kota kaydı"""
+
+    def __init__(self, manager, user_id):
+        self.manager = manager
+        self.user_id = user_id
+        self.tokens = 0
+
+    def charge_prompt(self, prompt):
+        """İstemi model çağrısından önce bütçeden düş, aşılıyorsa QuotaExceeded"""
+        tokens = estimate_tokens(prompt)
+        self.manager.reserve(self.user_id, tokens)
+        self.tokens += tokens
+
+    def charge_response(self, text):
+        tokens = estimate_tokens(text)
+        self.manager.add_usage(self.user_id, tokens)
+        self.tokens += tokens
+
+
+class QuotaManager:
+    def __init__(self, db, kv=None, max_concurrent=MAX_CONCURRENT, token_budget=TOKEN_BUDGET,
+                 window=TOKEN_WINDOW, flush_interval=FLUSH_INTERVAL, slot_ttl=SLOT_TTL):
+        self.db = db
+        self.kv = kv if kv is not None else get_kv()
+        self.max_concurrent = max_concurrent
+        self.token_budget = token_budget
+        self.window = window
+        self.flush_interval = flush_interval
+        self.slot_ttl = slot_ttl
+
+        self._lock = threading.Lock()
+        self._loaded = {}                   # user_id -> veritabanından yükleme zamanı
+        self._pending = defaultdict(int)    # (user_id, bucket) -> yazılmamış token
+        self._flusher = None
+
+    # ---------- sayım ----------
+
+    def _current_bucket(self):
+        return int(time.time()) // BUCKET_SECONDS
+
+    def _bucket_key(self, user_id, bucket):
+        return f'quota:tokens:{user_id}:{bucket}'
+
+    def _bucket_ttl(self, bucket):
+        # Kova pencereden çıkana kadar yaşar
+        return max(1, (bucket + 1) * BUCKET_SECONDS + self.window - time.time())
+
+    def _load_from_db(self, user_id):
+        """
+        KV'de olmayan kovaları veritabanından geri yükle (worker başına pencerede bir kez)
+        Var olan kovaya dokunulmaz: KV, veritabanına henüz yazılmamış kullanımı da içerir.
+        Veritabanı okuması kilit dışında yapılır.
+        """
+        now = time.time()
+        with self._lock:
+            loaded = self._loaded.get(user_id)
+            if loaded is not None and now - loaded < self.window:
+                return
+            self._loaded[user_id] = now
+        since = self._current_bucket() - self.window // BUCKET_SECONDS
+        try:
+            rows = self.db.get_token_usage(user_id, since)
+        except Exception as e:
+            with self._lock:
+                self._loaded.pop(user_id, None)
+            print(f"⚠️ Kota kullanımı veritabanından okunamadı: {e}")
+            return
+        for bucket, tokens in rows:
+            self.kv.set_if_absent(self._bucket_key(user_id, bucket), str(tokens), self._bucket_ttl(bucket))
+
+    def _window_usage(self, user_id):
+        """Penceredeki (kova, token) çiftleri"""
+        current = self._current_bucket()
+        buckets = list(range(current - self.window // BUCKET_SECONDS + 1, current + 1))
+        values = self.kv.get_many([self._bucket_key(user_id, bucket) for bucket in buckets])
+        return [(bucket, int(value)) for bucket, value in zip(buckets, values) if value]
+
+    def _retry_after(self, usage):
+        used = [bucket for bucket, tokens in usage if tokens > 0]
+        if not used:
+            return BUCKET_SECONDS
+        return max(1, (min(used) * BUCKET_SECONDS + self.window) - int(time.time()))
+
+    def reserve(self, user_id, tokens):
+        """
+        Önce sayaca ekle, sonra pencereyi oku; bütçe aşıldıysa geri al.
+        Aynı anda gelen istekler bütçeyi birlikte aşamaz (en kötü ihtimalle ikisi de reddedilir).
+        """
+        self._load_from_db(user_id)
+        bucket = self._add(user_id, tokens)
+        usage = self._window_usage(user_id)
+        if sum(t for _, t in usage) > self.token_budget:
+            self._add(user_id, -tokens, bucket)
+            metrics.incr('quota.token_rejected')
+            raise QuotaExceeded('Kullanım limitinize ulaştınız. Lütfen daha sonra tekrar deneyin.',
+                                self._retry_after(usage))
+
+    def add_usage(self, user_id, tokens):
+        self._add(user_id, tokens)
+
+    def _add(self, user_id, tokens, bucket=None):
+        if bucket is None:
+            bucket = self._current_bucket()
+        self.kv.incr(self._bucket_key(user_id, bucket), tokens, ttl=self._bucket_ttl(bucket))
+        with self._lock:
+            self._pending[(user_id, bucket)] += tokens
+        return bucket
+
+    # ---------- eşzamanlılık ----------
+
+    def _active_key(self, user_id):
+        return f'quota:active:{user_id}'
+
+    def acquire(self, user_id):
+        key = self._active_key(user_id)
+        if self.kv.incr(key, 1, ttl=self.slot_ttl) > self.max_concurrent:
+            self.kv.incr(key, -1, ttl=self.slot_ttl)
+            metrics.incr('quota.concurrency_rejected')
+            raise QuotaExceeded('Önceki mesajınız hâlâ işleniyor. Lütfen bekleyin.', 1)
+        self._ensure_flusher()
+        return GenerationSlot(self, user_id)
+
+    def release(self, user_id):
+        key = self._active_key(user_id)
+        # Sayaç üretim sürerken süresi dolup silindiyse eksiye düşer; sıfırdan yeniden başlat
+        if self.kv.incr(key, -1, ttl=self.slot_ttl) < 0:
+            self.kv.delete(key)
+
+    @contextmanager
+    def generation(self, user_id):
+        """with quota.generation(user_id) as slot: ... şeklinde kullanılır"""
+        slot = self.acquire(user_id)
+        try:
+            yield slot
+        finally:
+            self.release(user_id)
+
+    # ---------- kalıcılık ----------
+
+    def flush(self):
+        """Bu worker'ın bekleyen kullanım değerlerini veritabanına yaz"""
+        now = time.time()
+        with self._lock:
+            pending = {k: v for k, v in self._pending.items() if v}
+            self._pending = defaultdict(int)
+            # Yükleme kaydı pencere dolunca düşer; kullanıcı dönerse yeniden yüklenir
+            for user_id in [u for u, loaded in self._loaded.items() if now - loaded >= self.window]:
+                del self._loaded[user_id]
+
+        if not pending:
+            return
+        rows = [(user_id, bucket, tokens) for (user_id, bucket), tokens in pending.items()]
+        try:
+            self.db.add_token_usage(rows)
+            self.db.prune_token_usage(self._current_bucket() - self.window // BUCKET_SECONDS)
+        except Exception as e:
+            # Yazılamayan değerleri bir sonraki turda tekrar dene
+            with self._lock:
+                for (user_id, bucket), tokens in pending.items():
+                    self._pending[(user_id, bucket)] += tokens
+            print(f"❌ Kota kaydı yazılamadı: {e}")
+
+    def _ensure_flusher(self):
+        if self._flusher and self._flusher.is_alive():
+            return
+        with self._lock:
+            if self._flusher and self._flusher.is_alive():
+                return
+            self._flusher = threading.Thread(target=self._flush_loop, name='quota-flush', daemon=True)
+            self._flusher.start()
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(self.flush_interval)
+            self.flush()
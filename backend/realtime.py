@@ -0,0 +1,94 @@
+"""
+WebSocket bağlantı altyapısı
+Her bağlantının sınırlı bir giden kuyruğu (Outbox) vardır; tek bir yazıcı
+thread'i kuyruğu sokete boşaltır. İstemci yavaş okursa:
+  1. kuyruk COALESCE_AT çerçeveyi geçince aynı akışın delta'ları birleştirilir,
+  2. MAX_FRAMES dolarsa bağlantı yavaş tüketici olarak kapatılır.
+Böylece yavaş bir istemci worker belleğini ve model thread'lerini tutamaz.
+"""
+import os
+import threading
+from collections import deque, defaultdict
+
+import metrics
+
+WS_MAX_FRAMES = int(os.environ.get("WS_MAX_FRAMES", 512))
+WS_COALESCE_AT = int(os.environ.get("WS_COALESCE_AT", 64))
+
+
+class Outbox:
+    def __init__(self, max_frames=WS_MAX_FRAMES, coalesce_at=WS_COALESCE_AT):
+        self.max_frames = max_frames
+        self.coalesce_at = coalesce_at
+        self.open = True
+        self._frames = deque()
+        self._cond = threading.Condition()
+
+    def put(self, frame: dict) -> bool:
+        """Çerçeveyi kuyruğa ekle; bağlantı kapalıysa veya kapatıldıysa False"""
+        with self._cond:
+            if not self.open:
+                return False
+
+            if frame.get('type') == 'delta' and len(self._frames) >= self.coalesce_at:
+                for pending in reversed(self._frames):
+                    if pending.get('type') == 'delta' and pending.get('id') == frame.get('id'):
+                        pending['text'] += frame['text']
+                        metrics.incr('ws.coalesced')
+                        return True
+
+            if len(self._frames) >= self.max_frames:
+                self.open = False
+                self._cond.notify_all()
+                metrics.incr('ws.slow_consumer')
+                return False
+
+            self._frames.append(frame)
+            self._cond.notify()
+            return True
+
+    def get(self, timeout=None):
+        """Sıradaki çerçeve; zaman aşımında veya kapalı ve boşsa None"""
+        with self._cond:
+            self._cond.wait_for(lambda: self._frames or not self.open, timeout)
+            return self._frames.popleft() if self._frames else None
+
+    def close(self):
+        with self._cond:
+            self.open = False
+            self._cond.notify_all()
+
+
+class ConnectionRegistry:
+    """Bu worker'daki bağlantılar (user_id -> Outbox kümesi)"""
+
+    def __init__(self):
+        self._connections = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def add(self, user_id, outbox):
+        with self._lock:
+            self._connections[user_id].add(outbox)
+            count = sum(len(boxes) for boxes in self._connections.values())
+        metrics.set_gauge('ws.connections', count)
+
+    def remove(self, user_id, outbox):
+        with self._lock:
+            boxes = self._connections.get(user_id)
+            if boxes:
+                boxes.discard(outbox)
+                if not boxes:
+                    del self._connections[user_id]
+            count = sum(len(boxes) for boxes in self._connections.values())
+        metrics.set_gauge('ws.connections', count)
+
+    def has(self, user_id) -> bool:
+        with self._lock:
+            return user_id in self._connections
+
+    def send(self, user_id, frame):
+        """Kullanıcının bu worker'daki tüm bağlantılarına gönder"""
+        with self._lock:
+            boxes = list(self._connections.get(user_id, ()))
+        for outbox in boxes:
+            outbox.put(dict(frame))
@@ -0,0 +1,30 @@
+"""
+Chat özet tutarlılık onarımı
+
+chats tablosundaki message_count, last_message_preview ve last_role
+kolonları mesaj yazılırken artımlı güncellenir. Elle yapılan silmeler,
+yarıda kalan taşımalar gibi durumlarda sayısı tutmayan chatleri
+mesajlardan yeniden hesaplar. Cron / scheduled job ile çalıştırılabilir.
+
+Kullanım:
+    python backend/repair_tool.py
+"""
+import argparse
+import time
+
+from storage import create_storage
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--db', default='pahiy_ai.db')
+    args = parser.parse_args()
+
+    db = create_storage(args.db)
+    started = time.perf_counter()
+    repaired = db.repair_chat_summaries()
+    print(f"{repaired} chat özeti düzeltildi ({time.perf_counter() - started:.2f} s)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,152 @@
+"""
+API yanıt katmanı
+JSON, orjson kuruluysa onunla (değilse stdlib ile) üretilir. Yanıtlar
+istemcinin Accept-Encoding başlığına göre br (brotli kuruluysa) veya gzip
+ile sıkıştırılır: COMPRESS_MIN_BYTES altındaki yanıtlar olduğu gibi gider,
+akış yanıtları parça parça sıkıştırılır. Olay akışları (text/event-stream),
+zaten sıkıştırılmış içerik ve dosyalar sıkıştırılmaz.
+"""
+import os
+import time
+import zlib
+
+from flask import request
+from flask.json.provider import DefaultJSONProvider
+
+import metrics
+
+# Opsiyonel hızlandırıcılar: pip install orjson brotli
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    try:
+        import brotlicffi as brotli
+    except ImportError:
+        brotli = None
+
+COMPRESS_MIN_BYTES = int(os.environ.get("COMPRESS_MIN_BYTES", 1024))
+GZIP_LEVEL = int(os.environ.get("COMPRESS_GZIP_LEVEL", 6))
+# Dinamik yanıtlarda yüksek brotli kaliteleri CPU'ya değmez
+BROTLI_QUALITY = int(os.environ.get("COMPRESS_BROTLI_QUALITY", 4))
+
+COMPRESSIBLE_TYPES = {'application/json', 'application/x-ndjson', 'application/javascript'}
+SKIPPED_TYPES = {'text/event-stream'}
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """
+    jsonify ve request.get_json için orjson. Anahtarlar sıralanmaz ve Türkçe
+    karakterler kaçışsız UTF-8 yazılır; orjson'un desteklemediği değerlerde
+    (str olmayan anahtar, 64 bit'i aşan sayı) stdlib'e düşülür.
+    """
+    sort_keys = False
+    ensure_ascii = False
+
+    def dumps_bytes(self, obj, **kwargs) -> bytes:
+        if orjson is not None and not kwargs:
+            try:
+                return orjson.dumps(obj, default=self.default)
+            except TypeError:
+                pass
+        return super().dumps(obj, **kwargs).encode('utf-8')
+
+    def dumps(self, obj, **kwargs) -> str:
+        return self.dumps_bytes(obj, **kwargs).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        if orjson is not None and not kwargs:
+            try:
+                return orjson.loads(s)
+            except orjson.JSONDecodeError:
+                pass
+        return super().loads(s, **kwargs)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(self.dumps_bytes(obj) + b'\n', mimetype=self.mimetype)
+
+
+# ---------- Sıkıştırma ----------
+
+def available_encodings():
+    return ['br', 'gzip'] if brotli is not None else ['gzip']
+
+
+def compressor(encoding):
+    """(compress, flush) çifti; br için brotli, diğerleri için gzip"""
+    if encoding == 'br':
+        c = brotli.Compressor(quality=BROTLI_QUALITY)
+        return c.process, c.finish
+    c = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+    return c.compress, c.flush
+
+
+def compress_bytes(data: bytes, encoding: str) -> bytes:
+    compress, flush = compressor(encoding)
+    return compress(data) + flush()
+
+
+def compress_chunks(chunks, encoding):
+    """Akış yanıtını parça parça sıkıştır (boş çıktılar atlanır)"""
+    compress, flush = compressor(encoding)
+    for chunk in chunks:
+        if isinstance(chunk, str):
+            chunk = chunk.encode('utf-8')
+        data = compress(chunk)
+        if data:
+            yield data
+    yield flush()
+
+
+def is_compressible(response) -> bool:
+    mimetype = response.mimetype or ''
+    if mimetype in SKIPPED_TYPES:
+        return False
+    return mimetype in COMPRESSIBLE_TYPES or mimetype.startswith('text/')
+
+
+def compress_response(response):
+    """after_request: Accept-Encoding'e göre yanıtı sıkıştır"""
+    if (request.method == 'HEAD' or response.direct_passthrough
+            or 'Content-Encoding' in response.headers
+            or response.status_code < 200 or response.status_code in (204, 206, 304)
+            or 'no-transform' in response.headers.get('Cache-Control', '')
+            or not is_compressible(response)):
+        return response
+
+    # Aynı URL farklı kodlamalarla dönebilir; araya giren önbellekler ayırsın
+    response.vary.add('Accept-Encoding')
+    encoding = request.accept_encodings.best_match(available_encodings())
+    if not encoding:
+        return response
+
+    if response.is_streamed:
+        response.response = compress_chunks(response.response, encoding)
+        response.headers.pop('Content-Length', None)
+        metrics.incr(f'http.compress.{encoding}.streamed')
+    else:
+        data = response.get_data()
+        if len(data) < COMPRESS_MIN_BYTES:
+            return response
+        started = time.perf_counter()
+        compressed = compress_bytes(data, encoding)
+        metrics.observe('http.compress', time.perf_counter() - started)
+        metrics.incr(f'http.compress.{encoding}')
+        metrics.incr('http.bytes.raw', len(data))
+        metrics.incr('http.bytes.sent', len(compressed))
+        response.set_data(compressed)
+
+    response.headers['Content-Encoding'] = encoding
+    return response
+
+
+def init_responses(app):
+    """Hızlı JSON sağlayıcısını ve yanıt sıkıştırmayı kur"""
+    app.json_provider_class = FastJSONProvider
+    app.json = FastJSONProvider(app)
+    app.after_request(compress_response)
@@ -0,0 +1,184 @@
+"""
+Model çağrıları için adil sıralayıcı
+Model havuzu doluyken bekleyen üretimler kullanıcı başına kuyruklarda
+tutulur ve ağırlıklı adil kuyruk (start-time fair queuing) ile dağıtılır:
+her istek, kullanıcısının önceki isteğinin bitiş etiketinden başlar ve
+maliyeti (tahmini istem token'ı) / ağırlığı kadar ilerler. En küçük
+başlangıç etiketli istek sıradaki boş yeri alır; çok istek gönderen bir
+kullanıcı diğerlerinin önüne geçemez.
+
+Her isteğin bir son tarihi vardır. Beklenen bekleme + model süresi son
+tarihi aşıyorsa istek kuyruğa hiç girmeden, sırası geldiğinde artık
+yetişemeyecekse de model çağrılmadan reddedilir (503 + Retry-After).
+"""
+import math
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import metrics
+from ai_client import ModelError, TIMEOUT
+
+SCHED_CONCURRENCY = int(os.environ.get("GENAI_SCHED_CONCURRENCY", os.environ.get("GENAI_POOL_SIZE", 16)))
+SCHED_MAX_QUEUE = int(os.environ.get("GENAI_SCHED_MAX_QUEUE", 256))
+SCHED_DEADLINE = float(os.environ.get("GENAI_SCHED_DEADLINE", TIMEOUT))
+# İlk ölçümler gelene kadar model çağrısı süresi tahmini (sn)
+SCHED_SERVICE_ESTIMATE = float(os.environ.get("GENAI_SCHED_SERVICE_ESTIMATE", 2))
+SERVICE_EWMA_ALPHA = 0.2
+
+
+def parse_weights(value):
+    """"42:4,7:2" -> {42: 4.0, 7: 2.0}"""
+    weights = {}
+    for item in value.split(','):
+        user_id, _, weight = item.partition(':')
+        if user_id.strip() and weight.strip():
+            weights[int(user_id)] = float(weight)
+    return weights
+
+
+SCHED_WEIGHTS = parse_weights(os.environ.get("GENAI_SCHED_WEIGHTS", ""))
+
+
+class Ticket:
+    """Kuyruktaki tek üretim isteği"""
+
+    def __init__(self, user_id, start, deadline):
+        self.user_id = user_id
+        self.start = start
+        self.deadline = deadline
+        self.enqueued = time.time()
+        self.granted = False
+        self.shed_reason = None
+
+    def remaining(self) -> float:
+        return self.deadline - time.time()
+
+
+class FairScheduler:
+    def __init__(self, capacity=SCHED_CONCURRENCY, max_queue=SCHED_MAX_QUEUE, deadline=SCHED_DEADLINE,
+                 weights=None, service_estimate=SCHED_SERVICE_ESTIMATE):
+        self.capacity = capacity
+        self.max_queue = max_queue
+        self.deadline = deadline
+        self.weights = SCHED_WEIGHTS if weights is None else weights
+        self.service_estimate = service_estimate
+
+        self._cond = threading.Condition()
+        self._queues = {}           # user_id -> deque[Ticket]
+        self._last_finish = {}      # user_id -> son isteğin bitiş etiketi
+        self._virtual = 0.0         # hizmetteki son isteğin başlangıç etiketi
+        self._queued = 0
+        self._active = 0
+
+    # ---------- kuyruk ----------
+
+    def _shed(self, reason, wait):
+        metrics.incr(f'sched.shed.{reason}')
+        retry_after = max(1, math.ceil(wait))
+        raise ModelError('Sunucu şu anda yoğun, lütfen biraz sonra tekrar deneyin.',
+                         code='overloaded', status=503, retryable=True, retry_after=retry_after)
+
+    def _estimated_wait(self, start) -> float:
+        """Önündeki istekler havuzdan kaç turda geçer x ortalama model süresi"""
+        if self._active < self.capacity and not self._queued:
+            return 0.0
+        ahead = sum(1 for queue in self._queues.values() for ticket in queue if ticket.start <= start)
+        return math.ceil((ahead + 1) / self.capacity) * self.service_estimate
+
+    def _enqueue(self, user_id, cost, deadline):
+        now = time.time()
+        if self._queued >= self.max_queue:
+            self._shed('queue_full', self.service_estimate)
+
+        weight = self.weights.get(user_id, 1.0)
+        start = max(self._virtual, self._last_finish.get(user_id, 0.0))
+        wait = self._estimated_wait(start)
+        if now + wait + self.service_estimate > deadline:
+            self._shed('deadline', wait)
+
+        ticket = Ticket(user_id, start, deadline)
+        self._last_finish[user_id] = start + cost / weight
+        self._queues.setdefault(user_id, deque()).append(ticket)
+        self._queued += 1
+        self._dispatch()
+        return ticket
+
+    def _dispatch(self):
+        """Boş yer oldukça en küçük başlangıç etiketli isteği başlat (kilit altında)"""
+        now = time.time()
+        while self._active < self.capacity and self._queued:
+            user_id = min(self._queues, key=lambda u: self._queues[u][0].start)
+            queue = self._queues[user_id]
+            ticket = queue.popleft()
+            if not queue:
+                del self._queues[user_id]
+            self._queued -= 1
+
+            if ticket.deadline - now < self.service_estimate:
+                # Model çağrısı başlasa da son tarihe yetişmeyecek
+                ticket.shed_reason = 'expired'
+                continue
+            ticket.granted = True
+            self._active += 1
+            self._virtual = ticket.start
+
+        # Kuyruğu boşalmış ve etiketi geride kalmış kullanıcıları unut
+        for user_id in [u for u, finish in self._last_finish.items()
+                        if finish <= self._virtual and u not in self._queues]:
+            del self._last_finish[user_id]
+
+        metrics.set_gauge('sched.queued', self._queued)
+        metrics.set_gauge('sched.active', self._active)
+        self._cond.notify_all()
+
+    def _remove(self, ticket):
+        queue = self._queues.get(ticket.user_id)
+        if queue and ticket in queue:
+            queue.remove(ticket)
+            if not queue:
+                del self._queues[ticket.user_id]
+            self._queued -= 1
+            metrics.set_gauge('sched.queued', self._queued)
+
+    # ---------- kullanım ----------
+
+    @contextmanager
+    def slot(self, user_id, cost=1.0, deadline=None):
+        """
+        with scheduler.slot(user_id, cost) as ticket: ... şeklinde kullanılır
+        Blok, model havuzunda yer ayrılmışken çalışır; model çağrısına
+        ticket.remaining() kadar süre verilmelidir. Yetişemeyecek istekte
+        ModelError (503, overloaded) fırlatılır.
+        """
+        deadline = deadline or time.time() + self.deadline
+        with self._cond:
+            ticket = self._enqueue(user_id, max(cost, 1.0), deadline)
+            while not ticket.granted and ticket.shed_reason is None:
+                remaining = ticket.remaining()
+                if remaining <= 0:
+                    self._remove(ticket)
+                    ticket.shed_reason = 'expired'
+                    break
+                self._cond.wait(remaining)
+            if ticket.shed_reason:
+                self._shed(ticket.shed_reason, self._estimated_wait(self._virtual))
+
+        started = time.time()
+        metrics.observe('sched.wait', started - ticket.enqueued)
+        metrics.incr('sched.dispatched')
+        try:
+            yield ticket
+        finally:
+            elapsed = time.time() - started
+            with self._cond:
+                self._active -= 1
+                self.service_estimate += SERVICE_EWMA_ALPHA * (elapsed - self.service_estimate)
+                self._dispatch()
+
+    def stats(self):
+        with self._cond:
+            return {'queued': self._queued, 'active': self._active, 'users': len(self._queues),
+                    'service_estimate': round(self.service_estimate, 3)}
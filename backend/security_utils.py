@@ -4,18 +4,28 @@ Güvenlik yardımcı fonksiyonları
 import time
 from functools import wraps
 from flask import request, jsonify
-from collections import defaultdict
 from datetime import datetime, timedelta
 
-# Rate limiting için basit in-memory store
-# Production'da Redis kullan!
-request_counts = defaultdict(lambda: {'count': 0, 'reset_time': time.time()})
+from kv import get_kv
+
+def check_rate_limit(key, max_requests, time_window):
+    """
+    Sabit pencereli sayaç; limit aşıldıysa kalan saniyeyi, aşılmadıysa None döndür
+    Pencere numarası anahtarın parçası, süresi bitince kendiliğinden düşer.
+    """
+    current_time = time.time()
+    window = int(current_time // time_window)
+    count = get_kv().incr(f"rl:{key}:{window}", ttl=time_window)
+    if count > max_requests:
+        return int((window + 1) * time_window - current_time) + 1
+    return None
 
 def rate_limit(max_requests=10, time_window=60):
     """
     Rate limiting decorator
     max_requests: Zaman aralığında maksimum istek sayısı
     time_window: Zaman aralığı (saniye)
+    Sayaçlar paylaşılan KV deposunda (KV_URL) tutulur, tüm sunucular aynı limiti görür.
     """
     def decorator(f):
         @wraps(f)
@@ -25,26 +35,13 @@ def rate_limit(max_requests=10, time_window=60):
             if ip:
                 ip = ip.split(',')[0].strip()
             
-            current_time = time.time()
-            key = f"{ip}:{request.endpoint}"
-            
-            # Reset time geçtiyse sayacı sıfırla
-            if current_time > request_counts[key]['reset_time']:
-                request_counts[key] = {
-                    'count': 0,
-                    'reset_time': current_time + time_window
-                }
-            
-            # İstek sayısını kontrol et
-            if request_counts[key]['count'] >= max_requests:
+            retry_after = check_rate_limit(f"{ip}:{request.endpoint}", max_requests, time_window)
+            if retry_after is not None:
                 return jsonify({
                     'error': 'Çok fazla istek. Lütfen biraz bekleyin.',
-                    'retry_after': int(request_counts[key]['reset_time'] - current_time)
+                    'retry_after': retry_after
                 }), 429
             
-            # İstek sayısını artır
-            request_counts[key]['count'] += 1
-            
             return f(*args, **kwargs)
         
         return decorated_function
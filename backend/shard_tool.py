@@ -0,0 +1,180 @@
+"""
+Shard yönetim aracı
+
+Kullanıcıların chat, mesaj, arşiv ve oturum verilerini shard'lar arasında
+çevrimiçi taşır. Shard sayısı artırıldığında (DB_SHARD_COUNT) mevcut
+kullanıcılar eski shard'larında kalır; rebalance her kullanıcıyı
+user_id % N shard'ına taşır. Taşıma kullanıcı başınadır, diğer
+kullanıcıların istekleri etkilenmez.
+
+Kullanım:
+    DB_SHARD_COUNT=4 python backend/shard_tool.py status
+    DB_SHARD_COUNT=4 python backend/shard_tool.py rebalance [--dry-run] [--limit 1000]
+    DB_SHARD_COUNT=4 python backend/shard_tool.py move --user 42 --shard 3
+"""
+import argparse
+import time
+
+from database import Database, VISIBLE_MESSAGE
+
+
+def set_moving(db, user_id, moving):
+    conn = db.get_connection()
+    conn.execute('UPDATE users SET shard_moving = ? WHERE id = ?', (1 if moving else 0, user_id))
+    conn.commit()
+    conn.close()
+    db.router.invalidate(user_id)
+
+
+def migrate_user(db, user_id, target):
+    """
+    Kullanıcının verisini hedef shard'a taşı
+    1. shard_moving = 1: yeni istekler taşıma bitene kadar bekler
+    2. Yönlendirme önbelleklerinin süresi dolana kadar beklenir
+    3. Kaynak shard'da yazma kilidi alınır (süren yazmalar biter), veri kopyalanır
+    4. users.shard hedefe çevrilir, kaynaktaki satırlar silinir
+    Adımlar yarıda kalırsa komut tekrar çalıştırılabilir (INSERT OR REPLACE).
+    """
+    conn = db.get_connection()
+    row = conn.execute('SELECT shard FROM users WHERE id = ?', (user_id,)).fetchone()
+    conn.close()
+    if not row:
+        raise ValueError(f'Kullanıcı bulunamadı: {user_id}')
+    source = row['shard'] or 0
+    if source == target:
+        return 0
+
+    set_moving(db, user_id, True)
+    try:
+        time.sleep(db.router.cache_ttl * 2)
+
+        src = db._connect(db.router.path(source))
+        dst = db._connect(db.router.path(target))
+        try:
+            src.execute('BEGIN IMMEDIATE')
+            chat_ids = [r['id'] for r in src.execute('SELECT id FROM chats WHERE user_id = ?', (user_id,))]
+            moved = 0
+
+            def copy(query, params, table, skip_columns=()):
+                nonlocal moved
+                cursor = src.execute(query, params)
+                columns = [d[0] for d in cursor.description]
+                keep = [i for i, name in enumerate(columns) if name not in skip_columns]
+                names = ', '.join(columns[i] for i in keep)
+                placeholders = ', '.join('?' for _ in keep)
+                while True:
+                    rows = cursor.fetchmany(1000)
+                    if not rows:
+                        break
+                    dst.executemany(f'INSERT OR REPLACE INTO {table} ({names}) VALUES ({placeholders})',
+                                    [tuple(r[i] for i in keep) for r in rows])
+                    moved += len(rows)
+
+            # Chat id'leri ve token'lar rastgele, REPLACE ile tekrar çalıştırma güvenli.
+            # Mesaj id'leri shard'a özgü olduğu için hedefte yeniden üretilir; bu yüzden
+            # silinmeyi bekleyen (purge_queue) mesajlar ve silinmiş chatler taşınmaz.
+            live_ids = [r['id'] for r in src.execute('SELECT id FROM chats WHERE user_id = ? AND deleted_at IS NULL',
+                                                     (user_id,))]
+            copy('SELECT * FROM chats WHERE user_id = ? AND deleted_at IS NULL', (user_id,), 'chats')
+            for chat_id in live_ids:
+                dst.execute('DELETE FROM messages WHERE chat_id = ?', (chat_id,))
+                copy(f'SELECT * FROM messages m WHERE chat_id = ? AND {VISIBLE_MESSAGE} ORDER BY id', (chat_id,),
+                     'messages', ('id',))
+                copy('SELECT * FROM message_archive WHERE chat_id = ?', (chat_id,), 'message_archive')
+            # Değişiklik sırası da taşınır; istemcilerin senkronizasyon imleci geçerli kalır
+            copy('SELECT * FROM sync_state WHERE user_id = ?', (user_id,), 'sync_state')
+            # Eski biçimdeki token'lar global veritabanında aranır, onlar taşınmaz
+            copy('SELECT * FROM sessions WHERE user_id = ? AND token LIKE ?', (user_id, f'{user_id}.%'), 'sessions')
+            dst.commit()
+
+            # Kaynak global dosyaysa (shard 0) yönlendirme, silme ile aynı transaction'da değişir
+            route_conn = src if source == 0 else db.get_connection()
+            route_conn.execute('UPDATE users SET shard = ?, shard_moving = 0 WHERE id = ?', (target, user_id))
+            if route_conn is not src:
+                route_conn.commit()
+                route_conn.close()
+
+            src.execute("DELETE FROM sessions WHERE user_id = ? AND token LIKE ?", (user_id, f'{user_id}.%'))
+            for chat_id in chat_ids:
+                src.execute('DELETE FROM messages WHERE chat_id = ?', (chat_id,))
+                src.execute('DELETE FROM message_archive WHERE chat_id = ?', (chat_id,))
+                src.execute('DELETE FROM purge_queue WHERE chat_id = ?', (chat_id,))
+            src.execute('DELETE FROM chats WHERE user_id = ?', (user_id,))
+            src.execute('DELETE FROM sync_state WHERE user_id = ?', (user_id,))
+            src.commit()
+            db.router.invalidate(user_id)
+            return moved
+        finally:
+            src.close()
+            dst.close()
+    finally:
+        set_moving(db, user_id, False)
+
+
+def status(db):
+    conn = db.get_connection()
+    rows = conn.execute('SELECT shard, COUNT(*) AS users FROM users GROUP BY shard ORDER BY shard').fetchall()
+    misplaced = conn.execute('SELECT COUNT(*) FROM users WHERE shard != id % ?', (db.router.shard_count,)).fetchone()[0]
+    conn.close()
+
+    print(f"Shard sayısı: {db.router.shard_count}")
+    for row in rows:
+        shard = row['shard'] or 0
+        conn = db._connect(db.router.path(shard)) if shard < db.router.shard_count else None
+        messages = conn.execute('SELECT COUNT(*) FROM messages').fetchone()[0] if conn else '?'
+        if conn:
+            conn.close()
+        print(f"  shard {shard}: {row['users']} kullanıcı, {messages} mesaj ({db.router.path(shard)})")
+    print(f"Taşınması gereken kullanıcı: {misplaced}")
+
+
+def rebalance(db, dry_run=False, limit=None):
+    conn = db.get_connection()
+    query = 'SELECT id, shard FROM users WHERE shard != id % ? ORDER BY id'
+    params = [db.router.shard_count]
+    if limit:
+        query += ' LIMIT ?'
+        params.append(limit)
+    users = conn.execute(query, params).fetchall()
+    conn.close()
+
+    total_rows = 0
+    started = time.time()
+    for row in users:
+        target = db.router.home_shard(row['id'])
+        if dry_run:
+            print(f"kullanıcı {row['id']}: shard {row['shard']} -> {target}")
+            continue
+        moved = migrate_user(db, row['id'], target)
+        total_rows += moved
+        print(f"kullanıcı {row['id']}: shard {row['shard']} -> {target} ({moved} satır)")
+
+    if not dry_run:
+        print(f"{len(users)} kullanıcı, {total_rows} satır taşındı ({time.time() - started:.1f} s)")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('command', choices=['status', 'rebalance', 'move'])
+    parser.add_argument('--db', default='pahiy_ai.db')
+    parser.add_argument('--dry-run', action='store_true')
+    parser.add_argument('--limit', type=int)
+    parser.add_argument('--user', type=int)
+    parser.add_argument('--shard', type=int)
+    args = parser.parse_args()
+
+    db = Database(args.db)
+
+    if args.command == 'status':
+        status(db)
+    elif args.command == 'rebalance':
+        rebalance(db, args.dry_run, args.limit)
+    else:
+        if args.user is None or args.shard is None or not 0 <= args.shard < db.router.shard_count:
+            parser.error('move için --user ve geçerli bir --shard gereklidir')
+        moved = migrate_user(db, args.user, args.shard)
+        print(f"{moved} satır taşındı")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,178 @@
+"""
+Depolama arayüzü
+Route'lar yalnızca bu arayüzü kullanır; SQLite (database.Database) ve
+PostgreSQL (postgres_database.PostgresDatabase) uygulamaları vardır.
+Seçim DATABASE_URL ile yapılır.
+"""
+import os
+import hashlib
+from abc import ABC, abstractmethod
+from typing import Optional, List, Dict, Iterable, Iterator
+
+
+class Storage(ABC):
+
+    def hash_password(self, password: str) -> str:
+        """Şifreyi hash'le"""
+        return hashlib.sha256(password.encode()).hexdigest()
+
+    def reset_after_fork(self):
+        """Fork sonrası worker'da çağrılır; havuz/arka plan durumu olan uygulamalar ezer"""
+
+    @abstractmethod
+    def init_db(self):
+        """Şemayı oluştur / güncelle"""
+
+    # ========== KULLANICI İŞLEMLERİ ==========
+
+    @abstractmethod
+    def create_user(self, first_name: str, last_name: str, username: str, email: str, password: str):
+        """(user_id, verification_token) döner; kullanıcı varsa (None, None)"""
+
+    @abstractmethod
+    def verify_email(self, token: str) -> bool: ...
+
+    @abstractmethod
+    def regenerate_verification_token(self, email: str) -> Optional[Dict]:
+        """Doğrulanmamış kullanıcıya yeni token üret; {'username', 'email_verified', 'token'}"""
+
+    @abstractmethod
+    def is_email_verified(self, user_id: int) -> bool: ...
+
+    @abstractmethod
+    def verify_user(self, login: str, password: str) -> Optional[Dict]: ...
+
+    @abstractmethod
+    def get_user_by_id(self, user_id: int) -> Optional[Dict]: ...
+
+    @abstractmethod
+    def change_password(self, user_id: int, old_password: str, new_password: str) -> bool: ...
+
+    # ========== OTURUM İŞLEMLERİ ==========
+
+    @abstractmethod
+    def create_session(self, user_id: int) -> str: ...
+
+    @abstractmethod
+    def verify_session(self, token: str) -> Optional[int]: ...
+
+    @abstractmethod
+    def delete_session(self, token: str): ...
+
+    # ========== CHAT / MESAJ İŞLEMLERİ ==========
+
+    @abstractmethod
+    def create_chat(self, user_id: int, title: str = "Yeni Sohbet") -> str: ...
+
+    @abstractmethod
+    def get_user_chats(self, user_id: int) -> List[Dict]: ...
+
+    @abstractmethod
+    def get_chat(self, chat_id: str, user_id: int) -> Optional[Dict]: ...
+
+    @abstractmethod
+    def update_chat_title(self, chat_id: str, user_id: int, title: str, if_title: Optional[str] = None):
+        """if_title verilirse başlık yalnızca hâlâ bu değerdeyse değişir"""
+
+    @abstractmethod
+    def delete_chat(self, chat_id: str, user_id: int):
+        """Chat anında gizlenir; mesajları ve satırı silme kuyruğundan arka planda silinir"""
+
+    @abstractmethod
+    def update_chat_timestamp(self, chat_id: str, user_id: Optional[int] = None): ...
+
+    @abstractmethod
+    def add_message(self, chat_id: str, role: str, content: str, user_id: Optional[int] = None): ...
+
+    def add_messages(self, chat_id: str, messages: List[tuple], user_id: Optional[int] = None) -> Optional[Dict]:
+        """
+        (role, content) listesini kaydet; uygulamalar tek transaction'da yazar
+        ve chat'in yazma sonrası {'seq', 'message_count'} değerini döner
+        (None: bilinmiyor, geçmiş önbelleği chat'i yeniden okur)
+        """
+        for role, content in messages:
+            self.add_message(chat_id, role, content, user_id)
+
+    @abstractmethod
+    def get_chat_messages(self, chat_id: str, limit: int = 100, user_id: Optional[int] = None) -> List[Dict]: ...
+
+    @abstractmethod
+    def get_recent_messages(self, chat_id: str, limit: int, user_id: Optional[int] = None) -> List[Dict]:
+        """Son `limit` mesaj, eskiden yeniye (model geçmişi)"""
+
+    @abstractmethod
+    def clear_chat_messages(self, chat_id: str, user_id: int):
+        """Şu ana kadarki mesajlar anında gizlenir ve arka planda silinir; sonradan yazılanlar görünür"""
+
+    @abstractmethod
+    def repair_chat_summaries(self) -> int:
+        """message_count / last_message_preview / last_role kolonlarını mesajlarla eşitle"""
+
+    # ========== SİLME KUYRUĞU ==========
+
+    @abstractmethod
+    def purge_pending(self, grace: Optional[int] = None, batch_size: Optional[int] = None) -> Dict:
+        """Silme kuyruğunu bu süreçte hemen işle; {'messages', 'chats', 'pending'}"""
+
+    @abstractmethod
+    def get_purge_status(self) -> List[Dict]:
+        """Konum (dosya / veritabanı) başına {'location', 'jobs', 'chats', 'messages'}"""
+
+    @abstractmethod
+    def requeue_orphan_messages(self) -> int:
+        """Chat'i artık olmayan mesajları kuyruğa al; kuyruğa alınan chat sayısı"""
+
+    # ========== DELTA SENKRONİZASYONU ==========
+
+    @abstractmethod
+    def get_chat_changes(self, user_id: int, since: int) -> Dict:
+        """{'seq', 'reset', 'chats': since'ten sonra değişenler, 'chat_ids': tüm chatler}"""
+
+    @abstractmethod
+    def get_message_changes(self, chat_id: str, user_id: int, since: int, limit: int = 500) -> Optional[Dict]:
+        """{'chat', 'reset', 'messages'}; reset ise istemci chat'in mesajlarını baştan alır"""
+
+    # ========== ARŞİV ==========
+
+    @abstractmethod
+    def archive_idle_chats(self, idle_days: int = 90, limit: int = 500) -> Dict: ...
+
+    @abstractmethod
+    def rehydrate_chat(self, chat_id: str, user_id: Optional[int] = None) -> bool: ...
+
+    @abstractmethod
+    def get_archive_stats(self) -> Dict: ...
+
+    # ========== DIŞA / İÇE AKTARMA ==========
+
+    @abstractmethod
+    def iter_user_export(self, user_id: int) -> Iterator[Dict]: ...
+
+    @abstractmethod
+    def import_user_records(self, user_id: int, records: Iterable[Dict], batch_size: int = 5000) -> Dict: ...
+
+    # ========== KOTA ==========
+
+    @abstractmethod
+    def get_token_usage(self, user_id: int, since_bucket: int) -> List[tuple]: ...
+
+    @abstractmethod
+    def add_token_usage(self, rows: List[tuple]): ...
+
+    @abstractmethod
+    def prune_token_usage(self, before_bucket: int): ...
+
+
+def uses_postgres() -> bool:
+    """DATABASE_URL bir PostgreSQL adresi mi"""
+    return os.environ.get('DATABASE_URL', '').startswith(('postgres://', 'postgresql://'))
+
+
+def create_storage(db_path: str = 'pahiy_ai.db', init_schema: bool = True) -> Storage:
+    """DATABASE_URL postgres ise PostgreSQL, değilse SQLite depolaması döndür"""
+    if uses_postgres():
+        from postgres_database import PostgresDatabase
+        return PostgresDatabase(os.environ['DATABASE_URL'], init_schema=init_schema)
+
+    from database import Database
+    return Database(db_path, init_schema=init_schema)
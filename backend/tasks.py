@@ -0,0 +1,74 @@
+"""
+Yanıt sonrası işler için süreç içi görev kuyruğu
+Başlık üretimi gibi kullanıcının beklemesi gerekmeyen işler yanıt
+gönderildikten sonra sınırlı sayıda worker thread'inde çalışır.
+Kuyruk doluysa görev düşürülür (metrics: tasks.dropped); bu işler
+kritik değildir, tekrar denenmez.
+"""
+import os
+import threading
+import time
+from queue import Queue, Full
+
+import metrics
+
+TASK_WORKERS = int(os.environ.get("TASK_WORKERS", 2))
+TASK_QUEUE_SIZE = int(os.environ.get("TASK_QUEUE_SIZE", 1000))
+
+
+class TaskQueue:
+    def __init__(self, workers=TASK_WORKERS, maxsize=TASK_QUEUE_SIZE):
+        self.workers = max(1, workers)
+        self._queue = Queue(maxsize=maxsize)
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _ensure_workers(self):
+        # Thread'ler ilk görevde ve fork sonrası her worker'da ayrıca başlatılır
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            for i in range(self.workers):
+                threading.Thread(target=self._run, daemon=True, name=f'task-{i}').start()
+
+    def submit(self, name, fn, *args, **kwargs) -> bool:
+        """Görevi kuyruğa ekle; kuyruk doluysa False"""
+        self._ensure_workers()
+        try:
+            self._queue.put_nowait((name, fn, args, kwargs, time.time()))
+        except Full:
+            metrics.incr('tasks.dropped')
+            print(f"⚠️ Görev kuyruğu dolu, {name} atlandı")
+            return False
+        metrics.incr('tasks.queued')
+        metrics.set_gauge('tasks.depth', self._queue.qsize())
+        return True
+
+    def _run(self):
+        while True:
+            name, fn, args, kwargs, queued_at = self._queue.get()
+            started = time.time()
+            metrics.observe('tasks.wait', started - queued_at)
+            try:
+                fn(*args, **kwargs)
+                metrics.incr('tasks.completed')
+            except Exception as e:
+                metrics.incr('tasks.failed')
+                print(f"⚠️ Arka plan görevi başarısız ({name}): {e}")
+            finally:
+                metrics.observe(f'tasks.{name}', time.time() - started)
+                metrics.set_gauge('tasks.depth', self._queue.qsize())
+                self._queue.task_done()
+
+    def join(self):
+        """Kuyruktaki tüm görevler bitene kadar bekle (araçlar ve benchmark'lar için)"""
+        self._queue.join()
+
+    def reset_after_fork(self):
+        # Master'dan kopyalanan kuyruk kilitleri tutulu olabilir; temiz kuyrukla başla
+        self._queue = Queue(maxsize=self._queue.maxsize)
+        self._lock = threading.Lock()
+        self._pid = None
@@ -0,0 +1,129 @@
+"""
+Model yavaşlarken kabul kontrolü
+
+gunicorn (gthread) ile sahte sağlayıcıya bağlı bir sunucu başlatır; model
+gecikmesi yüksek tutulur (yukarı akış yavaşlaması) ve thread sayısından çok
+daha fazla eşzamanlı /api/chat isteği gönderilir. Aynı anda /api/health ve
+/api/me düzenli aralıklarla yoklanır. Senaryo kabul kontrolü kapalı ve açık
+çalıştırılır; chat durum kodları, yoklamaların gecikmesi ve son chat sınırı
+yazılır.
+
+Kullanım:
+    python benchmarks/admission_load.py --fake-latency 3 --concurrency 64 --duration 20
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+import load_chat  # noqa: E402
+from database import Database  # noqa: E402
+from worker_models import wait_until_healthy  # noqa: E402
+
+
+def probe(url, token, stop, results):
+    """Sınırlanmayan route'ların gecikmesi (zaman aşımı 10 sn)"""
+    while not stop.is_set():
+        for path in ('/api/health', '/api/me'):
+            request = urllib.request.Request(url + path, headers={'Authorization': f'Bearer {token}'})
+            started = time.time()
+            try:
+                with urllib.request.urlopen(request, timeout=10) as response:
+                    response.read()
+                results[path].append(time.time() - started)
+            except Exception:
+                results[path].append(10.0)
+        time.sleep(0.2)
+
+
+def chat_load(url, users, stop, statuses, lock):
+    i = 0
+    while not stop.is_set():
+        user = users[i % len(users)]
+        i += 1
+        status = load_chat.post_json(f"{url}/api/chat", {'message': 'Merhaba', 'chat_id': user['chat_id']},
+                                     user['token'], user['ip'], timeout=60)
+        with lock:
+            statuses[status] = statuses.get(status, 0) + 1
+
+
+def run(enabled, args):
+    url = f"http://127.0.0.1:{args.port}"
+    with tempfile.TemporaryDirectory() as workdir:
+        env = dict(os.environ,
+                   PORT=str(args.port),
+                   GENAI_PROVIDER='fake',
+                   GENAI_FAKE_LATENCY=str(args.fake_latency),
+                   GENAI_TIMEOUT=str(args.fake_latency * 4),
+                   GUNICORN_WORKER_MODEL='gthread',
+                   GUNICORN_WORKERS='1',
+                   GUNICORN_THREADS=str(args.threads),
+                   GUNICORN_ACCESS_LOG='/dev/null',
+                   USER_MAX_CONCURRENT='1000',
+                   ADMISSION_CONTROL='1' if enabled else '0')
+        server = subprocess.Popen(
+            [sys.executable, '-m', 'gunicorn', '-c', os.path.join(ROOT, 'gunicorn.conf.py'), 'backend.app:app'],
+            cwd=workdir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        try:
+            if not wait_until_healthy(url):
+                return {'error': 'sunucu başlatılamadı'}
+            users = load_chat.create_users(Database(os.path.join(workdir, 'pahiy_ai.db')), args.users,
+                                           prefix='on' if enabled else 'off')
+            stop = threading.Event()
+            statuses, lock = {}, threading.Lock()
+            probes = {'/api/health': [], '/api/me': []}
+            threads = [threading.Thread(target=chat_load, args=(url, users, stop, statuses, lock))
+                       for _ in range(args.concurrency)]
+            threads.append(threading.Thread(target=probe, args=(url, users[0]['token'], stop, probes)))
+            for thread in threads:
+                thread.start()
+            time.sleep(args.duration)
+            stop.set()
+            for thread in threads:
+                thread.join()
+
+            with urllib.request.urlopen(f"{url}/api/metrics", timeout=10) as response:
+                gauges = json.loads(response.read()).get('gauges', {})
+            return {'statuses': statuses, 'probes': probes, 'chat_limit': gauges.get('admission.chat.limit')}
+        finally:
+            server.terminate()
+            server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--port', type=int, default=5099)
+    parser.add_argument('--threads', type=int, default=8, help='gunicorn worker thread sayısı')
+    parser.add_argument('--fake-latency', type=float, default=3.0, help='yavaşlamış model gecikmesi (sn)')
+    parser.add_argument('--concurrency', type=int, default=64, help='eşzamanlı chat istemcisi')
+    parser.add_argument('--users', type=int, default=64)
+    parser.add_argument('--duration', type=float, default=20, help='yük süresi (sn)')
+    args = parser.parse_args()
+
+    for enabled in (False, True):
+        result = run(enabled, args)
+        print(f"kabul kontrolü {'açık' if enabled else 'kapalı'}")
+        if 'error' in result:
+            print(f"  hata: {result['error']}")
+            continue
+        print(f"  chat durumları: {dict(sorted(result['statuses'].items()))}  son chat sınırı: {result['chat_limit']}")
+        for path, samples in result['probes'].items():
+            if samples:
+                ordered = sorted(samples)
+                print(f"  {path:<12} p50={statistics.median(samples) * 1000:7.0f} ms  "
+                      f"p95={ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000:7.0f} ms  "
+                      f"max={ordered[-1] * 1000:7.0f} ms")
+
+
+if __name__ == '__main__':
+    main()
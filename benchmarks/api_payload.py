@@ -0,0 +1,139 @@
+"""
+API yanıtlarının boyutu ve serileştirme maliyeti
+
+Tipik sohbet yükleri (GET /api/chats/<id> mesajları, GET /api/chats listesi)
+için her JSON kodlayıcı (stdlib: Flask'ın varsayılanı, orjson) ve her
+sıkıştırma (yok, gzip, br) ile istek başına hattaki bayt ve CPU süresini
+yazar. AI mesajları sunucudaki format_ai_response ile HTML'e çevrilir.
+Son satırlar aynı ölçümü Flask test istemcisiyle uçtan uca tekrarlar.
+
+Kullanım:
+    python benchmarks/api_payload.py --messages 10,50,100 --repeat 200
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend'))
+
+os.environ.setdefault('GENAI_PROVIDER', 'fake')
+os.environ.setdefault('PAHIY_SCHEMA_READY', '1')
+
+import responses  # noqa: E402
+from app import format_ai_response  # noqa: E402
+
+AI_REPLY = '''**Kısa cevap:** evet, bir liste üreteciyle yapılabilir.
+
+```python
+def fibonacci(n):
+    a, b = 0, 1
+    for _ in range(n):
+        a, b = b, a + b
+    return a
+
+print([fibonacci(i) for i in range(20)])
+```
+
+Döngü her adımda *a* ve *b* değerlerini kaydırır; `range(n)` kadar döner.
+Büyük n için **matris üs alma** yöntemi daha hızlıdır.'''
+
+
+def make_chat(count):
+    reply = format_ai_response(AI_REPLY)
+    messages = []
+    for i in range(count):
+        if i % 2 == 0:
+            messages.append({'id': i + 1, 'role': 'user', 'content': f'Soru {i}: bunu nasıl yazarım? Örnek verir misin?',
+                             'timestamp': '2025-01-01 12:00:00'})
+        else:
+            messages.append({'id': i + 1, 'role': 'ai', 'content': reply, 'timestamp': '2025-01-01 12:00:05'})
+    chat = {'id': 'x' * 22, 'title': 'Fibonacci nasıl yazılır', 'created_at': '2025-01-01 12:00:00',
+            'updated_at': '2025-01-01 12:00:05', 'message_count': count}
+    return {'chat': chat, 'messages': messages}
+
+
+def make_chat_list(count):
+    return {'chats': [{'id': f'chat{i:018d}', 'title': f'Sohbet başlığı {i}', 'created_at': '2025-01-01 12:00:00',
+                       'updated_at': '2025-01-01 12:00:05', 'message_count': 24,
+                       'last_message_preview': 'Döngü her adımda a ve b değerlerini kaydırır; range(n) kadar döner.',
+                       'last_role': 'ai'} for i in range(count)], 'version': 1}
+
+
+def encoders():
+    # Flask'ın varsayılan sağlayıcısıyla aynı ayarlar (sort_keys, ASCII kaçışı)
+    found = {'stdlib': lambda obj: json.dumps(obj, sort_keys=True).encode('utf-8')}
+    if responses.orjson is not None:
+        found['orjson'] = responses.orjson.dumps
+    return found
+
+
+def timed(func, arg, repeat):
+    started = time.process_time()
+    for _ in range(repeat):
+        result = func(arg)
+    return result, (time.process_time() - started) / repeat
+
+
+def measure(name, payload, repeat):
+    rows = []
+    for encoder_name, encode in encoders().items():
+        body, encode_cpu = timed(encode, payload, repeat)
+        rows.append((name, encoder_name, 'yok', len(body), encode_cpu, 0.0))
+        for encoding in responses.available_encodings():
+            compressed, compress_cpu = timed(lambda data: responses.compress_bytes(data, encoding), body, repeat)
+            rows.append((name, encoder_name, encoding, len(compressed), encode_cpu, compress_cpu))
+    return rows
+
+
+def end_to_end(sizes, repeat):
+    """Flask test istemcisiyle: önce varsayılan sağlayıcı ve sıkıştırmasız, sonra bu katmanla"""
+    from flask import Flask, jsonify
+
+    results = []
+    for layered in (False, True):
+        app = Flask(__name__)
+        if layered:
+            responses.init_responses(app)
+        payloads = {str(n): make_chat(n) for n in sizes}
+        app.add_url_rule('/chat/<n>', 'chat', lambda n: jsonify(payloads[n]))
+        client = app.test_client()
+        for n in sizes:
+            started = time.process_time()
+            for _ in range(repeat):
+                response = client.get(f'/chat/{n}', headers={'Accept-Encoding': 'gzip, deflate, br'})
+            cpu = (time.process_time() - started) / repeat
+            results.append(('katmanlı' if layered else 'varsayılan', n, len(response.data),
+                            response.headers.get('Content-Encoding', 'yok'), cpu))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--messages', default='10,50,100', help='chat başına mesaj sayıları')
+    parser.add_argument('--chats', type=int, default=300, help='chat listesindeki chat sayısı')
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+
+    sizes = [int(n) for n in args.messages.split(',')]
+    print(f"orjson: {'var' if responses.orjson else 'yok'}, brotli: {'var' if responses.brotli else 'yok'}, "
+          f"gzip seviyesi {responses.GZIP_LEVEL}, brotli kalitesi {responses.BROTLI_QUALITY}\n")
+
+    rows = []
+    for n in sizes:
+        rows += measure(f'chat ({n} mesaj)', make_chat(n), args.repeat)
+    rows += measure(f'liste ({args.chats} chat)', make_chat_list(args.chats), args.repeat)
+
+    print(f"{'yük':<20} {'kodlayıcı':<10} {'sıkıştırma':<10} {'bayt':>9} {'json µs':>9} {'sıkıştırma µs':>14} {'toplam µs':>10}")
+    for name, encoder_name, encoding, size, encode_cpu, compress_cpu in rows:
+        print(f"{name:<20} {encoder_name:<10} {encoding:<10} {size:>9} {encode_cpu * 1e6:>9.0f} "
+              f"{compress_cpu * 1e6:>14.0f} {(encode_cpu + compress_cpu) * 1e6:>10.0f}")
+
+    print("\nUçtan uca (Flask test istemcisi, istek başına CPU):")
+    for mode, n, size, encoding, cpu in end_to_end(sizes, max(1, args.repeat // 4)):
+        print(f"  {mode:<11} {n:>4} mesaj  {size:>8} bayt  {encoding:<5} {cpu * 1e6:>8.0f} µs")
+
+
+if __name__ == '__main__':
+    main()
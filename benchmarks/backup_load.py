@@ -0,0 +1,111 @@
+"""
+Yedekleme sırasında yazma gecikmesi
+
+Geçici bir veritabanı --size-mb boyutuna kadar doldurulur, sonra birkaç
+thread sürekli add_message çağırır (canlı trafik gibi). Her ayarda aynı
+yazma yükü altında backend/backup_tool.py copy_database çalıştırılır ve
+yedek süresince yazma gecikmesi ölçülür:
+  yok        : yedek alınmıyor (taban)
+  dosya      : çalışan veritabanını düz dosya kopyalama (eski yöntem, -wal yok)
+  tek adım   : backup API, tek okuma transaction'ı
+  P/S        : P sayfalık adımlar, adımlar arasında S ms bekleme
+Yedek süresi, yeniden başlama sayısı ve kopyanın bütünlük kontrolü yazılır.
+
+Kullanım:
+    python benchmarks/backup_load.py --size-mb 50 --writers 4 --configs 256:20,64:5
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend'))
+
+from backup_tool import copy_database, integrity_check  # noqa: E402
+from database import Database  # noqa: E402
+
+
+def fill(db, size_mb):
+    user_id, _ = db.create_user('Bench', 'User', 'backup', 'backup@example.com', 'benchpass')
+    chat_id = db.create_chat(user_id)
+    content = 'Önceki mesaj ' * 80
+    while os.path.getsize(db.db_path) < size_mb * 1024 * 1024:
+        db.add_messages(chat_id, [('user', content)] * 500, user_id=user_id)
+    return user_id, chat_id
+
+
+def measure(db, user_id, chat_id, writers, backup):
+    """backup() çalışırken yazıcıların gecikmeleri; (gecikmeler, backup sonucu)"""
+    latencies = []
+    stop = threading.Event()
+
+    def writer():
+        local = []
+        while not stop.is_set():
+            started = time.perf_counter()
+            db.add_message(chat_id, 'user', 'Yük testi mesajı ' * 10, user_id=user_id)
+            local.append(time.perf_counter() - started)
+            time.sleep(0.005)
+        latencies.extend(local)
+
+    threads = [threading.Thread(target=writer) for _ in range(writers)]
+    for thread in threads:
+        thread.start()
+    try:
+        result = backup()
+    finally:
+        stop.set()
+        for thread in threads:
+            thread.join()
+    return latencies, result
+
+
+def summary(latencies):
+    ordered = sorted(latencies)
+    pick = lambda pct: ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))] * 1000  # noqa: E731
+    return f"n={len(ordered):<5} p50={pick(50):6.2f}  p99={pick(99):7.2f}  max={ordered[-1] * 1000:7.1f} ms"
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--size-mb', type=int, default=50)
+    parser.add_argument('--writers', type=int, default=4)
+    parser.add_argument('--idle-seconds', type=float, default=2, help='tabanın ölçüm süresi')
+    parser.add_argument('--configs', default='256:20,64:5', help='sayfa:bekleme_ms listesi')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        db = Database(os.path.join(workdir, 'bench.db'))
+        user_id, chat_id = fill(db, args.size_mb)
+        print(f"veritabanı {os.path.getsize(db.db_path) / 1024 / 1024:.0f} MB, {args.writers} yazıcı\n")
+        target = os.path.join(workdir, 'copy.db')
+
+        def file_copy():
+            started = time.perf_counter()
+            shutil.copyfile(db.db_path, target)
+            return {'seconds': time.perf_counter() - started, 'mode': 'file', 'restarts': 0}
+
+        runs = [('yok', lambda: time.sleep(args.idle_seconds) or None),
+                ('dosya', file_copy),
+                ('tek adım', lambda: copy_database(db.db_path, target, pages=-1, sleep=0))]
+        for config in args.configs.split(','):
+            pages, sleep_ms = config.split(':')
+            runs.append((config, lambda p=int(pages), s=float(sleep_ms): copy_database(
+                db.db_path, target, pages=p, sleep=s / 1000)))
+
+        for label, backup in runs:
+            if os.path.exists(target):
+                os.remove(target)
+            latencies, result = measure(db, user_id, chat_id, args.writers, backup)
+            line = f"{label:<9} {summary(latencies)}"
+            if result:
+                line += (f"  yedek {result['seconds']:.2f} s, {result['restarts']} yeniden başlama"
+                         f" ({result['mode']}), bütünlük: {integrity_check(target)}")
+            print(line)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+"""
+Dışa / içe aktarma benchmark'ı
+
+Geçici bir veritabanında çok sayıda mesajı olan bir kullanıcı oluşturur,
+iter_user_export ile NDJSON üretir ve import_user_records ile geri yükler.
+Süreyi ve tepe bellek kullanımını (tracemalloc) yazar.
+
+Kullanım:
+    python benchmarks/export_import.py --messages 100000
+"""
+import argparse
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend'))
+
+from database import Database  # noqa: E402
+
+SAMPLE_AI = '<strong>Örnek</strong> yanıt. ' * 20 + '<div class="code-block"><pre><code>print(1)</code></pre></div>'
+
+
+def seed(db, messages, per_chat):
+    user_id, token = db.create_user('Bench', 'User', 'exportbench', 'exportbench@example.com', 'benchpass')
+    records = []
+    for i in range(0, messages, per_chat):
+        chat_id = f"seed{i}"
+        records.append({'type': 'chat', 'id': chat_id, 'title': f'Sohbet {i}'})
+        for j in range(min(per_chat, messages - i)):
+            role = 'user' if j % 2 == 0 else 'ai'
+            records.append({'type': 'message', 'chat_id': chat_id, 'role': role,
+                            'content': 'Soru metni' if role == 'user' else SAMPLE_AI})
+    db.import_user_records(user_id, records)
+    return user_id
+
+
+def bench_export(db, user_id):
+    output = io.BytesIO()
+    tracemalloc.start()
+    started = time.perf_counter()
+    lines = 0
+    for record in db.iter_user_export(user_id):
+        output.write((json.dumps(record, ensure_ascii=False) + '\n').encode('utf-8'))
+        lines += 1
+        if output.tell() > 1 << 20:
+            # Ağa yazılmış gibi davran, çıktıyı bellekte biriktirme
+            output.seek(0)
+            output.truncate()
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return lines, elapsed, peak
+
+
+def bench_import(db, user_id, export_path, batch_size):
+    def records():
+        with open(export_path, 'rb') as f:
+            for line in f:
+                yield json.loads(line)
+
+    tracemalloc.start()
+    started = time.perf_counter()
+    counts = db.import_user_records(user_id, records(), batch_size=batch_size)
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return counts, elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--messages', type=int, default=100000)
+    parser.add_argument('--per-chat', type=int, default=200)
+    parser.add_argument('--batch-size', type=int, default=5000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        db = Database(os.path.join(workdir, 'bench.db'))
+        user_id = seed(db, args.messages, args.per_chat)
+
+        lines, elapsed, peak = bench_export(db, user_id)
+        print(f"export: {lines} kayıt, {elapsed:.2f} s, {lines / elapsed:,.0f} kayıt/s, tepe bellek {peak / 1024:.0f} KB")
+
+        export_path = os.path.join(workdir, 'export.ndjson')
+        with open(export_path, 'w', encoding='utf-8') as f:
+            for record in db.iter_user_export(user_id):
+                f.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+        counts, elapsed, peak = bench_import(db, user_id, export_path, args.batch_size)
+        total = counts['chats'] + counts['messages']
+        print(f"import: {total} satır, {elapsed:.2f} s, {total / elapsed:,.0f} satır/s, tepe bellek {peak / 1024:.0f} KB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+"""
+Model havuzu doluyken kullanıcılar arası adalet
+
+Bir "ağır" kullanıcı aynı anda çok sayıda üretim başlatırken birkaç
+"hafif" kullanıcı tek tek mesaj gönderir. Model çağrısı sabit süreli bir
+uykuyla taklit edilir. Aynı senaryo iki kez çalışır:
+  fifo  : havuzda yer bulan ilk istek kazanır (eski davranış, semafor)
+  adil  : backend/scheduler.py FairScheduler
+Kullanıcı grubu başına kuyruk bekleme süreleri ve reddedilen istekler yazılır.
+
+Kullanım:
+    python benchmarks/fair_queue.py --capacity 4 --heavy 40 --light-users 8 --service 0.1
+"""
+import argparse
+import os
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend'))
+
+from ai_client import ModelError  # noqa: E402
+from scheduler import FairScheduler  # noqa: E402
+
+
+class FifoPool:
+    """Karşılaştırma: sıra gözetmeyen semafor, son tarih yok"""
+
+    def __init__(self, capacity):
+        self.semaphore = threading.Semaphore(capacity)
+
+    def run(self, user_id, service, deadline):
+        started = time.time()
+        with self.semaphore:
+            waited = time.time() - started
+            time.sleep(service)
+        return waited
+
+
+class FairPool:
+    def __init__(self, capacity, deadline, service):
+        self.scheduler = FairScheduler(capacity=capacity, deadline=deadline, service_estimate=service)
+
+    def run(self, user_id, service, deadline):
+        started = time.time()
+        with self.scheduler.slot(user_id):
+            waited = time.time() - started
+            time.sleep(service)
+        return waited
+
+
+def scenario(pool, args):
+    results = {'heavy': [], 'light': []}
+    shed = {'heavy': 0, 'light': 0}
+    lock = threading.Lock()
+
+    def request(group, user_id):
+        try:
+            waited = pool.run(user_id, args.service, args.deadline)
+            with lock:
+                results[group].append(waited)
+        except ModelError:
+            with lock:
+                shed[group] += 1
+
+    def light_user(user_id):
+        for _ in range(args.light_requests):
+            request('light', user_id)
+            time.sleep(args.service)
+
+    threads = [threading.Thread(target=request, args=('heavy', 1)) for _ in range(args.heavy)]
+    threads += [threading.Thread(target=light_user, args=(100 + i,)) for i in range(args.light_users)]
+    started = time.time()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results, shed, time.time() - started
+
+
+def summary(waits):
+    if not waits:
+        return 'istek yok'
+    ordered = sorted(waits)
+    p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+    return f"n={len(waits):<4} p50={statistics.median(waits) * 1000:7.0f} ms  p95={p95 * 1000:7.0f} ms"
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--capacity', type=int, default=4, help='model havuzu boyutu')
+    parser.add_argument('--heavy', type=int, default=40, help='ağır kullanıcının eşzamanlı istekleri')
+    parser.add_argument('--light-users', type=int, default=8)
+    parser.add_argument('--light-requests', type=int, default=3, help='hafif kullanıcı başına sıralı istek')
+    parser.add_argument('--service', type=float, default=0.1, help='model çağrısı süresi (sn)')
+    parser.add_argument('--deadline', type=float, default=2.0, help='istek başına son tarih (sn)')
+    args = parser.parse_args()
+
+    for name, pool in (('fifo', FifoPool(args.capacity)), ('adil', FairPool(args.capacity, args.deadline, args.service))):
+        results, shed, elapsed = scenario(pool, args)
+        print(f"{name} ({elapsed:.2f} s)")
+        for group in ('heavy', 'light'):
+            print(f"  {group:<6} {summary(results[group])}  reddedilen={shed[group]}")
+
+
+if __name__ == '__main__':
+    main()
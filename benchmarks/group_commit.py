@@ -0,0 +1,82 @@
+"""
+Group commit penceresine göre mesaj yazma hızı
+
+Her ayar için geçici bir veritabanı kurar ve birçok thread'den eşzamanlı
+add_message çağrıları yapar (gthread worker'larındaki istekler gibi).
+"direct" her mesaj için ayrı commit, diğerleri write-behind modunda verilen
+pencere (ms) ile toplu commit'tir. Mesaj/s ve çağrı gecikmesini yazar.
+
+Kullanım:
+    python benchmarks/group_commit.py --windows 1,2,5,10 --threads 32 --messages 200
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend'))
+
+from database import Database  # noqa: E402
+
+
+def bench(window_ms, threads, messages_per_thread, max_rows):
+    with tempfile.TemporaryDirectory() as workdir:
+        db_path = os.path.join(workdir, 'bench.db')
+        Database(db_path)
+        db = Database(db_path, init_schema=False, write_mode='direct' if window_ms is None else 'group')
+        if db.committer:
+            db.committer.window = window_ms / 1000
+            db.committer.max_rows = max_rows
+
+        users = []
+        for i in range(threads):
+            user_id, _ = db.create_user('Bench', 'User', f'gc{i}', f'gc{i}@example.com', 'benchpass')
+            users.append((user_id, db.create_chat(user_id)))
+
+        content = 'Yük testi mesajı ' * 20
+        latencies = []
+        start = threading.Event()
+
+        def writer(user_id, chat_id):
+            local = []
+            start.wait()
+            for _ in range(messages_per_thread):
+                t = time.perf_counter()
+                db.add_message(chat_id, 'user', content, user_id=user_id)
+                local.append(time.perf_counter() - t)
+            latencies.extend(local)
+
+        workers = [threading.Thread(target=writer, args=user) for user in users]
+        for worker in workers:
+            worker.start()
+        started = time.perf_counter()
+        start.set()
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    p50 = latencies[len(latencies) // 2] * 1000
+    p99 = latencies[int(len(latencies) * 0.99)] * 1000
+    return threads * messages_per_thread / elapsed, p50, p99
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--windows', default='1,2,5,10', help='ms cinsinden pencereler')
+    parser.add_argument('--threads', type=int, default=32)
+    parser.add_argument('--messages', type=int, default=200, help='thread başına mesaj')
+    parser.add_argument('--max-rows', type=int, default=256)
+    args = parser.parse_args()
+
+    print(f"{'pencere':>8} {'mesaj/s':>10} {'p50 ms':>8} {'p99 ms':>8}")
+    for window in [None] + [float(w) for w in args.windows.split(',')]:
+        rate, p50, p99 = bench(window, args.threads, args.messages, args.max_rows)
+        label = 'direct' if window is None else f'{window:g} ms'
+        print(f"{label:>8} {rate:>10,.0f} {p50:>8.2f} {p99:>8.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+"""
+Hedging ile kuyruk gecikmesi
+
+Sahte sağlayıcıya farklı gecikme dağılımları verilir ve aynı istek seti
+hedging kapalı / açık çağrılır. generate() için toplam süre, generate_stream()
+için ilk parça süresi ölçülür; yüzdelikler, gönderilen ek çağrı oranı ve
+hedge'in kazandığı çağrı sayısı yazılır. Ek çağrılar --budget ile sınırlıdır.
+
+Kullanım:
+    python benchmarks/hedging.py --requests 400 --concurrency 8
+    python benchmarks/hedging.py --dist bimodal:0.1:2:0.03 --budget 0.1 --percentile 90
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend'))
+
+os.environ['GENAI_PROVIDER'] = 'fake'
+
+import ai_client  # noqa: E402
+import metrics  # noqa: E402
+
+DISTRIBUTIONS = ['lognormal:0.1:0.6', 'bimodal:0.1:1.5:0.05', 'exp:0.15']
+
+
+def percentiles(values):
+    ordered = sorted(values)
+    pick = lambda pct: ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))] * 1000  # noqa: E731
+    return f"p50={pick(50):6.0f}  p95={pick(95):6.0f}  p99={pick(99):6.0f}  max={ordered[-1] * 1000:6.0f} ms"
+
+
+def call_generate(prompt):
+    started = time.time()
+    ai_client.generate(prompt)
+    return time.time() - started
+
+
+def call_stream(prompt):
+    started = time.time()
+    stream = ai_client.generate_stream(prompt)
+    next(stream)
+    elapsed = time.time() - started
+    stream.close()
+    return elapsed
+
+
+def run(func, args):
+    counters = metrics.snapshot()['counters']
+    before = {name: counters.get(name, 0) for name in ('genai.hedge.sent', 'genai.hedge.won')}
+    prompt = ai_client.Prompt('Sistem talimatı', [{'role': 'user', 'parts': ['Merhaba']}])
+    # Eşik için örnek biriktir (ölçüme dahil değil)
+    with ThreadPoolExecutor(args.concurrency) as pool:
+        list(pool.map(func, [prompt] * args.warmup))
+        counters = metrics.snapshot()['counters']
+        before = {name: counters.get(name, 0) for name in before}
+        latencies = list(pool.map(func, [prompt] * args.requests))
+    counters = metrics.snapshot()['counters']
+    sent, won = (counters.get(name, 0) - before[name] for name in before)
+    return latencies, sent, won
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--dist', action='append', help='gecikme dağılımı (tekrarlanabilir), örn. exp:0.2')
+    parser.add_argument('--requests', type=int, default=400)
+    parser.add_argument('--warmup', type=int, default=100)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--percentile', type=float, default=ai_client.HEDGE_PERCENTILE)
+    parser.add_argument('--budget', type=float, default=ai_client.HEDGE_BUDGET)
+    args = parser.parse_args()
+
+    print(f"eşik yüzdeliği {args.percentile}, bütçe {args.budget:.0%} ek çağrı\n")
+    for spec in args.dist or DISTRIBUTIONS:
+        ai_client._fake_latency = ai_client.parse_latency_dist(spec)
+        print(spec)
+        for kind, func in (('generate', call_generate), ('stream', call_stream)):
+            for enabled in (False, True):
+                ai_client.hedge = ai_client.HedgePolicy(enabled=enabled, percentile=args.percentile,
+                                                        budget=args.budget)
+                latencies, sent, won = run(func, args)
+                label = 'hedge' if enabled else 'kapalı'
+                print(f"  {kind:<8} {label:<6} {percentiles(latencies)}  "
+                      f"ek çağrı={sent / len(latencies):5.1%}  kazanan hedge={won}")
+        print()
+
+
+if __name__ == '__main__':
+    main()
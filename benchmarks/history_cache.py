@@ -0,0 +1,71 @@
+"""
+Geçmiş önbelleğiyle istem kurma süresi
+
+Geçici bir veritabanında birkaç kullanıcı için uzun sohbetler oluşturulur,
+sonra her chat için sırayla tur atılır: chat satırı okunur, geçmiş alınır,
+istem kurulur ve soru-cevap yazılır (app.query_ai / store_chat_turn gibi,
+model çağrısı olmadan). Önbellek kapalı ve açık çalıştırılır; geçmiş alma
+süresi ve tur başına veritabanından geçmiş okuma sayısı yazılır.
+
+Kullanım:
+    python benchmarks/history_cache.py --chats 50 --turns 20 --prefill 200
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend'))
+
+from database import Database  # noqa: E402
+from history_cache import HistoryCache  # noqa: E402
+
+
+def bench(max_chats, args):
+    with tempfile.TemporaryDirectory() as workdir:
+        db = Database(os.path.join(workdir, 'bench.db'))
+        chats = []
+        for i in range(args.chats):
+            user_id, _ = db.create_user('Bench', 'User', f'hc{i}', f'hc{i}@example.com', 'benchpass')
+            chat_id = db.create_chat(user_id)
+            db.add_messages(chat_id, [('user' if n % 2 == 0 else 'ai', 'Önceki mesaj ' * 30)
+                                      for n in range(args.prefill)], user_id=user_id)
+            chats.append((user_id, chat_id))
+
+        history = HistoryCache(max_chats=max_chats, max_messages=args.window)
+        reads = 0
+        latencies = []
+        for turn in range(args.turns):
+            for user_id, chat_id in chats:
+                chat = db.get_chat(chat_id, user_id)
+                started = time.perf_counter()
+                cached = history.get(chat)
+                if cached is None:
+                    reads += 1
+                    history.put(chat, db.get_recent_messages(chat_id, args.window, user_id=user_id))
+                latencies.append(time.perf_counter() - started)
+
+                messages = [('user', f'Soru {turn}'), ('ai', 'Yanıt ' * 50)]
+                history.append(chat_id, messages, db.add_messages(chat_id, messages, user_id=user_id))
+
+    latencies.sort()
+    pick = lambda pct: latencies[min(len(latencies) - 1, int(len(latencies) * pct / 100))] * 1e6  # noqa: E731
+    return reads / len(latencies), pick(50), pick(99)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--chats', type=int, default=50)
+    parser.add_argument('--turns', type=int, default=20)
+    parser.add_argument('--prefill', type=int, default=200, help='chat başına önceden yazılan mesaj')
+    parser.add_argument('--window', type=int, default=20, help='okunan / önbellekte tutulan son mesaj')
+    args = parser.parse_args()
+
+    for label, max_chats in (('kapalı', 0), ('açık', args.chats)):
+        reads, p50, p99 = bench(max_chats, args)
+        print(f"{label:<7} okuma/tur={reads:5.2f}  geçmiş p50={p50:8.1f} µs  p99={p99:8.1f} µs")
+
+
+if __name__ == '__main__':
+    main()
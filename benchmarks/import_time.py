@@ -0,0 +1,85 @@
+"""
+backend.app import süresi kontrolü
+
+python -X importtime ile uygulamayı ayrı bir süreçte import eder,
+toplam süreyi ve en pahalı modülleri yazar. Süre bütçeyi aşarsa
+çıkış kodu 1 olur (CI'da kullanılabilir).
+
+Kullanım:
+    python benchmarks/import_time.py [--budget-ms 400]
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BACKEND = os.path.join(ROOT, 'backend')
+
+# Bu modüller uygulama import edilirken yüklenmemeli (ilk sohbet isteğinde yüklenir)
+FORBIDDEN_MODULES = ('google.generativeai', 'grpc')
+BUDGET_MS = 400
+
+
+def measure():
+    """[(modül, kendi µs, toplam µs, derinlik)]; import başarısızsa RuntimeError"""
+    # Mevcut PYTHONPATH korunur (bağımlılıklar oradan geliyor olabilir)
+    pythonpath = os.pathsep.join(p for p in (BACKEND, os.environ.get('PYTHONPATH')) if p)
+    env = dict(os.environ, PAHIY_SCHEMA_READY='1', PYTHONPATH=pythonpath)
+    with tempfile.TemporaryDirectory() as workdir:
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', 'import app'],
+            cwd=workdir, env=env, capture_output=True, text=True
+        )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr[-2000:])
+
+    modules = []
+    for line in result.stderr.splitlines():
+        match = re.match(r'import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)', line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            modules.append((name, int(self_us), int(cumulative_us), len(indent)))
+    return modules
+
+
+def total_ms(modules) -> float:
+    return sum(self_us for _, self_us, _, _ in modules) / 1000
+
+
+def eager_modules(modules):
+    """FORBIDDEN_MODULES içinden import sırasında yüklenenler"""
+    loaded = {name for name, _, _, _ in modules}
+    return [name for name in FORBIDDEN_MODULES if name in loaded]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--budget-ms', type=float, default=BUDGET_MS)
+    args = parser.parse_args()
+
+    try:
+        modules = measure()
+    except RuntimeError as e:
+        print(e)
+        sys.exit(2)
+    total = total_ms(modules)
+    top_level = sorted((m for m in modules if m[3] == 1), key=lambda m: -m[2])
+
+    print(f"Toplam import süresi: {total:.1f} ms (bütçe {args.budget_ms:.0f} ms)")
+    for name, _, cumulative_us, _ in top_level[:10]:
+        print(f"  {cumulative_us / 1000:8.1f} ms  {name}")
+
+    eager = eager_modules(modules)
+    if eager:
+        print(f"HATA: import sırasında yüklenmemesi gereken modüller: {', '.join(eager)}")
+        sys.exit(1)
+    if total > args.budget_ms:
+        print("HATA: import süresi bütçeyi aştı")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
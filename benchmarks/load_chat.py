@@ -0,0 +1,119 @@
+"""
+/api/chat yük testi
+
+Çalışan bir sunucuya karşı sentetik kullanıcılarla eşzamanlı sohbet
+istekleri gönderir ve gecikme dağılımını yazar. Kullanıcılar doğrudan
+sunucunun veritabanına eklenir (email doğrulaması atlanır), bu yüzden
+betik sunucuyla aynı çalışma dizininde çalıştırılmalıdır.
+
+Kullanım:
+    GENAI_PROVIDER=fake python backend/app.py
+    python benchmarks/load_chat.py --url http://localhost:5000 --users 20 --requests 500
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend'))
+
+from database import Database  # noqa: E402
+
+
+def create_users(db, count, prefix='bench'):
+    """Doğrulanmış kullanıcılar, oturum token'ları ve birer chat oluştur"""
+    suffix = str(int(time.time() * 1000))[-6:]
+    users = []
+    for i in range(count):
+        username = f"{prefix}{suffix}_{i}"
+        user_id, verification_token = db.create_user('Bench', 'User', username, f"{username}@example.com", 'benchpass')
+        db.verify_email(verification_token)
+        token = db.create_session(user_id)
+        chat_id = db.create_chat(user_id, 'Benchmark')
+        users.append({'user_id': user_id, 'token': token, 'chat_id': chat_id, 'ip': f"10.0.{i // 250}.{i % 250 + 1}"})
+    return users
+
+
+def post_json(url, payload, token, ip=None, timeout=120):
+    headers = {'Content-Type': 'application/json', 'Authorization': f'Bearer {token}'}
+    if ip:
+        # IP başına rate limit benchmark'ı bozmasın
+        headers['X-Forwarded-For'] = ip
+    request = urllib.request.Request(url, data=json.dumps(payload).encode(), headers=headers, method='POST')
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            response.read()
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+    except Exception:
+        return 0
+
+
+def run_load(base_url, users, total_requests, concurrency, message='Merhaba, bu bir yük testi mesajıdır.'):
+    latencies = []
+    statuses = {}
+    lock = threading.Lock()
+    counter = iter(range(total_requests))
+
+    def worker():
+        while True:
+            with lock:
+                i = next(counter, None)
+            if i is None:
+                return
+            user = users[i % len(users)]
+            started = time.perf_counter()
+            status = post_json(f"{base_url}/api/chat", {'message': message, 'chat_id': user['chat_id']},
+                               user['token'], user['ip'])
+            elapsed = time.perf_counter() - started
+            with lock:
+                latencies.append(elapsed)
+                statuses[status] = statuses.get(status, 0) + 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for _ in range(concurrency):
+            pool.submit(worker)
+    duration = time.perf_counter() - started
+    return summarize(latencies, statuses, duration)
+
+
+def summarize(latencies, statuses, duration):
+    latencies = sorted(latencies)
+    count = len(latencies)
+
+    def pct(p):
+        return latencies[min(count - 1, int(count * p))] * 1000 if count else 0
+
+    return {
+        'requests': count,
+        'duration_s': round(duration, 2),
+        'rps': round(count / duration, 1) if duration else 0,
+        'p50_ms': round(pct(0.50), 1),
+        'p95_ms': round(pct(0.95), 1),
+        'p99_ms': round(pct(0.99), 1),
+        'statuses': statuses,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--url', default='http://localhost:5000')
+    parser.add_argument('--db', default='pahiy_ai.db')
+    parser.add_argument('--users', type=int, default=20)
+    parser.add_argument('--requests', type=int, default=500)
+    parser.add_argument('--concurrency', type=int, default=32)
+    args = parser.parse_args()
+
+    users = create_users(Database(args.db), args.users)
+    result = run_load(args.url, users, args.requests, args.concurrency)
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == '__main__':
+    main()
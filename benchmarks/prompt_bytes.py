@@ -0,0 +1,89 @@
+"""
+Tur başına istem boyutu: düz metin istem ile yapılandırılmış istem karşılaştırması
+
+Sahte bir sohbeti tur tur oynatır ve her turda modele giden bayt sayısını
+ve bir önceki turun istemiyle ortak önek dışında kalan (sağlayıcının yeniden
+işlemesi gereken) bayt sayısını yazar. "önce" eski build_prompt_with_history
+davranışının (tek metin, sistem istemi + "Kullanıcı:/Sen:" geçmişi) kopyasıdır.
+
+Kullanım:
+    python benchmarks/prompt_bytes.py --turns 16 --reply-chars 600
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend'))
+
+os.environ.setdefault('GENAI_PROVIDER', 'fake')
+os.environ.setdefault('PAHIY_SCHEMA_READY', '1')
+
+from app import build_prompt_with_history, build_system_instruction  # noqa: E402
+
+
+def legacy_prompt(user_input, conversation_history, username):
+    """Değişiklik öncesi düz metin istem"""
+    conversation_text = "ÖNCEKİ KONUŞMA GEÇMİŞİ:\n"
+    for msg in conversation_history[-10:]:
+        role_prefix = "Kullanıcı" if msg["role"] == "user" else "Sen"
+        conversation_text += f"{role_prefix}: {msg['content']}\n"
+    conversation_text += f"\nŞİMDİKİ SORU: {user_input}\nCEVAP:"
+    return f"{build_system_instruction()}\nKullanıcının adı: {username}\n\n{conversation_text}"
+
+
+def serialize(prompt):
+    """Yapılandırılmış istemin sağlayıcıya gidiş sırası (önek karşılaştırması için)"""
+    parts = [prompt.system_instruction]
+    for content in prompt.contents:
+        parts.append(content['role'])
+        parts.extend(content['parts'])
+    return '\x00'.join(parts).encode('utf-8')
+
+
+def common_prefix(a, b):
+    limit = min(len(a), len(b))
+    i = 0
+    while i < limit and a[i] == b[i]:
+        i += 1
+    return i
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--turns', type=int, default=16)
+    parser.add_argument('--reply-chars', type=int, default=600)
+    parser.add_argument('--question-chars', type=int, default=120)
+    args = parser.parse_args()
+
+    messages = []
+    previous = {'önce': b'', 'sonra': b''}
+    totals = {'önce': [0, 0], 'sonra': [0, 0]}
+
+    print(f"{'tur':>4} {'önce bayt':>10} {'önce yeni':>10} {'sonra bayt':>11} {'sonra yeni':>11}")
+    for turn in range(1, args.turns + 1):
+        question = (f'Soru {turn}: ' + 'kod örneği ile açıklar mısın ' * 20)[:args.question_chars]
+        # Route, geçmişi get_chat_messages(limit=20) ile okur
+        history = messages[:20]
+
+        sent = {
+            'önce': legacy_prompt(question, history, 'ayaz').encode('utf-8'),
+            'sonra': serialize(build_prompt_with_history(question, history, 'ayaz')),
+        }
+        row = []
+        for name, data in sent.items():
+            fresh = len(data) - common_prefix(previous[name], data)
+            totals[name][0] += len(data)
+            totals[name][1] += fresh
+            previous[name] = data
+            row += [len(data), fresh]
+        print(f"{turn:>4} {row[0]:>10,} {row[1]:>10,} {row[2]:>11,} {row[3]:>11,}")
+
+        messages.append({'role': 'user', 'content': question})
+        messages.append({'role': 'ai', 'content': (f'Yanıt {turn}. ' + 'örnek açıklama metni ' * 100)[:args.reply_chars]})
+
+    print(f"{'top':>4} {totals['önce'][0]:>10,} {totals['önce'][1]:>10,} "
+          f"{totals['sonra'][0]:>11,} {totals['sonra'][1]:>11,}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,259 @@
+"""
+Kaydedilmiş trafiği yeniden oynatma
+
+backend/capture.py'nin yazdığı NDJSON dosyalarını (CAPTURE=1) çalışan bir
+yerel sunucuya karşı yeniden oynatır. Her kayıttaki kullanıcı takma adı
+için doğrulanmış bir kullanıcı, chat takma adları için chat oluşturulur
+(doğrudan sunucunun veritabanına; betik sunucuyla aynı çalışma dizininde
+çalıştırılmalıdır). Kullanıcı başına istekler kayıttaki sırayla ve
+zaman aralıklarıyla (--speed ile hızlandırılarak) gönderilir; mesajlar
+kayıttaki uzunlukta dolgu metnidir ve kaydedilen model süresini
+"[fake-latency=sn]" işaretiyle taşır. Sunucu sahte sağlayıcıyla
+çalışmalıdır; böylece aynı kayıt her build'de aynı model gecikmesini görür.
+WebSocket mesajları (ws.send) aynı kuralları izleyen /api/chat ile oynatılır.
+
+Route başına gecikme yüzdelikleri kayıttakilerle yan yana yazılır;
+--out sonucu JSON olarak saklar, --compare önceki bir sonuçla farkı gösterir.
+
+Kullanım:
+    GENAI_PROVIDER=fake python backend/app.py
+    python benchmarks/replay.py 'captures/*.ndjson*' --speed 4 --out yeni.json --compare eski.json
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend'))
+
+from storage import create_storage  # noqa: E402
+
+FILLER = 'Tekrar oynatılan mesaj içeriği. '
+
+# endpoint -> (metot, yol kalıbı); {chat} eşlenmiş chat id'siyle doldurulur
+REPLAYABLE = {
+    'main.chat': ('POST', '/api/chat'),
+    'ws.send': ('POST', '/api/chat'),
+    'main.get_chats': ('GET', '/api/chats'),
+    'main.get_chats_version': ('GET', '/api/chats/version'),
+    'main.sync_chats': ('GET', '/api/sync'),
+    'main.sync_chat_messages': ('GET', '/api/chats/{chat}/sync'),
+    'main.create_chat': ('POST', '/api/chats'),
+    'main.get_chat': ('GET', '/api/chats/{chat}'),
+    'main.delete_chat': ('DELETE', '/api/chats/{chat}'),
+    'main.update_chat_title': ('PUT', '/api/chats/{chat}/title'),
+    'main.clear_chat': ('POST', '/api/chats/{chat}/clear'),
+    'main.get_current_user': ('GET', '/api/me'),
+    'main.export_chats': ('GET', '/api/export'),
+    'main.health_check': ('GET', '/api/health'),
+}
+STATIC_ENDPOINTS = {'main.serve_index', 'main.serve_chat', 'main.serve_css', 'main.serve_js', 'main.serve_static'}
+
+
+def load_records(patterns, limit=None):
+    records = []
+    for pattern in patterns:
+        for path in glob.glob(pattern):
+            with open(path, encoding='utf-8') as f:
+                records.extend(json.loads(line) for line in f if line.strip())
+    records.sort(key=lambda record: record['ts'])
+    return records[:limit] if limit else records
+
+
+class Session:
+    """Kayıttaki bir kullanıcının tekrardaki karşılığı"""
+
+    def __init__(self, db, index):
+        username = f"replay{str(int(time.time() * 1000))[-6:]}_{index}"
+        user_id, verification_token = db.create_user('Replay', 'User', username, f"{username}@example.com",
+                                                      'replaypass')
+        db.verify_email(verification_token)
+        self.db = db
+        self.user_id = user_id
+        self.token = db.create_session(user_id)
+        self.ip = f"10.1.{index // 250}.{index % 250 + 1}"
+        self.chats = {}
+
+    def chat_id(self, alias):
+        if alias not in self.chats:
+            self.chats[alias] = self.db.create_chat(self.user_id, 'Replay')
+        return self.chats[alias]
+
+
+def build_request(record, session):
+    endpoint = record.get('endpoint')
+    if endpoint in STATIC_ENDPOINTS:
+        return 'GET', record['route'], None
+    if endpoint not in REPLAYABLE or session is None:
+        return None
+    method, path = REPLAYABLE[endpoint]
+    if '{chat}' in path:
+        if not record.get('chat'):
+            return None
+        path = path.format(chat=session.chat_id(record['chat']))
+
+    body = None
+    if endpoint in ('main.chat', 'ws.send'):
+        marker = f"[fake-latency={record['model_ms'] / 1000:.3f}] " if record.get('model_ms') else ''
+        length = max(1, record.get('msg_chars') or 40)
+        text = marker + (FILLER * (length // len(FILLER) + 1))[:max(0, length - len(marker))]
+        body = {'message': text, 'chat_id': session.chat_id(record.get('chat'))}
+    elif endpoint == 'main.create_chat':
+        body = {'title': 'Replay'}
+    elif endpoint == 'main.update_chat_title':
+        body = {'title': 'Replay başlığı'}
+    elif method == 'POST':
+        body = {}
+    return method, path, body
+
+
+def send(base_url, method, path, body, session, timeout=120):
+    headers = {}
+    if session:
+        headers['Authorization'] = f'Bearer {session.token}'
+        # IP başına rate limit tekrarı bozmasın
+        headers['X-Forwarded-For'] = session.ip
+    data = None
+    if body is not None:
+        headers['Content-Type'] = 'application/json'
+        data = json.dumps(body).encode()
+    request = urllib.request.Request(base_url + path, data=data, headers=headers, method=method)
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            return response.status, response.read()
+    except urllib.error.HTTPError as e:
+        return e.code, b''
+    except Exception:
+        return 0, b''
+
+
+def replay(base_url, records, db, speed, max_threads):
+    """Kullanıcı başına sıralı, kayıttaki zamanlamayla; [(endpoint, durum, ms, kayıttaki ms, gecikme ms)]"""
+    sequences = {}
+    for i, record in enumerate(records):
+        # Oturumsuz istekler (statik dosyalar) birbirini beklemez
+        sequences.setdefault(record.get('user') or f'anon-{i}', []).append(record)
+
+    sessions = {}
+    for index, alias in enumerate(alias for alias in sequences if not alias.startswith('anon-')):
+        sessions[alias] = Session(db, index)
+
+    results = []
+    skipped = {}
+    lock = threading.Lock()
+    first_ts = records[0]['ts']
+    started = time.perf_counter() + 0.5
+
+    def run(alias, sequence):
+        session = sessions.get(alias)
+        for record in sequence:
+            built = build_request(record, session)
+            if built is None:
+                with lock:
+                    skipped[record.get('endpoint')] = skipped.get(record.get('endpoint'), 0) + 1
+                continue
+            scheduled = started + ((record['ts'] - first_ts) / speed if speed > 0 else 0)
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            lag = max(0.0, time.perf_counter() - scheduled)
+
+            t = time.perf_counter()
+            status, payload = send(base_url, *built, session)
+            elapsed = (time.perf_counter() - t) * 1000
+            if record.get('endpoint') == 'main.create_chat' and status == 200 and record.get('chat'):
+                session.chats[record['chat']] = json.loads(payload)['chat_id']
+            elif record.get('endpoint') == 'main.delete_chat':
+                session.chats.pop(record['chat'], None)
+            with lock:
+                results.append((record['endpoint'], status, elapsed, record.get('ms'), lag * 1000))
+
+    with ThreadPoolExecutor(max_workers=min(max_threads, len(sequences))) as pool:
+        for alias, sequence in sequences.items():
+            pool.submit(run, alias, sequence)
+    return results, skipped, time.perf_counter() - started
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))] if ordered else 0
+
+
+def summarize(results):
+    groups = {}
+    for endpoint, status, elapsed, captured, lag in results:
+        groups.setdefault(endpoint, []).append((status, elapsed, captured))
+        groups.setdefault('(toplam)', []).append((status, elapsed, captured))
+    summary = {}
+    for endpoint, rows in groups.items():
+        latencies = [row[1] for row in rows]
+        captured = [row[2] for row in rows if row[2] is not None]
+        statuses = {}
+        for row in rows:
+            statuses[str(row[0])] = statuses.get(str(row[0]), 0) + 1
+        summary[endpoint] = {
+            'n': len(rows),
+            'p50_ms': round(percentile(latencies, 50), 1),
+            'p95_ms': round(percentile(latencies, 95), 1),
+            'p99_ms': round(percentile(latencies, 99), 1),
+            'captured_p50_ms': round(percentile(captured, 50), 1),
+            'captured_p99_ms': round(percentile(captured, 99), 1),
+            'statuses': statuses,
+        }
+    summary['(toplam)']['lag_p99_ms'] = round(percentile([r[4] for r in results], 99), 1)
+    return summary
+
+
+def print_summary(summary, previous=None):
+    print(f"{'endpoint':<28}{'n':>6}{'p50':>9}{'p95':>9}{'p99':>9}   {'kayıt p50':>9}{'kayıt p99':>10}  durumlar")
+    for endpoint, row in sorted(summary.items(), key=lambda item: -item[1]['n']):
+        line = (f"{endpoint:<28}{row['n']:>6}{row['p50_ms']:>9.1f}{row['p95_ms']:>9.1f}{row['p99_ms']:>9.1f}   "
+                f"{row['captured_p50_ms']:>9.1f}{row['captured_p99_ms']:>10.1f}  {row['statuses']}")
+        old = (previous or {}).get(endpoint)
+        if old:
+            line += f"  (önceki p50 {old['p50_ms']:.1f}, p99 {old['p99_ms']:.1f})"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('captures', nargs='+', help="kayıt dosyaları (glob), örn. 'captures/*.ndjson*'")
+    parser.add_argument('--url', default='http://localhost:5000')
+    parser.add_argument('--db', default='pahiy_ai.db')
+    parser.add_argument('--speed', type=float, default=1.0, help='hızlandırma katı (0: beklemeden)')
+    parser.add_argument('--limit', type=int, help='ilk N kayıt')
+    parser.add_argument('--max-threads', type=int, default=256, help='aynı anda oynatılan kullanıcı')
+    parser.add_argument('--out', help='sonucu JSON olarak yaz')
+    parser.add_argument('--compare', help='önceki --out dosyası')
+    args = parser.parse_args()
+
+    records = load_records(args.captures, args.limit)
+    if not records:
+        raise SystemExit('Kayıt bulunamadı')
+    span = records[-1]['ts'] - records[0]['ts']
+    print(f"{len(records)} kayıt, {span:.0f} s'lik trafik, hız {args.speed}x\n")
+
+    results, skipped, duration = replay(args.url, records, create_storage(args.db), args.speed, args.max_threads)
+    summary = summarize(results) if results else {}
+    previous = None
+    if args.compare:
+        with open(args.compare) as f:
+            previous = json.load(f)['endpoints']
+    print_summary(summary, previous)
+    print(f"\n{len(results)} istek {duration:.1f} s'de oynatıldı, zamanlama gecikmesi p99 "
+          f"{summary.get('(toplam)', {}).get('lag_p99_ms', 0):.1f} ms")
+    if skipped:
+        print(f"Oynatılmayan: {skipped}")
+
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump({'speed': args.speed, 'records': len(records), 'endpoints': summary}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
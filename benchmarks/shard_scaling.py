@@ -0,0 +1,83 @@
+"""
+Shard sayısına göre yazma ölçeklenmesi
+
+Her shard sayısı için geçici bir veritabanı kurar, kullanıcıları
+shard'lara dağıtır ve birden çok süreçten eşzamanlı add_message
+çağrıları yapar. Toplam mesaj/s değerini yazar.
+
+Kullanım:
+    python benchmarks/shard_scaling.py --shards 1,2,4,8 --processes 8 --messages 2000
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend'))
+
+from database import Database  # noqa: E402
+
+
+def writer(db_path, shard_count, users, messages, start_event, result_queue):
+    db = Database(db_path, init_schema=False, shard_count=shard_count)
+    content = 'Yük testi mesajı ' * 20
+    start_event.wait()
+    started = time.perf_counter()
+    for i in range(messages):
+        user_id, chat_id = users[i % len(users)]
+        db.add_message(chat_id, 'user', content, user_id=user_id)
+    result_queue.put(time.perf_counter() - started)
+
+
+def bench(shard_count, processes, messages_per_process):
+    with tempfile.TemporaryDirectory() as workdir:
+        db_path = os.path.join(workdir, 'bench.db')
+        db = Database(db_path, shard_count=shard_count)
+
+        # Her süreç farklı shard'lardaki kullanıcılara yazar
+        users = []
+        for i in range(processes * 4):
+            user_id, _ = db.create_user('Bench', 'User', f'shard{i}', f'shard{i}@example.com', 'benchpass')
+            users.append((user_id, db.create_chat(user_id)))
+        assignments = [users[i::processes] for i in range(processes)]
+
+        start_event = multiprocessing.Event()
+        result_queue = multiprocessing.Queue()
+        workers = [
+            multiprocessing.Process(target=writer, args=(db_path, shard_count, assignment,
+                                                         messages_per_process, start_event, result_queue))
+            for assignment in assignments
+        ]
+        for worker in workers:
+            worker.start()
+        time.sleep(0.5)
+
+        started = time.perf_counter()
+        start_event.set()
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - started
+
+    total = processes * messages_per_process
+    return total / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--shards', default='1,2,4,8')
+    parser.add_argument('--processes', type=int, default=8)
+    parser.add_argument('--messages', type=int, default=2000, help='süreç başına mesaj')
+    args = parser.parse_args()
+
+    baseline = None
+    print(f"{'shard':>5} {'mesaj/s':>10} {'ölçek':>7}")
+    for shard_count in [int(s) for s in args.shards.split(',')]:
+        rate = bench(shard_count, args.processes, args.messages)
+        baseline = baseline or rate
+        print(f"{shard_count:>5} {rate:>10,.0f} {rate / baseline:>6.2f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,242 @@
+"""
+Tarayıcıda sohbet arayüzü çizim süresi
+
+frontend/ klasörünü yerel bir HTTP sunucusuyla açar, /api isteklerini
+sahte verilerle yanıtlar (backend gerekmez) ve gerçek bir Chromium'da
+ölçer:
+  - açma     : binlerce (kod ağırlıklı) mesajlı chat'in açılıp çizilmesi
+  - geçiş    : iki uzun chat arasında gidip gelme
+  - kaydırma : listenin en altından en üstüne kaydırırken en uzun kare
+  - akış     : tek yanıtın 500 delta ile gelmesi
+  - kenar    : 300 chat'lik listenin bir chat değişmişken yenilenmesi
+DOM'daki düğüm sayısı da raporlanır. Tarayıcı boş profille açılır: ilk
+açma IndexedDB önbelleği boşken, geçişler önbellekten ölçülür. --script
+ile başka bir script.js (örneğin değişiklik öncesi sürüm) verilerek
+karşılaştırma yapılabilir:
+
+    git show HEAD~1:frontend/js/script.js > /tmp/script_old.js
+    python benchmarks/ui_render.py --script /tmp/script_old.js
+
+Playwright gerekir (depoda bağımlılık olarak yoktur):
+    pip install playwright && python -m playwright install chromium
+"""
+import argparse
+import functools
+import json
+import os
+import re
+import statistics
+import threading
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+FRONTEND_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'frontend')
+
+CODE_SAMPLE = '''def fibonacci(n):
+    a, b = 0, 1
+    for _ in range(n):
+        a, b = b, a + b
+    return a
+
+print([fibonacci(i) for i in range(20)])'''
+
+
+def code_block(code, language='python'):
+    """Sunucudaki format_ai_response ile aynı işaretleme"""
+    escaped = code.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;').replace('"', '&quot;')
+    display = escaped.replace(' ', '&nbsp;').replace('\n', '<br>')
+    return f'''
+        <div class="code-block" data-original-code="{escaped}">
+            <div class="code-header">
+                <span class="language">{language}</span>
+                <button class="copy-btn" onclick="copyCode(this)">
+                    <i class="fas fa-copy"></i> Kopyala
+                </button>
+            </div>
+            <pre><code>{display}</code></pre>
+        </div>'''
+
+
+def make_messages(count):
+    messages = []
+    for i in range(count):
+        if i % 2 == 0:
+            messages.append({'role': 'user', 'content': f'Soru {i}: bunu nasıl yazarım?',
+                             'timestamp': '2025-01-01 12:00:00'})
+        else:
+            messages.append({'role': 'ai', 'timestamp': '2025-01-01 12:00:05',
+                             'content': f'<strong>Yanıt {i}</strong><br>Şöyle yazabilirsin:{code_block(CODE_SAMPLE)}'
+                                        f'<br>Açıklama: döngü her adımda <em>a</em> ve <em>b</em> değerlerini kaydırır.'})
+    return messages
+
+
+def make_chats(count, sizes):
+    chats = []
+    for i in range(count):
+        chats.append({'id': f'chat{i}', 'title': f'Sohbet {i}', 'updated_at': '2025-01-01T12:00:00',
+                      'created_at': '2025-01-01T12:00:00', 'message_count': sizes.get(f'chat{i}', 2),
+                      'last_message_preview': f'Son mesaj {i}', 'last_role': 'ai'})
+    return chats
+
+
+def start_server(script_path):
+    """frontend/ dizinini sunar; --script verildiyse /js/script.js yerine o dosya döner"""
+
+    class Handler(SimpleHTTPRequestHandler):
+        def translate_path(self, path):
+            if script_path and path.split('?')[0] == '/js/script.js':
+                return script_path
+            return super().translate_path(path)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), functools.partial(Handler, directory=FRONTEND_DIR))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+# Sayfa içinde çalışan ölçümler (iki kare sonrası = çizim tamamlandı)
+PAGE_HELPERS = '''
+window.__frames = () => new Promise(r => requestAnimationFrame(() => requestAnimationFrame(r)));
+window.__nodes = () => document.getElementById('messagesContainer').getElementsByTagName('*').length;
+'''
+
+
+def measure(page, chat_ids, args):
+    results = {}
+    page.evaluate(PAGE_HELPERS)
+
+    open_ms = {}
+    for chat_id in chat_ids:
+        open_ms[chat_id] = page.evaluate('''async (id) => {
+            const t = performance.now();
+            await selectChat(id);
+            await __frames();
+            return performance.now() - t;
+        }''', chat_id)
+        # Sanal listede pencere birkaç karede oturur
+        page.evaluate('__frames()')
+    results['open_ms'] = {k: round(v, 1) for k, v in open_ms.items()}
+    results['dom_nodes'] = page.evaluate('__nodes()')
+
+    switches = page.evaluate('''async ([a, b, n]) => {
+        const times = [];
+        for (let i = 0; i < n; i++) {
+            const t = performance.now();
+            await selectChat(i % 2 ? a : b);
+            await __frames();
+            times.push(performance.now() - t);
+        }
+        return times;
+    }''', [chat_ids[-1], chat_ids[-2] if len(chat_ids) > 1 else chat_ids[-1], args.switches])
+    results['switch_p50_ms'] = round(statistics.median(switches), 1)
+    results['switch_max_ms'] = round(max(switches), 1)
+
+    results['scroll_max_frame_ms'] = round(page.evaluate('''async () => {
+        const container = document.getElementById('messagesContainer');
+        let worst = 0;
+        while (container.scrollTop > 0) {
+            const t = performance.now();
+            container.scrollTop = Math.max(0, container.scrollTop - 600);
+            await __frames();
+            worst = Math.max(worst, performance.now() - t);
+        }
+        return worst;
+    }'''), 1)
+
+    results['stream_ms'] = round(page.evaluate('''async (n) => {
+        const t = performance.now();
+        socketStreams[1] = { chatId: currentChatId, message: 'x', item: null, element: null, text: '' };
+        for (let i = 0; i < n; i++) {
+            handleSocketFrame({ type: 'delta', id: 1, text: 'kelime ' });
+            if (i % 10 === 0) await new Promise(r => setTimeout(r, 0));
+        }
+        await __frames();
+        return performance.now() - t;
+    }''', 500), 1)
+
+    results['sidebar_p50_ms'] = round(page.evaluate('''async (n) => {
+        const response = await fetch('/api/chats');
+        const chats = (await response.json()).chats;
+        const times = [];
+        for (let i = 0; i < n; i++) {
+            chats[i % chats.length].last_message_preview = 'güncellendi ' + i;
+            const t = performance.now();
+            displayChats(chats);
+            await __frames();
+            times.push(performance.now() - t);
+        }
+        return times.sort((a, b) => a - b)[Math.floor(times.length / 2)];
+    }''', 20), 1)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--messages', default='200,1000,5000', help='ölçülecek chat boyutları')
+    parser.add_argument('--chats', type=int, default=300, help='kenar çubuğundaki chat sayısı')
+    parser.add_argument('--switches', type=int, default=10)
+    parser.add_argument('--script', help='frontend/js/script.js yerine kullanılacak dosya')
+    parser.add_argument('--headed', action='store_true')
+    args = parser.parse_args()
+
+    try:
+        from playwright.sync_api import sync_playwright
+    except ImportError:
+        raise SystemExit('playwright kurulu değil: pip install playwright && python -m playwright install chromium')
+
+    sizes = {f'chat{i}': int(n) for i, n in enumerate(args.messages.split(','))}
+    chats = make_chats(max(args.chats, len(sizes)), sizes)
+    server = start_server(os.path.abspath(args.script) if args.script else None)
+    base_url = f'http://127.0.0.1:{server.server_address[1]}'
+
+    def handle_api(route):
+        path, _, query = re.sub(r'^https?://[^/]+', '', route.request.url).partition('?')
+        since = int((re.search(r'since=(\d+)', query) or [0, 0])[1])
+        if path == '/api/me':
+            body = {'user': {'id': 1, 'username': 'bench', 'first_name': 'Bench', 'last_name': 'User',
+                             'email': 'bench@example.com'}}
+        elif path == '/api/chats':
+            body = {'chats': chats, 'version': 1}
+        elif path == '/api/sync':
+            # Veri değişmez: ilk istekten sonra delta boştur
+            body = {'seq': 1, 'reset': since == 0, 'chats': chats if since == 0 else [],
+                    'chat_ids': [c['id'] for c in chats]}
+        elif path.startswith('/api/chats/') and path.endswith('/sync'):
+            chat_id = path.split('/')[3]
+            messages = [dict(m, id=i + 1, seq=1) for i, m in enumerate(make_messages(sizes.get(chat_id, 2)))]
+            body = {'chat': dict(next((c for c in chats if c['id'] == chat_id), {}), seq=1),
+                    'reset': since == 0, 'messages': messages if since == 0 else []}
+        elif path.startswith('/api/chats/'):
+            chat_id = path.rsplit('/', 1)[1]
+            body = {'chat': next((c for c in chats if c['id'] == chat_id), None),
+                    'messages': make_messages(sizes.get(chat_id, 2))}
+        else:
+            route.fulfill(status=404, content_type='application/json', body='{"error": "yok"}')
+            return
+        route.fulfill(status=200, content_type='application/json', body=json.dumps(body))
+
+    with sync_playwright() as p:
+        browser = p.chromium.launch(headless=not args.headed)
+        page = browser.new_page(viewport={'width': 1400, 'height': 900})
+        # API aynı kökene gitsin (config.js localhost:5000'e yönlendirir), WebSocket açılmasın
+        page.add_init_script('''
+            Object.defineProperty(window, 'CONFIG', { value: { BACKEND_URL: location.origin }, writable: false });
+            localStorage.setItem('auth_token', 'bench');
+            delete window.WebSocket;
+        ''')
+        page.route('**/api/**', handle_api)
+        page.goto(f'{base_url}/index.html')
+        page.wait_for_function('typeof currentUser !== "undefined" && currentUser !== null')
+        page.wait_for_selector('.chat-item')
+
+        results = measure(page, list(sizes), args)
+        browser.close()
+    server.shutdown()
+
+    results['script'] = args.script or 'frontend/js/script.js'
+    print(json.dumps(results, indent=2, ensure_ascii=False))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+"""
+Gunicorn worker modellerinin karşılaştırması
+
+Her worker modeli için gunicorn.conf.py ile sahte model sağlayıcısına
+bağlı bir sunucu başlatır, aynı yükü uygular ve sonuçları tablo olarak yazar.
+
+Kullanım:
+    python benchmarks/worker_models.py --models gthread,gevent,sync --fake-latency 0.5
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+import load_chat  # noqa: E402
+from database import Database  # noqa: E402
+
+
+def wait_until_healthy(url, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with urllib.request.urlopen(f"{url}/api/health", timeout=1):
+                return True
+        except Exception:
+            time.sleep(0.2)
+    return False
+
+
+def bench_model(model, args):
+    port = args.port
+    url = f"http://127.0.0.1:{port}"
+    with tempfile.TemporaryDirectory() as workdir:
+        env = dict(os.environ,
+                   PORT=str(port),
+                   GENAI_PROVIDER='fake',
+                   GENAI_FAKE_LATENCY=str(args.fake_latency),
+                   GUNICORN_WORKER_MODEL=model,
+                   GUNICORN_ACCESS_LOG='/dev/null',
+                   USER_MAX_CONCURRENT='1000')
+        log_path = os.path.join(workdir, 'gunicorn.log')
+        server = subprocess.Popen(
+            [sys.executable, '-m', 'gunicorn', '-c', os.path.join(ROOT, 'gunicorn.conf.py'),
+             'backend.app:app'],
+            cwd=workdir, env=env, stdout=subprocess.DEVNULL, stderr=open(log_path, 'w')
+        )
+        try:
+            if not wait_until_healthy(url):
+                with open(log_path) as f:
+                    return {'error': f.read()[-500:] or 'başlatılamadı'}
+            users = load_chat.create_users(Database(os.path.join(workdir, 'pahiy_ai.db')), args.users, prefix=model)
+            return load_chat.run_load(url, users, args.requests, args.concurrency)
+        finally:
+            server.terminate()
+            server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--models', default='gthread,gevent,sync')
+    parser.add_argument('--port', type=int, default=5099)
+    parser.add_argument('--users', type=int, default=50)
+    parser.add_argument('--requests', type=int, default=1000)
+    parser.add_argument('--concurrency', type=int, default=64)
+    parser.add_argument('--fake-latency', type=float, default=0.5)
+    args = parser.parse_args()
+
+    print(f"{'model':10} {'rps':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}  statuses")
+    for model in args.models.split(','):
+        result = bench_model(model.strip(), args)
+        if 'error' in result:
+            print(f"{model:10} HATA: {result['error']}")
+            continue
+        print(f"{model:10} {result['rps']:>8} {result['p50_ms']:>9} {result['p95_ms']:>9} "
+              f"{result['p99_ms']:>9}  {result['statuses']}")
+
+
+if __name__ == '__main__':
+    main()
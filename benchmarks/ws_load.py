@@ -0,0 +1,179 @@
+"""
+WebSocket ve REST sohbet yolu karşılaştırması
+
+Çalışan bir sunucuya karşı aynı mesaj yükünü önce REST (/api/chat, her
+mesajda ayrı HTTP isteği ve oturum doğrulaması), sonra WebSocket (/ws,
+kullanıcı başına tek bağlantı) üzerinden gönderir. Mesaj başına ek yük,
+sahte model gecikmesi çıkarılarak hesaplanır. --idle ile ayrıca boşta
+bekleyen bağlantı açılır; kaçının kabul edildiği, kaçının kapasite dolu
+(4429, istemci REST'e geçer) diye kapatıldığı ve bağlantılar açıkken
+/api/health gecikmesi raporlanır.
+
+flask-sock kurulu olmalıdır (istemci tarafı simple-websocket kullanır).
+
+Kullanım:
+    GENAI_PROVIDER=fake GENAI_FAKE_LATENCY=0.2 gunicorn -c gunicorn.conf.py backend.app:app
+    python benchmarks/ws_load.py --url http://localhost:8000 --users 20 --messages 10 --idle 200
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import load_chat  # noqa: E402
+from database import Database  # noqa: E402
+
+import simple_websocket  # noqa: E402
+
+# backend/app.py WS_CLOSE_USE_REST
+WS_CLOSE_USE_REST = 4429
+
+
+class SocketRejected(Exception):
+    """Worker'ın soket kapasitesi dolu; istemci REST ile devam eder"""
+
+
+def ws_url(base_url):
+    return base_url.replace('http', 'ws', 1) + '/ws'
+
+
+def open_socket(base_url, user):
+    ws = simple_websocket.Client.connect(ws_url(base_url), headers={'X-Forwarded-For': user['ip']})
+    try:
+        ws.send(json.dumps({'type': 'auth', 'token': user['token']}))
+        ready = json.loads(ws.receive(timeout=10))
+    except simple_websocket.ConnectionClosed as e:
+        if e.reason == WS_CLOSE_USE_REST:
+            raise SocketRejected() from e
+        raise
+    if ready.get('type') != 'ready':
+        raise RuntimeError(f"WebSocket kimlik doğrulaması başarısız: {ready}")
+    return ws
+
+
+def run_rest(base_url, users, messages, message):
+    latencies, statuses = [], {}
+    lock = threading.Lock()
+
+    def user_loop(user):
+        for _ in range(messages):
+            started = time.perf_counter()
+            status = load_chat.post_json(f"{base_url}/api/chat", {'message': message, 'chat_id': user['chat_id']},
+                                         user['token'], user['ip'])
+            with lock:
+                latencies.append(time.perf_counter() - started)
+                statuses[status] = statuses.get(status, 0) + 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=len(users)) as pool:
+        list(pool.map(user_loop, users))
+    return load_chat.summarize(latencies, statuses, time.perf_counter() - started)
+
+
+def run_ws(base_url, users, messages, message):
+    latencies, first_delta, statuses = [], [], {}
+    lock = threading.Lock()
+
+    def user_loop(user):
+        try:
+            ws = open_socket(base_url, user)
+        except SocketRejected:
+            with lock:
+                statuses['ws_rejected'] = statuses.get('ws_rejected', 0) + 1
+            return
+        try:
+            for i in range(messages):
+                started = time.perf_counter()
+                ws.send(json.dumps({'type': 'send', 'id': i, 'chat_id': user['chat_id'], 'message': message}))
+                first = None
+                while True:
+                    frame = json.loads(ws.receive(timeout=120))
+                    if frame.get('id') != i:
+                        continue
+                    if frame['type'] == 'delta' and first is None:
+                        first = time.perf_counter() - started
+                    if frame['type'] in ('done', 'error'):
+                        break
+                with lock:
+                    latencies.append(time.perf_counter() - started)
+                    if first is not None:
+                        first_delta.append(first)
+                    key = 200 if frame['type'] == 'done' else frame.get('code')
+                    statuses[key] = statuses.get(key, 0) + 1
+        finally:
+            ws.close()
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=len(users)) as pool:
+        list(pool.map(user_loop, users))
+    result = load_chat.summarize(latencies, statuses, time.perf_counter() - started)
+    first_delta.sort()
+    if first_delta:
+        result['first_delta_p50_ms'] = round(first_delta[len(first_delta) // 2] * 1000, 1)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--url', default='http://localhost:5000')
+    parser.add_argument('--db', default='pahiy_ai.db')
+    parser.add_argument('--users', type=int, default=20)
+    parser.add_argument('--messages', type=int, default=10, help='kullanıcı başına mesaj')
+    parser.add_argument('--idle', type=int, default=0, help='boşta tutulacak ek bağlantı')
+    parser.add_argument('--fake-latency', type=float, default=float(os.environ.get('GENAI_FAKE_LATENCY', 0.2)))
+    args = parser.parse_args()
+
+    db = Database(args.db)
+    message = 'Merhaba, bu bir yük testi mesajıdır.'
+
+    idle_sockets, idle_rejected = [], 0
+    idle_health_ms = None
+    if args.idle:
+        for user in load_chat.create_users(db, args.idle, prefix='idle'):
+            try:
+                idle_sockets.append(open_socket(args.url, user))
+            except SocketRejected:
+                idle_rejected += 1
+            except Exception as e:
+                print(f"boşta bağlantı açılamadı: {e}")
+                break
+        print(f"boşta açık bağlantı: {len(idle_sockets)}, kapasite dolu (REST'e geçen): {idle_rejected}")
+        # Soketler thread tutarken REST hâlâ yanıt veriyor mu
+        started = time.perf_counter()
+        with urllib.request.urlopen(f"{args.url}/api/health", timeout=30) as response:
+            response.read()
+        idle_health_ms = round((time.perf_counter() - started) * 1000, 1)
+        print(f"bağlantılar açıkken /api/health: {idle_health_ms} ms")
+
+    results = {
+        'rest': run_rest(args.url, load_chat.create_users(db, args.users, prefix='rest'), args.messages, message),
+        'ws': run_ws(args.url, load_chat.create_users(db, args.users, prefix='ws'), args.messages, message),
+    }
+    for result in results.values():
+        result['overhead_p50_ms'] = round(result['p50_ms'] - args.fake_latency * 1000, 1)
+
+    if idle_sockets:
+        alive = 0
+        for ws in idle_sockets:
+            try:
+                ws.send(json.dumps({'type': 'ping'}))
+                alive += json.loads(ws.receive(timeout=10)).get('type') == 'pong'
+            except Exception:
+                pass
+            ws.close()
+        results['idle_alive'] = alive
+    if args.idle:
+        results['idle_rejected'] = idle_rejected
+        results['idle_health_ms'] = idle_health_ms
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
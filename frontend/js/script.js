@@ -6,6 +6,42 @@ let currentChatId = null;
 let authToken = null;
 let chatToDelete = null;
 
+// WebSocket: tek bağlantı, tüm chatler (yoksa REST'e düşülür)
+let socket = null;
+let socketReady = false;
+let socketSeq = 0;
+let socketFailures = 0;
+// Sunucu kapasitesi dolunca bu kodla kapatır (backend/app.py WS_CLOSE_USE_REST)
+const WS_CLOSE_USE_REST = 4429;
+const socketStreams = {};
+
+// REST mesaj gönderiminde bağlantı hatası / 409 (ilk deneme sürüyor) sonrası bekleme süreleri (ms);
+// toplamı sunucunun model zaman aşımından (GENAI_TIMEOUT) uzun tutulur
+const CHAT_RETRY_DELAYS = [1000, 2000, 4000, 8000, 15000];
+
+// Kenar çubuğu: chat id -> { element, signature } (liste yenilenince yalnızca değişenler güncellenir)
+const chatItems = new Map();
+
+// Mesaj listesi: tüm mesajlar bellekte, DOM'da yalnızca görünen pencere (+ MESSAGE_OVERSCAN)
+const MESSAGE_OVERSCAN = 8;
+const ESTIMATED_MESSAGE_HEIGHT = 120;
+const messageList = {
+    items: [],
+    start: 0,
+    end: 0,
+    top: null,
+    bottom: null,
+    gap: 0,
+    stickToBottom: true,
+    renderQueued: false,
+    chatId: null
+};
+
+// Yerel önbellek (IndexedDB): chatler ve mesajlar anında gösterilir, sunucudan yalnızca
+// son senkronizasyon sırasından (seq) sonraki değişiklikler çekilir
+const CACHE_VERSION = 1;
+let cacheDb = null;
+
 // ================== INIT ==================
 document.addEventListener('DOMContentLoaded', function() {
     // Auth kontrolü
@@ -25,6 +61,12 @@ document.addEventListener('DOMContentLoaded', function() {
         this.style.height = Math.min(this.scrollHeight, 120) + 'px';
     });
     
+    document.getElementById('messagesContainer').addEventListener('scroll', function() {
+        // Kullanıcı yukarı kaydırdıysa yeni mesajlar onu en alta çekmez
+        messageList.stickToBottom = this.scrollHeight - this.scrollTop - this.clientHeight < 40;
+        scheduleMessageRender();
+    }, { passive: true });
+    
     messageInput.addEventListener('keydown', function(e) {
         if (e.key === 'Enter' && !e.shiftKey) {
             e.preventDefault();
@@ -61,6 +103,7 @@ async function loadCurrentUser() {
 
             // Chatları yükle
             loadChats();
+            connectSocket();
         } else {
             // Token geçersiz
             localStorage.removeItem('auth_token');
@@ -74,12 +117,19 @@ async function loadCurrentUser() {
 }
 
 function logout() {
+    if (socket) {
+        socket.onclose = null;
+        socket.close();
+    }
     fetch(`${getBackendURL()}/api/logout`, {
         method: 'POST',
         headers: {
             'Authorization': `Bearer ${authToken}`
         }
     }).finally(() => {
+        // Paylaşılan bilgisayarda sohbetler tarayıcıda kalmasın
+        if (cacheDb) cacheDb.close();
+        if (window.indexedDB && currentUser) indexedDB.deleteDatabase(cacheName());
         localStorage.removeItem('auth_token');
         localStorage.removeItem('user');
         window.location.href = '/';
@@ -91,28 +141,99 @@ function toggleUserMenu() {
     userMenu.classList.toggle('show');
 }
 
+// ================== LOCAL CACHE ==================
+function cacheName() {
+    return `pahiy-cache-${currentUser.id}`;
+}
+
+// IndexedDB yoksa veya açılamazsa (gizli mod, kota) null döner; her şey sunucudan yüklenir
+function openCache() {
+    if (cacheDb || !window.indexedDB || !currentUser) return Promise.resolve(cacheDb);
+    return new Promise(resolve => {
+        const request = indexedDB.open(cacheName(), CACHE_VERSION);
+        request.onupgradeneeded = () => {
+            const idb = request.result;
+            idb.createObjectStore('meta', { keyPath: 'key' });
+            idb.createObjectStore('chats', { keyPath: 'id' });
+            idb.createObjectStore('messages', { keyPath: 'chat_id' });
+        };
+        request.onsuccess = () => {
+            cacheDb = request.result;
+            resolve(cacheDb);
+        };
+        request.onerror = () => resolve(null);
+        request.onblocked = () => resolve(null);
+    });
+}
+
+async function cacheGet(store, key) {
+    const idb = await openCache();
+    if (!idb) return null;
+    return new Promise(resolve => {
+        const request = idb.transaction(store).objectStore(store).get(key);
+        request.onsuccess = () => resolve(request.result || null);
+        request.onerror = () => resolve(null);
+    });
+}
+
+async function cacheGetAll(store) {
+    const idb = await openCache();
+    if (!idb) return [];
+    return new Promise(resolve => {
+        const request = idb.transaction(store).objectStore(store).getAll();
+        request.onsuccess = () => resolve(request.result);
+        request.onerror = () => resolve([]);
+    });
+}
+
+// { store: { clear, put: [...], delete: [...] } } değişikliklerini tek transaction'da yaz
+async function cacheWrite(changes) {
+    const idb = await openCache();
+    if (!idb) return;
+    const tx = idb.transaction(Object.keys(changes), 'readwrite');
+    Object.entries(changes).forEach(([name, change]) => {
+        const store = tx.objectStore(name);
+        if (change.clear) store.clear();
+        (change.delete || []).forEach(key => store.delete(key));
+        (change.put || []).forEach(value => store.put(value));
+    });
+    return new Promise(resolve => {
+        tx.oncomplete = resolve;
+        tx.onerror = tx.onabort = () => resolve();
+    });
+}
+
 // ================== CHAT MANAGEMENT ==================
 async function loadChats() {
+    // Önbellekteki liste ilk açılışta sunucuyu beklemeden gösterilir
+    if (chatItems.size === 0) {
+        const cached = await cacheGetAll('chats');
+        if (cached.length > 0) {
+            displayChats(sortChats(cached));
+        }
+    }
+
     try {
-        const response = await fetch(`${getBackendURL()}/api/chats`, {
+        const meta = await cacheGet('meta', 'chats');
+        const response = await fetch(`${getBackendURL()}/api/sync?since=${meta ? meta.seq : 0}`, {
             headers: {
                 'Authorization': `Bearer ${authToken}`
             }
         });
 
         if (response.ok) {
-            const data = await response.json();
-            displayChats(data.chats);
+            const chats = await applyChatChanges(await response.json());
+            displayChats(chats);
 
             // Eğer chat yoksa, welcome screen göster
-            if (data.chats.length === 0) {
+            if (chats.length === 0) {
                 showWelcomeScreen();
             } else if (currentChatId) {
                 // Eğer bir chat seçiliyse onu aç
                 selectChat(currentChatId);
             } else {
                 // Hiç chat seçili değilse, ilk chat'i aç
-                selectChat(data.chats[0].id);
+                selectChat(chats[0].id);
             }
         }
     } catch (error) {
@@ -121,6 +242,32 @@ async function loadChats() {
     }
 }
 
+// Sunucudan gelen değişiklikleri önbelleğe işle, güncel listeyi döndür
+async function applyChatChanges(data) {
+    const byId = new Map();
+    if (!data.reset) {
+        (await cacheGetAll('chats')).forEach(chat => byId.set(chat.id, chat));
+    }
+    data.chats.forEach(chat => byId.set(chat.id, chat));
+
+    // Başka cihazdan silinen chatler: sunucudaki id listesinde olmayanlar
+    const live = new Set(data.chat_ids);
+    const removed = [...byId.keys()].filter(id => !live.has(id));
+    removed.forEach(id => byId.delete(id));
+
+    const chats = sortChats([...byId.values()]);
+    await cacheWrite({
+        meta: { put: [{ key: 'chats', seq: data.seq }] },
+        chats: { clear: true, put: chats },
+        messages: { delete: removed }
+    });
+    return chats;
+}
+
+function sortChats(chats) {
+    return chats.sort((a, b) => new Date(b.updated_at) - new Date(a.updated_at));
+}
+
 function showWelcomeScreen() {
     const messagesContainer = document.getElementById('messagesContainer');
     const fullName = currentUser ? `${currentUser.first_name} ${currentUser.last_name}` : 'Kullanıcı';
@@ -135,42 +282,66 @@ function showWelcomeScreen() {
         </div>
     `;
     currentChatId = null;
+    messageList.chatId = null;
 }
 
 function displayChats(chats) {
     const chatList = document.getElementById('chatList');
     
     if (chats.length === 0) {
+        chatItems.clear();
         chatList.innerHTML = '<div class="loading">Henüz sohbet yok</div>';
         return;
     }
 
-    chatList.innerHTML = '';
-    
+    // Yükleniyor / boş liste yazısı
+    chatList.querySelectorAll(':scope > :not(.chat-item)').forEach(node => node.remove());
+
+    const seen = new Set();
+    let next = chatList.firstElementChild;
     chats.forEach(chat => {
-        const chatItem = document.createElement('div');
-        chatItem.className = 'chat-item';
-        if (chat.id === currentChatId) {
-            chatItem.classList.add('active');
-        }
-        chatItem.onclick = () => selectChat(chat.id);
+        seen.add(chat.id);
+        const dateStr = formatDate(new Date(chat.updated_at));
+        const signature = [chat.title, chat.last_message_preview, chat.message_count, dateStr].join('\u0000');
 
-        const date = new Date(chat.updated_at);
-        const dateStr = formatDate(date);
+        let entry = chatItems.get(chat.id);
+        if (!entry) {
+            const element = document.createElement('div');
+            element.className = 'chat-item';
+            element.onclick = () => selectChat(chat.id);
+            entry = { element: element, signature: null };
+            chatItems.set(chat.id, entry);
+        }
+        if (entry.signature !== signature) {
+            entry.signature = signature;
+            entry.element.innerHTML = `
+                <div class="chat-item-content">
+                    <div class="chat-item-title">${escapeHtml(chat.title)}</div>
+                    ${chat.last_message_preview ? `<div class="chat-item-preview">${escapeHtml(chat.last_message_preview)}</div>` : ''}
+                    <div class="chat-item-date">${dateStr}${chat.message_count ? ` · ${chat.message_count} mesaj` : ''}</div>
+                </div>
+                <div class="chat-item-actions">
+                    <button class="chat-action-btn delete" onclick="event.stopPropagation(); deleteChat('${chat.id}')" title="Sil">
+                        <i class="fas fa-trash"></i>
+                    </button>
+                </div>
+            `;
+        }
+        entry.element.classList.toggle('active', chat.id === currentChatId);
 
-        chatItem.innerHTML = `
-            <div class="chat-item-content">
-                <div class="chat-item-title">${escapeHtml(chat.title)}</div>
-                <div class="chat-item-date">${dateStr}</div>
-            </div>
-            <div class="chat-item-actions">
-                <button class="chat-action-btn delete" onclick="event.stopPropagation(); deleteChat('${chat.id}')" title="Sil">
-                    <i class="fas fa-trash"></i>
-                </button>
-            </div>
-        `;
+        // Sırası değişmeyen öğeler yerinden oynatılmaz
+        if (entry.element === next) {
+            next = next.nextElementSibling;
+        } else {
+            chatList.insertBefore(entry.element, next);
+        }
+    });
 
-        chatList.appendChild(chatItem);
+    chatItems.forEach((entry, id) => {
+        if (!seen.has(id)) {
+            entry.element.remove();
+            chatItems.delete(id);
+        }
     });
 }
 
@@ -178,10 +349,7 @@ async function selectChat(chatId) {
     currentChatId = chatId;
     
     // UI güncelle
-    document.querySelectorAll('.chat-item').forEach(item => {
-        item.classList.remove('active');
-    });
-    event?.target?.closest('.chat-item')?.classList.add('active');
+    chatItems.forEach((entry, id) => entry.element.classList.toggle('active', id === chatId));
 
     // Mesajları yükle
     await loadChatMessages(chatId);
@@ -189,10 +357,19 @@ async function selectChat(chatId) {
 
 async function loadChatMessages(chatId) {
     const messagesContainer = document.getElementById('messagesContainer');
-    messagesContainer.innerHTML = '<div class="loading">Yükleniyor</div>';
+    const cached = await cacheGet('messages', chatId);
+
+    // Zaten gösterilen chat yeniden çizilmez; yalnızca değişiklik varsa güncellenir
+    if (messageList.chatId !== chatId) {
+        if (cached) {
+            renderMessages(cached.items);
+        } else {
+            messagesContainer.innerHTML = '<div class="loading">Yükleniyor</div>';
+        }
+    }
 
     try {
-        const response = await fetch(`${getBackendURL()}/api/chats/${chatId}`, {
+        const response = await fetch(`${getBackendURL()}/api/chats/${chatId}/sync?since=${cached ? cached.seq : 0}`, {
             headers: {
                 'Authorization': `Bearer ${authToken}`
             }
@@ -200,27 +377,43 @@ async function loadChatMessages(chatId) {
 
         if (response.ok) {
             const data = await response.json();
-            messagesContainer.innerHTML = '';
-
-            if (data.messages.length === 0) {
-                messagesContainer.innerHTML = `
-                    <div class="welcome-message">
-                        <h2>Merhaba ${currentUser.username}!</h2>
-                        <p>Size nasıl yardımcı olabilirim?</p>
-                    </div>
-                `;
-            } else {
-                data.messages.forEach(msg => {
-                    addMessageToUI(msg.role, msg.content, msg.timestamp);
-                });
+            let items = data.messages;
+            if (cached && !data.reset) {
+                const known = new Set(cached.items.map(msg => msg.id));
+                items = cached.items.concat(data.messages.filter(msg => !known.has(msg.id)));
             }
+            const changed = !cached || data.reset || data.messages.length > 0;
+            await cacheWrite({ messages: { put: [{ chat_id: chatId, seq: data.chat.seq, items: items }] } });
 
-            scrollToBottom();
+            if (chatId === currentChatId && (changed || messageList.chatId !== chatId)) {
+                renderMessages(items);
+            }
         }
     } catch (error) {
         console.error('Load messages error:', error);
-        messagesContainer.innerHTML = '<div class="error">Mesajlar yüklenemedi</div>';
+        if (!cached && chatId === currentChatId) {
+            messagesContainer.innerHTML = '<div class="error">Mesajlar yüklenemedi</div>';
+        }
+    }
+}
+
+function renderMessages(messages) {
+    const messagesContainer = document.getElementById('messagesContainer');
+    messageList.chatId = currentChatId;
+
+    if (messages.length === 0) {
+        messageList.items = [];
+        messagesContainer.innerHTML = `
+            <div class="welcome-message">
+                <h2>Merhaba ${currentUser.username}!</h2>
+                <p>Size nasıl yardımcı olabilirim?</p>
+            </div>
+        `;
+        return;
     }
+
+    resetMessageList(messages.map(msg => createMessageItem(msg.role, msg.content, msg.timestamp)));
+    scrollToBottom();
 }
 
 async function createNewChat() {
@@ -328,20 +521,16 @@ async function sendMessage() {
     // Send button'u devre dışı bırak
     const sendBtn = document.getElementById('sendBtn');
     sendBtn.disabled = true;
+
+    if (socketReady) {
+        const id = ++socketSeq;
+        socketStreams[id] = { chatId: currentChatId, message: message, item: null, text: '' };
+        socket.send(JSON.stringify({ type: 'send', id: id, chat_id: currentChatId, message: message }));
+        return;
+    }
     
     try {
-        const response = await fetch(`${getBackendURL()}/api/chat`, {
-            method: 'POST',
-            headers: {
-                'Authorization': `Bearer ${authToken}`,
-                'Content-Type': 'application/json'
-            },
-            body: JSON.stringify({
-                message: message,
-                chat_id: currentChatId
-            })
-        });
-
+        const response = await postChatMessage(message, currentChatId);
         const data = await response.json();
         
         hideTyping();
@@ -351,10 +540,18 @@ async function sendMessage() {
             // AI yanıtını UI'a ekle
             addMessageToUI('ai', data.response);
             
-            // Chat listesini güncelle
-            loadChats();
+            // Chat listesini güncelle (başlık arka planda üretiliyorsa hazır olunca)
+            if (data.title_pending) {
+                waitForChatsVersion(data.chats_version);
+            } else {
+                loadChats();
+            }
         } else {
             showNotification(data.error || 'Mesaj gönderilemedi', 'error');
+            // Geçici model hatalarında mesajı tekrar göndermek için input'a geri koy
+            if (data.retryable && !messageInput.value) {
+                messageInput.value = message;
+            }
         }
         
     } catch (error) {
@@ -365,31 +562,328 @@ async function sendMessage() {
     }
 }
 
+// Mesajı gönder; bağlantı koparsa ya da ilk deneme hâlâ işleniyorsa (409) aynı anahtarla tekrar dene.
+// Anahtar mesaj başına bir kez üretilir: sunucu mesajı iki kez işlemez, tamamlanan denemenin yanıtını döner
+async function postChatMessage(message, chatId) {
+    const idempotencyKey = crypto.randomUUID ? crypto.randomUUID() : `${Date.now()}-${Math.random().toString(36).slice(2)}`;
+
+    for (let attempt = 0; ; attempt++) {
+        try {
+            const response = await fetch(`${getBackendURL()}/api/chat`, {
+                method: 'POST',
+                headers: {
+                    'Authorization': `Bearer ${authToken}`,
+                    'Content-Type': 'application/json',
+                    'Idempotency-Key': idempotencyKey
+                },
+                body: JSON.stringify({
+                    message: message,
+                    chat_id: chatId
+                })
+            });
+            if (response.status !== 409 || attempt >= CHAT_RETRY_DELAYS.length) {
+                return response;
+            }
+        } catch (error) {
+            if (attempt >= CHAT_RETRY_DELAYS.length) throw error;
+            console.warn('Send message retry:', error);
+        }
+        await new Promise(resolve => setTimeout(resolve, CHAT_RETRY_DELAYS[attempt]));
+    }
+}
+
+// Sunucudaki chat listesi sürümü artana kadar kısa aralıklarla yokla, sonra listeyi yenile
+async function waitForChatsVersion(knownVersion) {
+    loadChats();
+    for (const delay of [300, 600, 1200, 2400, 4800]) {
+        await new Promise(resolve => setTimeout(resolve, delay));
+        try {
+            const response = await fetch(`${getBackendURL()}/api/chats/version`, {
+                headers: { 'Authorization': `Bearer ${authToken}` }
+            });
+            const data = await response.json();
+            if (response.ok && data.version > knownVersion) {
+                loadChats();
+                return;
+            }
+        } catch (error) {
+            console.error('Chat version error:', error);
+            return;
+        }
+    }
+}
+
+// ================== WEBSOCKET ==================
+function connectSocket() {
+    if (!('WebSocket' in window) || socket) return;
+
+    socket = new WebSocket(getBackendURL().replace(/^http/, 'ws') + '/ws');
+    socket.onopen = () => socket.send(JSON.stringify({ type: 'auth', token: authToken }));
+    socket.onmessage = (event) => handleSocketFrame(JSON.parse(event.data));
+    socket.onclose = (event) => {
+        socket = null;
+        socketReady = false;
+        // Yarıda kalan akışlar REST'teki bağlantı hatası gibi sonlanır
+        Object.keys(socketStreams).forEach(id => finishStream(id));
+        // Worker'ın soket kapasitesi dolu: şimdilik REST, bir süre sonra yeniden dene
+        if (event.code === WS_CLOSE_USE_REST) {
+            setTimeout(connectSocket, 60000 * (0.5 + Math.random()));
+            return;
+        }
+        // Sunucu WebSocket desteklemiyorsa birkaç denemeden sonra REST ile devam edilir
+        socketFailures++;
+        if (socketFailures <= 5) {
+            setTimeout(connectSocket, Math.min(30000, 1000 * 2 ** socketFailures) * (0.5 + Math.random()));
+        }
+    };
+}
+
+function finishStream(id) {
+    delete socketStreams[id];
+    if (Object.keys(socketStreams).length === 0) {
+        hideTyping();
+        document.getElementById('sendBtn').disabled = false;
+    }
+}
+
+function handleSocketFrame(frame) {
+    const stream = frame.id !== undefined ? socketStreams[frame.id] : null;
+
+    switch (frame.type) {
+        case 'ready':
+            socketReady = true;
+            socketFailures = 0;
+            break;
+
+        case 'delta':
+            if (!stream || stream.chatId !== currentChatId) break;
+            if (!stream.item) {
+                hideTyping();
+                stream.item = addMessageToUI('ai', '');
+            }
+            stream.text += frame.text;
+            updateMessage(stream.item, stream.text, true);
+            break;
+
+        case 'done':
+            if (stream && stream.chatId === currentChatId) {
+                if (!stream.item) {
+                    stream.item = addMessageToUI('ai', '');
+                }
+                updateMessage(stream.item, frame.response);
+            }
+            if (!frame.title_pending) {
+                // Başlık gerekmiyorsa sıra/önizleme için listeyi iste; başlık gelince sunucu kendisi gönderir
+                socket.send(JSON.stringify({ type: 'chats' }));
+            }
+            finishStream(frame.id);
+            break;
+
+        case 'chats':
+            displayChats(frame.chats);
+            break;
+
+        case 'history':
+            if (frame.chat.id === currentChatId) {
+                renderMessages(frame.messages);
+            }
+            break;
+
+        case 'error':
+            if (frame.code === 'auth_required') {
+                socketFailures = 99;
+                break;
+            }
+            showNotification(frame.error || 'Mesaj gönderilemedi', 'error');
+            if (stream) {
+                const messageInput = document.getElementById('messageInput');
+                if (frame.retryable && !messageInput.value) {
+                    messageInput.value = stream.message;
+                }
+                finishStream(frame.id);
+            }
+            break;
+    }
+}
+
+// Yeni mesajı listenin sonuna ekle; akış güncellemeleri için mesaj kaydını döndürür
 function addMessageToUI(role, content, timestamp = null) {
-    const messagesContainer = document.getElementById('messagesContainer');
+    // Welcome / yükleniyor ekranı yerine boş liste kur
+    if (!messageList.top || !messageList.top.isConnected) {
+        resetMessageList([]);
+    }
+
+    const item = createMessageItem(role, content, timestamp || new Date());
+    item.animate = true;
+    messageList.items.push(item);
     
-    // Welcome message'ı kaldır
-    const welcomeMessage = messagesContainer.querySelector('.welcome-message');
-    if (welcomeMessage) {
-        welcomeMessage.remove();
+    scrollToBottom();
+    return item;
+}
+
+function updateMessage(item, content, isText = false) {
+    item.content = content;
+    item.isText = isText;
+    if (item.element) {
+        const contentDiv = item.element.querySelector('.message-content');
+        if (isText) {
+            contentDiv.textContent = content;
+        } else {
+            contentDiv.innerHTML = content;
+        }
     }
+    scheduleMessageRender();
+}
+
+// ================== MESSAGE LIST ==================
+function createMessageItem(role, content, timestamp) {
+    return { role: role, content: content, timestamp: timestamp, isText: false, height: 0, element: null, animate: false };
+}
+
+function resetMessageList(items) {
+    const container = document.getElementById('messagesContainer');
+    container.innerHTML = '';
+    messageList.top = document.createElement('div');
+    messageList.bottom = document.createElement('div');
+    messageList.top.className = 'message-spacer';
+    messageList.bottom.className = 'message-spacer';
+    container.append(messageList.top, messageList.bottom);
+
+    messageList.items = items;
+    messageList.start = 0;
+    messageList.end = 0;
+    messageList.gap = parseFloat(getComputedStyle(container).rowGap) || 0;
+    messageList.stickToBottom = true;
+    scheduleMessageRender();
+}
 
+function mountMessage(item) {
     const messageDiv = document.createElement('div');
-    messageDiv.className = `message ${role}`;
-    
-    const time = timestamp 
-        ? new Date(timestamp).toLocaleTimeString('tr-TR', { hour: '2-digit', minute: '2-digit' })
-        : new Date().toLocaleTimeString('tr-TR', { hour: '2-digit', minute: '2-digit' });
+    messageDiv.className = `message ${item.role}`;
     
+    const time = new Date(item.timestamp).toLocaleTimeString('tr-TR', { hour: '2-digit', minute: '2-digit' });
     messageDiv.innerHTML = `
-        <div class="message-content">${content}</div>
+        <div class="message-content"></div>
         <div class="message-time">${time}</div>
     `;
-    
-    messagesContainer.appendChild(messageDiv);
-    messageDiv.style.animation = 'messageSlide 0.4s ease';
-    
-    scrollToBottom();
+    const contentDiv = messageDiv.firstElementChild;
+    if (item.isText) {
+        contentDiv.textContent = item.content;
+    } else {
+        contentDiv.innerHTML = item.content;
+    }
+
+    // Giriş animasyonu yalnızca yeni eklenen mesajda; kaydırmayla geri gelenlerde değil
+    messageDiv.style.animation = item.animate ? 'messageSlide 0.4s ease' : 'none';
+    item.animate = false;
+    item.element = messageDiv;
+    return messageDiv;
+}
+
+// Aynı karede gelen tüm kaydırma / ekleme / akış güncellemeleri tek çizimde birleşir
+function scheduleMessageRender() {
+    if (messageList.renderQueued) return;
+    messageList.renderQueued = true;
+    requestAnimationFrame(renderMessageWindow);
+}
+
+function renderMessageWindow() {
+    messageList.renderQueued = false;
+    const container = document.getElementById('messagesContainer');
+    const items = messageList.items;
+    if (!messageList.top || !messageList.top.isConnected) return;
+
+    // 1. DOM'daki mesajları ölç; görünenin üstündeki yükseklik değişimi kadar kaydırmayı düzelt
+    let anchorShift = 0;
+    let offset = 0;
+    for (let i = 0; i < messageList.end; i++) {
+        const item = items[i];
+        if (i >= messageList.start && item.element) {
+            const style = getComputedStyle(item.element);
+            const height = item.element.offsetHeight + (parseFloat(style.marginBottom) || 0) + messageList.gap;
+            if (item.height !== height && offset < container.scrollTop) {
+                anchorShift += height - (item.height || ESTIMATED_MESSAGE_HEIGHT);
+            }
+            item.height = height;
+        }
+        offset += item.height || ESTIMATED_MESSAGE_HEIGHT;
+    }
+    if (anchorShift && !messageList.stickToBottom) {
+        container.scrollTop += anchorShift;
+    }
+
+    // 2. Görünen aralığı bul
+    const viewTop = container.scrollTop;
+    const viewBottom = messageList.stickToBottom ? Infinity : viewTop + container.clientHeight;
+    let first = items.length;
+    let last = items.length;
+    offset = 0;
+    for (let i = 0; i < items.length; i++) {
+        const height = items[i].height || ESTIMATED_MESSAGE_HEIGHT;
+        if (first === items.length && offset + height > viewTop) {
+            first = i;
+        }
+        if (offset >= viewBottom) {
+            last = i;
+            break;
+        }
+        offset += height;
+    }
+    if (messageList.stickToBottom) {
+        // En altta: son mesajlardan ekranı dolduracak kadarı
+        let filled = 0;
+        first = items.length;
+        while (first > 0 && filled < container.clientHeight) {
+            first--;
+            filled += items[first].height || ESTIMATED_MESSAGE_HEIGHT;
+        }
+    }
+    const start = Math.max(0, first - MESSAGE_OVERSCAN);
+    const end = Math.min(items.length, last + MESSAGE_OVERSCAN);
+
+    // 3. Pencere dışına çıkanları kaldır, girenleri sırasıyla yerleştir
+    for (let i = messageList.start; i < messageList.end; i++) {
+        if ((i < start || i >= end) && items[i] && items[i].element) {
+            items[i].element.remove();
+            items[i].element = null;
+        }
+    }
+    let mounted = false;
+    let next = messageList.bottom;
+    for (let i = end - 1; i >= start; i--) {
+        const item = items[i];
+        if (!item.element) {
+            mountMessage(item);
+            mounted = true;
+        }
+        if (item.element.nextSibling !== next) {
+            container.insertBefore(item.element, next);
+        }
+        next = item.element;
+    }
+    messageList.start = start;
+    messageList.end = end;
+
+    // 4. Boşluklar DOM'da olmayan mesajların yerini tutar (flex gap boşluğun kendisine de eklenir)
+    let above = 0;
+    let below = 0;
+    for (let i = 0; i < start; i++) above += items[i].height || ESTIMATED_MESSAGE_HEIGHT;
+    for (let i = end; i < items.length; i++) below += items[i].height || ESTIMATED_MESSAGE_HEIGHT;
+    setSpacer(messageList.top, above);
+    setSpacer(messageList.bottom, below);
+
+    if (messageList.stickToBottom) {
+        container.scrollTop = container.scrollHeight;
+    }
+    // Yeni yerleşenler bir sonraki karede ölçülür
+    if (mounted) {
+        scheduleMessageRender();
+    }
+}
+
+function setSpacer(spacer, height) {
+    spacer.style.display = height > 0 ? 'block' : 'none';
+    spacer.style.height = `${Math.max(0, height - messageList.gap)}px`;
 }
 
 // ================== UI HELPERS ==================
@@ -405,12 +899,13 @@ function hideTyping() {
 }
 
 function scrollToBottom() {
-    const container = document.getElementById('messagesContainer');
-    container.scrollTop = container.scrollHeight;
-    
-    setTimeout(() => {
+    messageList.stickToBottom = true;
+    if (messageList.top && messageList.top.isConnected) {
+        scheduleMessageRender();
+    } else {
+        const container = document.getElementById('messagesContainer');
         container.scrollTop = container.scrollHeight;
-    }, 10);
+    }
 }
 
 function showNotification(message, type = 'info') {
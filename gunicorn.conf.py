@@ -0,0 +1,82 @@
+"""
+Gunicorn sunucu profili
+
+    gunicorn -c gunicorn.conf.py backend.app:app
+
+Ortam değişkenleri:
+    GUNICORN_WORKER_MODEL  gthread (varsayılan) | gevent | eventlet | sync
+    GUNICORN_WORKERS       worker sayısı (varsayılan CPU sayısına göre)
+    GUNICORN_THREADS       gthread için worker başına thread sayısı
+    GENAI_TIMEOUT          model deadline'ı; worker timeout'ları buna göre ayarlanır
+"""
+import gc
+import importlib
+import multiprocessing
+import os
+
+# app.py modülleri backend/ içinden düz import ediyor
+ROOT = os.path.dirname(os.path.abspath(__file__))
+pythonpath = f"{ROOT},{os.path.join(ROOT, 'backend')}"
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 5000)}"
+
+cpu_count = multiprocessing.cpu_count()
+worker_model = os.environ.get('GUNICORN_WORKER_MODEL', 'gthread')
+
+if worker_model == 'gthread':
+    # İstekler çoğunlukla model çağrısını bekliyor (I/O), thread'ler ucuz
+    worker_class = 'gthread'
+    workers = int(os.environ.get('GUNICORN_WORKERS', cpu_count + 1))
+    threads = int(os.environ.get('GUNICORN_THREADS', 8))
+elif worker_model in ('gevent', 'eventlet'):
+    # Greenlet tabanlı async worker; az sayıda süreç, çok sayıda bağlantı
+    worker_class = worker_model
+    workers = int(os.environ.get('GUNICORN_WORKERS', cpu_count))
+    worker_connections = int(os.environ.get('GUNICORN_WORKER_CONNECTIONS', 1000))
+else:
+    worker_class = 'sync'
+    workers = int(os.environ.get('GUNICORN_WORKERS', cpu_count * 2 + 1))
+
+# Uygulama master'da bir kez yüklenir, worker'lar copy-on-write ile paylaşır.
+# gevent/eventlet monkey patch'i fork sonrası yapıldığı için preload kapalı.
+preload_app = worker_class in ('gthread', 'sync')
+
+# Model deadline'ı + pay; uzun LLM çağrıları worker'ı öldürtmesin
+model_timeout = float(os.environ.get('GENAI_TIMEOUT', 30))
+timeout = int(model_timeout + 15)
+graceful_timeout = int(model_timeout + 5)
+keepalive = 5
+
+# Bellek sızıntılarına karşı worker'ları periyodik olarak yenile
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 1000))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', 100))
+
+# Heartbeat dosyası disk yerine bellekte
+if os.path.isdir('/dev/shm'):
+    worker_tmp_dir = '/dev/shm'
+
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG', '-')
+
+
+def on_starting(server):
+    """Şema kontrolü master'da bir kez yapılır, worker'lar atlar"""
+    if preload_app:
+        # create_app() master'da zaten çalıştı
+        return
+    from storage import create_storage
+    create_storage()
+    os.environ['PAHIY_SCHEMA_READY'] = '1'
+
+
+def pre_fork(server, worker):
+    # Preload edilen nesneleri GC taramasından çıkar; refcount dışı sayfa
+    # yazımları azalır ve copy-on-write paylaşımı korunur
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    if preload_app:
+        # Sunulan modül (backend.app) sıfırlanmalı; düz "import app" backend/
+        # yolundan ikinci bir kopya yükler ve create_app()'i yeniden çalıştırır
+        module = importlib.import_module(getattr(server.app, 'app_uri', 'backend.app:app').split(':')[0])
+        module.reinit_after_fork()
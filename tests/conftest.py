@@ -0,0 +1,8 @@
+import os
+import sys
+
+# Modüller backend/ içinden düz import ediliyor (gunicorn.conf.py pythonpath'i gibi)
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for path in (ROOT, os.path.join(ROOT, 'backend')):
+    if path not in sys.path:
+        sys.path.insert(0, path)
@@ -0,0 +1,98 @@
+"""
+Yedekleme aracı: yedek alma, manifest ve geri yükleme güvenlik kontrolleri
+"""
+import os
+import sys
+
+import pytest
+
+import backup_tool
+from backup_tool import create_snapshot, restore_snapshot, verify_snapshot, RestoreRefused
+from database import Database
+from kv import MemoryKV
+
+
+@pytest.fixture
+def backup_dir(tmp_path):
+    return str(tmp_path / 'backups')
+
+
+def add_user(db, name):
+    user_id, _ = db.create_user('Yedek', 'Deneme', name, f'{name}@example.com', 'parola123')
+    return user_id
+
+
+def test_manifest_records_per_file_copy_times(tmp_path, backup_dir):
+    db = Database(str(tmp_path / 'app.db'), shard_count=2)
+    add_user(db, 'ayse')
+    name, manifest = create_snapshot(db, backup_dir, pages=-1, sleep=0)
+    assert manifest['consistency'] == 'per-file'
+    assert [entry['name'] for entry in manifest['files']] == ['app.db', 'app.shard1.db']
+    assert all(entry['copied_at'] for entry in manifest['files'])
+    assert verify_snapshot(name, manifest, backup_dir) == []
+
+
+def test_restore_round_trip_clears_kv(tmp_path, backup_dir):
+    db = Database(str(tmp_path / 'app.db'), shard_count=2)
+    ayse = add_user(db, 'ayse')
+    name, manifest = create_snapshot(db, backup_dir, pages=-1, sleep=0)
+    mehmet = add_user(db, 'mehmet')
+    kv = MemoryKV()
+    kv.set('session:eski', '1')
+
+    restore_snapshot(db, name, manifest, backup_dir, kv=kv)
+
+    assert db.get_user_by_id(ayse)
+    assert db.get_user_by_id(mehmet) is None
+    assert kv.get('session:eski') is None
+
+
+def test_restore_refuses_live_shard_missing_from_snapshot(tmp_path, backup_dir):
+    path = str(tmp_path / 'app.db')
+    old = Database(path, shard_count=1)
+    add_user(old, 'ayse')
+    name, manifest = create_snapshot(old, backup_dir, pages=-1, sleep=0)
+
+    # Yedekten sonra shard eklendi; shard1'deki veriler geri yüklenen global dosyada yönlendirilmez
+    db = Database(path, shard_count=2)
+    mehmet = add_user(db, 'mehmet')
+    shard = str(tmp_path / 'app.shard1.db')
+    assert os.path.exists(shard)
+
+    with pytest.raises(RestoreRefused):
+        restore_snapshot(db, name, manifest, backup_dir, kv=MemoryKV())
+    # Reddedilen geri yükleme hiçbir dosyaya dokunmaz
+    assert db.get_user_by_id(mehmet)
+    assert os.path.exists(shard)
+
+    restore_snapshot(db, name, manifest, backup_dir, move_extra=True, kv=MemoryKV())
+    assert not os.path.exists(shard)
+    assert [f for f in os.listdir(tmp_path) if f.startswith('app.shard1.db.pre-restore-')]
+    assert db.get_user_by_id(mehmet) is None
+
+
+def test_restore_refuses_snapshot_shard_outside_configuration(tmp_path, backup_dir):
+    path = str(tmp_path / 'app.db')
+    name, manifest = create_snapshot(Database(path, shard_count=2), backup_dir, pages=-1, sleep=0)
+    with pytest.raises(RestoreRefused):
+        restore_snapshot(Database(path, shard_count=1), name, manifest, backup_dir, kv=MemoryKV())
+
+
+def test_cli_restore_requires_stopped_service(tmp_path, backup_dir, monkeypatch):
+    path = str(tmp_path / 'app.db')
+    db = Database(path)
+    create_snapshot(db, backup_dir, pages=-1, sleep=0)
+    monkeypatch.setattr(sys, 'argv', ['backup_tool.py', 'restore', '--db', path, '--dir', backup_dir])
+    with pytest.raises(SystemExit) as refused:
+        backup_tool.main()
+    assert '--service-stopped' in str(refused.value)
+
+
+def test_cli_refuses_postgres(tmp_path, backup_dir, monkeypatch):
+    monkeypatch.setenv('DATABASE_URL', 'postgresql://kullanici@localhost/pahiy')
+    monkeypatch.setattr(sys, 'argv', ['backup_tool.py', 'create', '--db', str(tmp_path / 'app.db'),
+                                      '--dir', backup_dir])
+    with pytest.raises(SystemExit) as refused:
+        backup_tool.main()
+    assert 'PostgreSQL' in str(refused.value)
+    assert not os.path.exists(backup_dir)
@@ -0,0 +1,193 @@
+"""Devre kesici durum geçişleri ve yarı açık denemenin her çıkış yolunda sonuçlanması"""
+import time
+
+import pytest
+
+import ai_client
+from ai_client import CircuitBreaker, ModelError
+
+
+class Rejected(Exception):
+    """Tekrar denenemeyen (istek kaynaklı) sağlayıcı hatası"""
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(ai_client, 'PROVIDER', 'fake')
+    monkeypatch.setattr(ai_client, 'MODEL', 'm1')
+    monkeypatch.setattr(ai_client, 'FALLBACK_MODELS', [])
+    monkeypatch.setattr(ai_client, '_breakers', {})
+    monkeypatch.setattr(ai_client, 'hedge', ai_client.HedgePolicy(enabled=False))
+    monkeypatch.setattr(ai_client, '_fake_latency', lambda: 0)
+    return ai_client
+
+
+def half_open_ready(breaker):
+    """Devreyi açık ve bekleme süresi dolmuş hale getir"""
+    breaker.state = 'open'
+    breaker.opened_at = time.time() - breaker.reset_timeout - 1
+
+
+def test_opens_after_threshold():
+    breaker = CircuitBreaker('t', failure_threshold=3, reset_timeout=30)
+    for _ in range(2):
+        breaker.record_failure()
+    assert breaker.state == 'closed' and breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == 'open'
+    assert not breaker.allow()
+    assert 1 <= breaker.retry_after() <= 30
+
+
+def test_half_open_allows_single_probe():
+    breaker = CircuitBreaker('t', failure_threshold=1, reset_timeout=30)
+    half_open_ready(breaker)
+    assert breaker.allow()
+    assert breaker.state == 'half_open'
+    assert not breaker.allow()
+
+
+def test_half_open_probe_outcomes():
+    breaker = CircuitBreaker('t', failure_threshold=5, reset_timeout=30)
+    half_open_ready(breaker)
+    breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == 'open' and not breaker.allow()
+
+    half_open_ready(breaker)
+    breaker.allow()
+    breaker.record_success()
+    assert breaker.state == 'closed' and breaker.failures == 0 and breaker.allow()
+
+
+def test_release_reopens_only_half_open():
+    breaker = CircuitBreaker('t', failure_threshold=1, reset_timeout=30)
+    breaker.release()
+    assert breaker.state == 'closed'
+
+    half_open_ready(breaker)
+    breaker.allow()
+    breaker.release()
+    assert breaker.state == 'open'
+    assert time.time() - breaker.opened_at < 1
+    assert not breaker.allow()
+
+
+def test_rejected_probe_closes_breaker(client, monkeypatch):
+    def reject(model_name, prompt):
+        raise Rejected('güvenlik filtresi')
+
+    monkeypatch.setattr(client, '_generate', reject)
+    breaker = client.get_breaker('m1')
+    half_open_ready(breaker)
+    with pytest.raises(ModelError) as error:
+        client.generate('merhaba', timeout=5)
+    assert error.value.code == 'rejected'
+    # Sağlayıcı yanıt verdi; istek kaynaklı hata devreyi yeniden açmaz
+    assert breaker.state == 'closed'
+    # Ham sağlayıcı hatası istemciye gitmez
+    assert 'güvenlik filtresi' not in error.value.message
+
+    monkeypatch.setattr(client, '_generate', lambda model_name, prompt: 'tamam')
+    assert client.generate('merhaba', timeout=5) == 'tamam'
+    assert breaker.state == 'closed'
+
+
+def test_deadline_before_probe_call_releases(client):
+    breaker = client.get_breaker('m1')
+    half_open_ready(breaker)
+    with pytest.raises(ModelError) as error:
+        # Deadline döngüye girmeden dolar, model hiç çağrılmaz
+        client.generate('merhaba', timeout=1e-9)
+    assert error.value.code == 'timeout'
+    assert breaker.state == 'open'
+
+
+def test_abandoned_stream_probe_releases(client):
+    breaker = client.get_breaker('m1')
+    half_open_ready(breaker)
+    stream = client.generate_stream(client.Prompt('talimat', [{'role': 'user', 'parts': ['uzun bir soru']}]),
+                                     timeout=5)
+    assert next(stream)
+    assert breaker.state == 'half_open'
+    stream.close()
+    assert breaker.state == 'open'
+
+
+def test_rejected_stream_probe_closes_breaker(client, monkeypatch):
+    def reject(model_name, prompt):
+        raise Rejected('güvenlik filtresi')
+        yield
+
+    monkeypatch.setattr(client, '_stream', reject)
+    breaker = client.get_breaker('m1')
+    half_open_ready(breaker)
+    with pytest.raises(ModelError) as error:
+        list(client.generate_stream(client.Prompt('talimat', [{'role': 'user', 'parts': ['soru']}]), timeout=5))
+    assert error.value.code == 'rejected'
+    assert breaker.state == 'closed'
+    assert 'güvenlik filtresi' not in error.value.message
+
+
+def test_available_does_not_consume_probe():
+    breaker = CircuitBreaker('t', failure_threshold=1, reset_timeout=30)
+    half_open_ready(breaker)
+    assert breaker.available() and breaker.available()
+    assert breaker.state == 'open'
+    assert breaker.allow() and not breaker.available()
+
+
+@pytest.fixture
+def latencies():
+    return {'m1': 0.3, 'm2': 2}
+
+
+@pytest.fixture
+def hedged(client, monkeypatch, latencies):
+    monkeypatch.setattr(client, 'FALLBACK_MODELS', ['m2'])
+    monkeypatch.setattr(client, 'HEDGE_DELAY', 0.05)
+    monkeypatch.setattr(client, 'hedge', client.HedgePolicy(enabled=True, target='fallback'))
+
+    def generate(model_name, prompt):
+        time.sleep(latencies[model_name])
+        return model_name
+
+    def stream(model_name, prompt):
+        time.sleep(latencies[model_name])
+        yield model_name
+
+    monkeypatch.setattr(client, '_generate', generate)
+    monkeypatch.setattr(client, '_stream', stream)
+    return client
+
+
+def test_hedge_skips_open_fallback_without_side_effect(hedged):
+    breaker = hedged.get_breaker('m2')
+    breaker.state = 'open'
+    breaker.opened_at = time.time()
+    assert hedged.hedge.hedge_model('m1') == 'm1'
+    assert breaker.state == 'open'
+
+
+def test_cancelled_hedge_returns_fallback_probe(hedged):
+    breaker = hedged.get_breaker('m2')
+    half_open_ready(breaker)
+    assert hedged.generate('merhaba', timeout=5) == 'm1'
+    assert breaker.state == 'open'
+    assert hedged.get_breaker('m1').state == 'closed'
+
+
+def test_winning_hedge_closes_fallback(hedged, latencies):
+    breaker = hedged.get_breaker('m2')
+    half_open_ready(breaker)
+    latencies.update(m1=2, m2=0.1)
+    assert hedged.generate('merhaba', timeout=5) == 'm2'
+    assert breaker.state == 'closed'
+
+
+def test_cancelled_stream_hedge_returns_fallback_probe(hedged):
+    breaker = hedged.get_breaker('m2')
+    half_open_ready(breaker)
+    prompt = hedged.Prompt('talimat', [{'role': 'user', 'parts': ['soru']}])
+    assert ''.join(hedged.generate_stream(prompt, timeout=5)) == 'm1'
+    assert breaker.state == 'open'
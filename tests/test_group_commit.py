@@ -0,0 +1,32 @@
+"""
+Toplu commit (write-behind): gruptaki hatalı istek diğerlerini düşürmez
+"""
+import sqlite3
+
+import pytest
+
+from database import Database, GroupCommitter
+
+
+@pytest.fixture
+def db(tmp_path):
+    db = Database(str(tmp_path / 'app.db'), write_mode='group')
+    # İki istek aynı gruba düşsün
+    db.committer = GroupCommitter(db._connect, window=0.3)
+    return db
+
+
+def test_bad_request_fails_alone(db):
+    user_id, _ = db.create_user('Toplu', 'Yazma', 'toplu', 'toplu@example.com', 'parola123')
+    chat_id = db.create_chat(user_id)
+    path = db.get_shard_path(user_id)
+
+    good = db.committer.submit(path, [(chat_id, 'user', 'merhaba')])
+    bad = db.committer.submit(path, [('olmayan-chat', 'user', 'kayıp')])
+    later = db.committer.submit(path, [(chat_id, 'assistant', 'selam')])
+
+    assert good.result(timeout=5)[chat_id]['message_count'] == 1
+    assert later.result(timeout=5)[chat_id]['message_count'] == 2
+    with pytest.raises(sqlite3.IntegrityError):
+        bad.result(timeout=5)
+    assert [m['content'] for m in db.get_chat_messages(chat_id)] == ['merhaba', 'selam']
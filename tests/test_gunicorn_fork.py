@@ -0,0 +1,86 @@
+"""
+gunicorn post_fork: preload edilen backend.app'in worker'da sıfırlanması
+Ayrı bir süreçte uygulama gunicorn'daki gibi yüklenir, fork edilir ve
+çocukta post_fork çağrılır; sunulan modülün thread'leri ve dinleyicisi
+çocukta çalışıyor olmalı.
+"""
+import json
+import os
+import subprocess
+import sys
+import textwrap
+
+import pytest
+
+pytest.importorskip('flask')
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SCRIPT = textwrap.dedent('''
+    import importlib.util, json, os, sys, threading, time, types
+    from queue import Queue, Empty
+
+    spec = importlib.util.spec_from_file_location('gunicorn_conf', os.path.join(ROOT, 'gunicorn.conf.py'))
+    conf = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(conf)
+    sys.path[:0] = conf.pythonpath.split(',')
+    assert conf.preload_app
+
+    import backend.app as served
+    received = Queue()
+    served.kv.subscribe('fork-test', received.put)
+    before = {name: id(getattr(served, name)) for name in ('quota', 'scheduler', 'history')}
+
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.close(read_fd)
+        result = {}
+        try:
+            server = types.SimpleNamespace(app=types.SimpleNamespace(app_uri='backend.app:app'))
+            conf.post_fork(server, None)
+            result['duplicate_app'] = 'app' in sys.modules
+            result['replaced'] = {name: id(getattr(served, name)) != before[name] for name in before}
+            result['purger_alive'] = any(
+                t.is_alive() and getattr(getattr(t, '_target', None), '__self__', None) is served.db.purger
+                for t in threading.enumerate())
+            served.kv.publish('fork-test', 'merhaba')
+            try:
+                result['message'] = received.get(timeout=5)
+            except Empty:
+                result['message'] = None
+            chat_id = served.db.create_chat(served.db.create_user('F', 'T', 'forkt', 'f@example.com', 'parola123')[0])
+            served.db.add_message(chat_id, 'user', 'fork sonrası yazma')
+            result['written'] = len(served.db.get_chat_messages(chat_id))
+        except Exception as e:
+            result['error'] = repr(e)
+        os.write(write_fd, json.dumps(result).encode())
+        os._exit(0)
+    os.close(write_fd)
+    chunks = []
+    while True:
+        chunk = os.read(read_fd, 65536)
+        if not chunk:
+            break
+        chunks.append(chunk)
+    os.waitpid(pid, 0)
+    print('RESULT ' + b''.join(chunks).decode())
+''')
+
+
+def test_post_fork_resets_served_module(tmp_path):
+    env = dict(os.environ, KV_URL=f'sqlite:///{tmp_path / "kv.db"}', DB_MESSAGE_WRITE_MODE='group',
+               GENAI_PROVIDER='fake', GUNICORN_WORKER_MODEL='gthread', KV_SQLITE_POLL_INTERVAL='0.05')
+    env.pop('PAHIY_SCHEMA_READY', None)
+    output = subprocess.run([sys.executable, '-c', f'ROOT = {ROOT!r}\n' + SCRIPT], cwd=tmp_path, env=env,
+                            capture_output=True, text=True, timeout=60)
+    lines = [line for line in output.stdout.splitlines() if line.startswith('RESULT ')]
+    assert lines, output.stderr
+    result = json.loads(lines[-1][len('RESULT '):])
+
+    assert 'error' not in result, result
+    assert result['duplicate_app'] is False
+    assert result['replaced'] == {'quota': True, 'scheduler': True, 'history': True}
+    assert result['purger_alive'] is True
+    assert result['message'] == 'merhaba'
+    assert result['written'] == 1
@@ -0,0 +1,35 @@
+"""
+backend.app import bütçesi: benchmarks/import_time.py ile aynı ölçüm
+Ağır SDK'lar (google.generativeai, grpc) ilk sohbet isteğine kadar
+yüklenmemeli; toplam süre BUDGET_MS altında kalmalı.
+"""
+import pytest
+
+pytest.importorskip('flask')
+
+from benchmarks import import_time
+
+
+@pytest.fixture(scope='module')
+def modules():
+    return import_time.measure()
+
+
+def test_heavy_sdks_are_not_imported_eagerly(modules):
+    assert 'app' in {name for name, _, _, _ in modules}
+    assert import_time.eager_modules(modules) == []
+
+
+def test_import_time_within_budget(modules):
+    # Ölçüm gürültülü olabilir; en iyi üç denemeden biri bütçe içinde kalmalı
+    best = import_time.total_ms(modules)
+    for _ in range(2):
+        if best <= import_time.BUDGET_MS:
+            break
+        best = min(best, import_time.total_ms(import_time.measure()))
+    assert best <= import_time.BUDGET_MS, f"import süresi {best:.1f} ms > {import_time.BUDGET_MS} ms"
+
+
+def test_eager_modules_detects_forbidden_imports():
+    modules = [('app', 10, 100, 1), ('grpc', 5, 50, 2), ('grpc._cython', 1, 1, 3)]
+    assert import_time.eager_modules(modules) == ['grpc']
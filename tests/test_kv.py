@@ -0,0 +1,268 @@
+"""
+KV deposu: süreç içi, SQLite ve Redis (RESP) uygulamaları aynı senaryolarla.
+Redis tarafı, testte çalışan küçük bir RESP sunucusuna (RespStub) bağlanır;
+yalnızca kv.RedisKV'nin kullandığı komutları bilir.
+"""
+import fnmatch
+import socketserver
+import threading
+import time
+from queue import Queue, Empty
+
+import pytest
+
+import kv as kv_module
+from kv import MemoryKV, SQLiteKV, RedisKV, KVCache
+
+
+def encode(value):
+    if value is None:
+        return b'$-1\r\n'
+    if isinstance(value, int):
+        return b':%d\r\n' % value
+    if isinstance(value, list):
+        return b'*%d\r\n' % len(value) + b''.join(encode(item) for item in value)
+    data = str(value).encode('utf-8')
+    return b'$%d\r\n%s\r\n' % (len(data), data)
+
+
+class RespStub(socketserver.ThreadingTCPServer):
+    """GET, MGET, SET (PX, NX), DEL, UNLINK, SCAN (MATCH, COUNT), INCRBY, PUBLISH, SUBSCRIBE, AUTH, SELECT"""
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), RespHandler)
+        self.data = {}
+        self.channels = {}
+        self.lock = threading.Lock()
+
+    def live(self, key):
+        item = self.data.get(key)
+        if item and item[1] is not None and item[1] <= time.time():
+            del self.data[key]
+            return None
+        return item
+
+
+class RespHandler(socketserver.StreamRequestHandler):
+    def send(self, value):
+        with self.send_lock:
+            self.wfile.write(value if isinstance(value, bytes) else encode(value))
+            self.wfile.flush()
+
+    def read_command(self):
+        line = self.rfile.readline()
+        if not line:
+            return None
+        args = []
+        for _ in range(int(line[1:-2])):
+            size = int(self.rfile.readline()[1:-2])
+            args.append(self.rfile.read(size + 2)[:-2].decode('utf-8'))
+        return args
+
+    def handle(self):
+        server = self.server
+        self.send_lock = threading.Lock()
+        try:
+            while True:
+                args = self.read_command()
+                if args is None:
+                    return
+                command = args[0].upper()
+                with server.lock:
+                    reply = self.execute(server, command, args[1:])
+                if reply is not None:
+                    self.send(reply)
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            with server.lock:
+                for subscribers in server.channels.values():
+                    subscribers.discard(self)
+
+    def execute(self, server, command, args):
+        if command in ('AUTH', 'SELECT'):
+            return b'+OK\r\n'
+        if command == 'GET':
+            item = server.live(args[0])
+            return encode(item[0] if item else None)
+        if command == 'MGET':
+            return encode([item[0] if item else None for item in map(server.live, args)])
+        if command == 'SET':
+            key, value, options = args[0], args[1], [a.upper() for a in args[2:]]
+            if 'NX' in options and server.live(key):
+                return encode(None)
+            expires = None
+            if 'PX' in options:
+                expires = time.time() + int(args[2 + options.index('PX') + 1]) / 1000
+            server.data[key] = (value, expires)
+            return b'+OK\r\n'
+        if command == 'DEL':
+            return encode(1 if server.data.pop(args[0], None) else 0)
+        if command == 'UNLINK':
+            return encode(sum(1 for key in args if server.data.pop(key, None)))
+        if command == 'SCAN':
+            # İmleç son incelenen anahtardır (">anahtar"); tarama sırasında silinenler
+            # gerçek Redis'teki gibi diğer anahtarların atlanmasına yol açmaz
+            options = {args[i].upper(): args[i + 1] for i in range(1, len(args), 2)}
+            after, count = args[0][1:] if args[0] != '0' else None, int(options.get('COUNT', 10))
+            keys = [key for key in sorted(server.data) if after is None or key > after][:count]
+            batch = [key for key in keys if fnmatch.fnmatchcase(key, options.get('MATCH', '*'))]
+            done = len(keys) < count or keys[-1] == max(server.data)
+            return encode(['0' if done else '>' + keys[-1], batch])
+        if command == 'INCRBY':
+            item = server.live(args[0])
+            value = int(item[0] if item else 0) + int(args[1])
+            server.data[args[0]] = (str(value), item[1] if item else None)
+            return encode(value)
+        if command == 'PUBLISH':
+            subscribers = list(server.channels.get(args[0], ()))
+            for subscriber in subscribers:
+                subscriber.send(encode(['message', args[0], args[1]]))
+            return encode(len(subscribers))
+        if command == 'SUBSCRIBE':
+            for i, channel in enumerate(args):
+                server.channels.setdefault(channel, set()).add(self)
+                self.send(encode(['subscribe', channel, i + 1]))
+            return None
+        return f'-ERR bilinmeyen komut {command}\r\n'.encode()
+
+
+@pytest.fixture
+def resp_server():
+    server = RespStub()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture(params=['memory', 'sqlite', 'redis'])
+def store(request, tmp_path, monkeypatch):
+    monkeypatch.setattr(kv_module, 'SQLITE_POLL_INTERVAL', 0.02)
+    if request.param == 'memory':
+        return MemoryKV()
+    if request.param == 'sqlite':
+        return SQLiteKV(str(tmp_path / 'kv.db'))
+    server = request.getfixturevalue('resp_server')
+    return RedisKV(f'redis://127.0.0.1:{server.server_address[1]}/0')
+
+
+def receive(queue, timeout=3):
+    try:
+        return queue.get(timeout=timeout)
+    except Empty:
+        return None
+
+
+def test_get_set_delete(store):
+    assert store.get('a') is None
+    store.set('a', 'bir')
+    assert store.get('a') == 'bir'
+    store.set('a', 'iki')
+    assert store.get('a') == 'iki'
+    store.delete('a')
+    assert store.get('a') is None
+    store.delete('a')
+
+
+def test_get_many(store):
+    assert store.get_many([]) == []
+    store.set('a', '1')
+    store.set('c', '3')
+    store.set('gecici', 'x', ttl=0.1)
+    time.sleep(0.2)
+    assert store.get_many(['a', 'b', 'c', 'gecici']) == ['1', None, '3', None]
+
+
+def test_clear_only_removes_app_namespaces(store, monkeypatch):
+    # Redis'te SCAN birkaç sayfada tamamlanır
+    monkeypatch.setattr(kv_module, 'SCAN_COUNT', 2)
+    app_keys = ['session:abc', 'idem:1:main.chat:k', 'rl:127.0.0.1:60', 'quota:active:1', 'chats_ver:1']
+    for key in app_keys:
+        store.set(key, '1')
+    store.incr('quota:tokens:1:5', ttl=60)
+    # Aynı depoyu paylaşan başka bir servisin anahtarları
+    store.set('baska:servis', 'kalsin')
+    store.set('chatsXver:1', 'kalsin')
+
+    store.clear()
+
+    assert store.get_many(app_keys + ['quota:tokens:1:5']) == [None] * 6
+    assert store.get_many(['baska:servis', 'chatsXver:1']) == ['kalsin', 'kalsin']
+
+
+def test_ttl(store):
+    store.set('gecici', 'x', ttl=0.2)
+    store.set('kalici', 'y')
+    assert store.get('gecici') == 'x'
+    time.sleep(0.3)
+    assert store.get('gecici') is None
+    assert store.get('kalici') == 'y'
+
+
+def test_set_if_absent(store):
+    assert store.set_if_absent('kilit', '1', ttl=0.2)
+    assert not store.set_if_absent('kilit', '2', ttl=0.2)
+    assert store.get('kilit') == '1'
+    time.sleep(0.3)
+    assert store.set_if_absent('kilit', '3')
+    assert store.get('kilit') == '3'
+
+
+def test_incr(store):
+    assert store.incr('sayac') == 1
+    assert store.incr('sayac', 5) == 6
+    # ttl yalnızca ilk oluşturmada uygulanır, artırma süreyi uzatmaz
+    assert store.incr('pencere', ttl=0.3) == 1
+    time.sleep(0.15)
+    assert store.incr('pencere', ttl=0.3) == 2
+    time.sleep(0.25)
+    assert store.incr('pencere', ttl=0.3) == 1
+
+
+def test_pubsub(store):
+    received = Queue()
+    store.subscribe('kanal', received.put)
+    # Dinleyici abone olana kadar yayınlar kaybolabilir; ilk mesaj gelene kadar tekrarla
+    for _ in range(50):
+        store.publish('kanal', 'merhaba')
+        if receive(received, timeout=0.1) == 'merhaba':
+            break
+    else:
+        pytest.fail('ilk mesaj alınamadı')
+
+
+def test_subscribe_after_listener_started(store):
+    first, second = Queue(), Queue()
+    store.subscribe('ilk', first.put)
+    for _ in range(50):
+        store.publish('ilk', 'hazır')
+        if receive(first, timeout=0.1) == 'hazır':
+            break
+    else:
+        pytest.fail('dinleyici başlamadı')
+
+    store.subscribe('sonraki', second.put)
+    for _ in range(50):
+        store.publish('sonraki', 'geç abone')
+        if receive(second, timeout=0.1) == 'geç abone':
+            break
+    else:
+        pytest.fail('dinleyici başladıktan sonra eklenen kanal mesaj almadı')
+    assert first.empty()
+
+
+def test_kv_cache_invalidation_reaches_other_instance(store):
+    writer = KVCache(store, 'test', ttl=60, local_ttl=60)
+    reader = KVCache(store, 'test', ttl=60, local_ttl=60)
+
+    assert reader.get('k', lambda: 'eski') == 'eski'
+    assert reader.get('k', lambda: 'yeni') == 'eski'
+    writer.invalidate('k')
+    deadline = time.time() + 3
+    while reader.get('k', lambda: 'yeni') != 'yeni':
+        assert time.time() < deadline, 'geçersiz kılma diğer kopyaya ulaşmadı'
+        time.sleep(0.02)
@@ -0,0 +1,48 @@
+"""
+Profilleme: profil dosyalarına bağlanan parametre değerleri yazılmamalı
+"""
+import os
+import sqlite3
+
+import pytest
+
+pytest.importorskip('flask')
+
+from flask import Flask
+
+import profiling
+from profiling import RequestProfile, TracedConnection
+
+SECRET = 'SECRET-TOKEN-abc'
+
+
+@pytest.fixture
+def profile():
+    profile = RequestProfile(0)
+    profiling._active.profile = profile
+    yield profile
+    profiling._active.profile = None
+
+
+def test_bound_values_never_reach_profile_output(profile, tmp_path, monkeypatch):
+    monkeypatch.setattr(profiling, 'PROFILE_DIR', str(tmp_path))
+    conn = sqlite3.connect(str(tmp_path / 'app.db'), factory=TracedConnection)
+    conn.execute('CREATE TABLE s (token TEXT, content TEXT)')
+    conn.execute('INSERT INTO s (token, content) VALUES (?, ?)', (SECRET, 'gizli mesaj'))
+    conn.executemany('INSERT INTO s (token, content) VALUES (?, ?)', [(SECRET + '-2', 'ikinci')])
+    conn.commit()
+    conn.execute('SELECT * FROM s WHERE token = ?', (SECRET,)).fetchall()
+    conn.close()
+
+    with Flask(__name__).test_request_context('/api/chat'):
+        profiling.write_profile(profile, 'main.chat', 0.01, 200)
+
+    [name] = [f for f in os.listdir(tmp_path) if f.endswith('.sql.txt')]
+    with open(tmp_path / name) as f:
+        output = f.read()
+    assert SECRET not in output
+    assert 'gizli mesaj' not in output
+    assert 'SELECT * FROM s WHERE token = ?' in output
+    # sqlite3 modülünün INSERT öncesi açtığı örtük transaction görünür
+    assert '[BEGIN] INSERT INTO s (token, content) VALUES (?, ?)' in output
+    assert 'COMMIT' in output
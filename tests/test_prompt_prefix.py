@@ -0,0 +1,74 @@
+"""
+İstem öneki: sistem talimatı tüm kullanıcılar için aynı, model nesnesi ve
+sağlayıcı önbelleği (CachedContent) kullanıcı başına değil model başına
+"""
+import importlib
+import types
+
+import pytest
+
+import ai_client
+
+
+class FakeModel:
+    def __init__(self, model_name, system_instruction=None):
+        self.model_name = model_name
+        self.system_instruction = system_instruction
+
+    @classmethod
+    def from_cached_content(cls, cached):
+        return cls(cached['model'], cached['system_instruction'])
+
+
+@pytest.fixture
+def genai(monkeypatch):
+    created = []
+
+    def create(model, system_instruction, ttl):
+        created.append((model, system_instruction))
+        return {'model': model, 'system_instruction': system_instruction}
+
+    fake = types.SimpleNamespace(GenerativeModel=FakeModel,
+                                 caching=types.SimpleNamespace(CachedContent=types.SimpleNamespace(create=create)),
+                                 created=created)
+    monkeypatch.setattr(ai_client, 'get_genai', lambda: fake)
+    monkeypatch.setattr(ai_client, 'CONTEXT_CACHE', True)
+    monkeypatch.setattr(ai_client, '_models', {})
+    monkeypatch.setattr(ai_client, '_context_cache_failed', set())
+    return fake
+
+
+@pytest.fixture
+def app_module(tmp_path, monkeypatch):
+    pytest.importorskip('flask')
+    monkeypatch.setenv('PAHIY_SCHEMA_READY', '1')
+    monkeypatch.chdir(tmp_path)
+    return importlib.import_module('app')
+
+
+def test_system_instruction_is_identical_for_all_users(app_module):
+    first = app_module.build_prompt_with_history('Merhaba', [], 'ayse')
+    second = app_module.build_prompt_with_history('Selam', [{'role': 'ai', 'content': 'Hoş geldin'}], 'mehmet')
+    assert first.system_instruction == second.system_instruction
+    assert 'ayse' not in first.system_instruction
+    # Ad ilk kullanıcı turunda gider; konuşma kullanıcı turuyla başlar
+    assert first.contents == [{'role': 'user', 'parts': ['Kullanıcının adı: ayse', 'Merhaba']}]
+    assert second.contents[0] == {'role': 'user', 'parts': ['Kullanıcının adı: mehmet']}
+    assert [c['role'] for c in second.contents] == ['user', 'model', 'user']
+
+
+def test_name_prefix_is_stable_between_turns(app_module):
+    history = [{'role': 'user', 'content': 'soru 1'}, {'role': 'ai', 'content': 'yanıt 1'}]
+    before = app_module.build_prompt_with_history('soru 2', history, 'ayse')
+    history += [{'role': 'user', 'content': 'soru 2'}, {'role': 'ai', 'content': 'yanıt 2'}]
+    after = app_module.build_prompt_with_history('soru 3', history, 'ayse')
+    assert after.contents[:len(before.contents) - 1] == before.contents[:-1]
+
+
+def test_model_and_context_cache_are_shared_between_users(genai, app_module):
+    prompts = [app_module.build_prompt_with_history('Merhaba', [], name) for name in ('ayse', 'mehmet', 'zeynep')]
+    models = {ai_client._get_model('m1', prompt.system_instruction)[0] for prompt in prompts}
+    assert len(models) == 1
+    assert genai.created == [('m1', app_module.SYSTEM_INSTRUCTION)]
+    ai_client._get_model('m2', prompts[0].system_instruction)
+    assert len(genai.created) == 2
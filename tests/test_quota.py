@@ -0,0 +1,131 @@
+"""
+Kota: iki QuotaManager aynı KV'yi paylaşan iki worker gibi davranır;
+limitler worker sayısıyla çarpılmamalı.
+"""
+import threading
+import time
+
+import pytest
+
+from database import Database
+from kv import MemoryKV, SQLiteKV
+from quota import QuotaManager, QuotaExceeded
+
+
+@pytest.fixture
+def db(tmp_path):
+    return Database(str(tmp_path / 'quota.db'))
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def shared_kv(request, tmp_path):
+    if request.param == 'memory':
+        return MemoryKV()
+    return SQLiteKV(str(tmp_path / 'kv.db'))
+
+
+@pytest.fixture
+def user_id(db):
+    user_id, _ = db.create_user('Kota', 'Deneme', 'kota', 'kota@example.com', 'parola123')
+    return user_id
+
+
+def workers(db, kv, count=2, **kwargs):
+    return [QuotaManager(db, kv, flush_interval=3600, **kwargs) for _ in range(count)]
+
+
+def test_concurrency_limit_is_shared_between_workers(db, shared_kv, user_id):
+    first, second = workers(db, shared_kv, max_concurrent=2)
+    first.acquire(user_id)
+    second.acquire(user_id)
+    with pytest.raises(QuotaExceeded):
+        first.acquire(user_id)
+    with pytest.raises(QuotaExceeded):
+        second.acquire(user_id)
+    # Reddedilen deneme sayacı artırmış olarak bırakmaz
+    first.release(user_id)
+    second.acquire(user_id)
+
+
+def test_generation_releases_slot(db, shared_kv, user_id):
+    first, second = workers(db, shared_kv, max_concurrent=1)
+    with pytest.raises(RuntimeError):
+        with first.generation(user_id):
+            raise RuntimeError('model hatası')
+    with second.generation(user_id):
+        pass
+
+
+def test_expired_slot_counter_does_not_go_negative(db, shared_kv, user_id):
+    (manager,) = workers(db, shared_kv, count=1, max_concurrent=1, slot_ttl=0.1)
+    manager.acquire(user_id)
+    time.sleep(0.2)
+    manager.release(user_id)
+    manager.acquire(user_id)
+    with pytest.raises(QuotaExceeded):
+        manager.acquire(user_id)
+
+
+def test_token_budget_is_shared_between_workers(db, shared_kv, user_id):
+    first, second = workers(db, shared_kv, token_budget=100)
+    first.reserve(user_id, 60)
+    with pytest.raises(QuotaExceeded) as rejected:
+        second.reserve(user_id, 60)
+    assert rejected.value.retry_after > 0
+    second.reserve(user_id, 40)
+    with pytest.raises(QuotaExceeded):
+        first.reserve(user_id, 1)
+
+
+def test_concurrent_reservations_never_exceed_budget(db, shared_kv, user_id):
+    managers = workers(db, shared_kv, count=4, token_budget=100)
+    accepted = []
+    lock = threading.Lock()
+
+    def reserve(manager):
+        for _ in range(10):
+            try:
+                manager.reserve(user_id, 10)
+            except QuotaExceeded:
+                continue
+            with lock:
+                accepted.append(10)
+
+    threads = [threading.Thread(target=reserve, args=(m,)) for m in managers]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert 0 < sum(accepted) <= 100
+
+
+def test_usage_is_restored_from_database_when_kv_is_empty(db, user_id):
+    (before,) = workers(db, MemoryKV(), count=1, token_budget=100)
+    before.reserve(user_id, 60)
+    before.add_usage(user_id, 20)
+    before.flush()
+
+    # KV yeniden başladı (boş); kullanım veritabanından geri yüklenir
+    (after,) = workers(db, MemoryKV(), count=1, token_budget=100)
+    with pytest.raises(QuotaExceeded):
+        after.reserve(user_id, 30)
+    after.reserve(user_id, 20)
+
+
+def test_loading_from_database_does_not_double_count(db, shared_kv, user_id):
+    first, second = workers(db, shared_kv, token_budget=100)
+    first.reserve(user_id, 50)
+    first.flush()
+    # İkinci worker kullanıcıyı ilk kez görür; KV'deki kova veritabanındakiyle değiştirilmez
+    second.reserve(user_id, 50)
+    with pytest.raises(QuotaExceeded):
+        second.reserve(user_id, 1)
+
+
+def test_flush_writes_only_net_usage(db, shared_kv, user_id):
+    (manager,) = workers(db, shared_kv, count=1, token_budget=100)
+    manager.reserve(user_id, 80)
+    with pytest.raises(QuotaExceeded):
+        manager.reserve(user_id, 30)
+    manager.flush()
+    assert sum(tokens for _, tokens in db.get_token_usage(user_id, 0)) == 80
@@ -0,0 +1,81 @@
+"""
+WebSocket kapasitesi: worker başına açık soket WS_MAX_SOCKETS'i geçemez,
+fazlası 4429 (REST'e geç) koduyla kapatılır. Uygulama ayrı bir süreçte
+thread'li sunucuyla çalıştırılır.
+"""
+import json
+import os
+import subprocess
+import sys
+import textwrap
+
+import pytest
+
+pytest.importorskip('flask_sock')
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SCRIPT = textwrap.dedent('''
+    import json, sys, threading
+    sys.path[:0] = [ROOT, ROOT + '/backend']
+    import simple_websocket
+    from werkzeug.serving import make_server
+    import app as served
+
+    server = make_server('127.0.0.1', 0, served.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f'ws://127.0.0.1:{server.server_port}/ws'
+    user_id, verification = served.db.create_user('W', 'S', 'wscap', 'ws@example.com', 'parola123')
+    served.db.verify_email(verification)
+    token = served.db.create_session(user_id)
+
+    result = {'max_sockets': served.WS_MAX_SOCKETS, 'opened': [], 'rejected': []}
+    sockets = []
+    for i in range(3):
+        ws = simple_websocket.Client.connect(url)
+        try:
+            ws.send(json.dumps({'type': 'auth', 'token': token}))
+            result['opened'].append(json.loads(ws.receive(timeout=10))['type'])
+            sockets.append(ws)
+        except simple_websocket.ConnectionClosed as e:
+            result['rejected'].append(e.reason)
+    # Soket kapanınca yer açılır
+    sockets.pop().close()
+    ws = simple_websocket.Client.connect(url)
+    ws.send(json.dumps({'type': 'auth', 'token': token}))
+    result['reopened'] = json.loads(ws.receive(timeout=10))['type']
+    for ws in sockets + [ws]:
+        ws.close()
+    print('RESULT ' + json.dumps(result), flush=True)
+    server.shutdown()
+''')
+
+
+def test_sockets_over_capacity_are_told_to_use_rest(tmp_path):
+    env = dict(os.environ, WS_MAX_SOCKETS='2', GENAI_PROVIDER='fake', ADMISSION_CONTROL='0')
+    env.pop('PAHIY_SCHEMA_READY', None)
+    output = subprocess.run([sys.executable, '-c', f'ROOT = {ROOT!r}\n' + SCRIPT], cwd=tmp_path, env=env,
+                            capture_output=True, text=True, timeout=60)
+    lines = [line for line in output.stdout.splitlines() if line.startswith('RESULT ')]
+    assert lines, output.stderr
+    result = json.loads(lines[-1][len('RESULT '):])
+
+    assert result['max_sockets'] == 2
+    assert result['opened'] == ['ready', 'ready']
+    assert result['rejected'] == [4429]
+    assert result['reopened'] == 'ready'
+
+
+def test_default_capacity_leaves_threads_for_rest():
+    script = ('import sys; sys.path[:0] = [ROOT + "/backend"]\n'
+              'import os, app\n'
+              'for model, threads in (("gthread", "8"), ("gthread", "1"), ("sync", "8"), ("gevent", "8")):\n'
+              '    os.environ.update(GUNICORN_WORKER_MODEL=model, GUNICORN_THREADS=threads,'
+              ' GUNICORN_WORKER_CONNECTIONS="1000")\n'
+              '    print("RESULT", model, threads, app.default_ws_max_sockets())\n')
+    env = dict(os.environ, GENAI_PROVIDER='fake', PAHIY_SCHEMA_READY='1')
+    output = subprocess.run([sys.executable, '-c', f'ROOT = {ROOT!r}\n' + script], cwd=ROOT, env=env,
+                            capture_output=True, text=True, timeout=60)
+    results = [line.split()[1:] for line in output.stdout.splitlines() if line.startswith('RESULT ')]
+    assert results == [['gthread', '8', '4'], ['gthread', '1', '0'], ['sync', '8', '0'], ['gevent', '8', '500']], \
+        output.stderr